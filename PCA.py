@@ -1,63 +1,267 @@
 """
 PCA.py
 --------------------------------------
-This document contains the code to transform the raw data using 
+This document contains the code to transform the raw data using
 Principal Component Analysis.
 """
 
 # LIBRARIES
-import pandas as pd
-from sklearn.preprocessing import StandardScaler
-from sklearn import decomposition
+# scikit-learn is only imported when fitting, so applying a saved transform stays fast.
+import argparse
+
 import numpy as np
 
+# local files in directory
+import dataset
+
+# Features the components are computed from.
+FEATURES = ["ncaa_fg3a", "ncaa_fg3_pct", "ncaa_ft_pct", "ncaa_sos", "ncaa_team_fg3a_avg", "nba_avg_team_ortg"]
+
+# Columns of the transformed datasets: the components, then the label.
+COMPONENTS = ["X1", "X2", "X3", "X4", "Y"]
+
+# Every row of the data, transformed, the training split first and then the test split.
+# The models read each split as a view of the file.
+TRANSFORMED_FILE = "transformed.dat"
+
+# The fitted scaler and PCA are saved here, so new data can be transformed without refitting.
+TRANSFORM_FILE = "pca_transform.npz"
+
+# Rows read at a time when fitting and transforming in streaming mode.
+CHUNK_ROWS = 100000
+
+
+class Transform(object):
+
+	'''
+	Parameters:
+	* mean, scale: per-feature mean and standard deviation of the standard scaler.
+	* pca_mean, components: mean and principal axes of the PCA, on the scaled features.
+	* explained_variance_ratio: share of the variance explained by each component.
+
+	Function: Standardizes features and projects them on the principal components. Only
+	          needs NumPy, so applying a saved transform does not load scikit-learn.
+	'''
+	def __init__(self, mean, scale, pca_mean, components, explained_variance_ratio):
+		self.mean = mean
+		self.scale = scale
+		self.pca_mean = pca_mean
+		self.components = components
+		self.explained_variance_ratio = explained_variance_ratio
+
+
+	'''
+	Parameters:
+	* X: rows x len(FEATURES) features, as returned by load_dataset().
+
+	Function: Returns the rows x components transformed features.
+	'''
+	def apply(self, X):
+		return ((X - self.mean) / self.scale - self.pca_mean).dot(self.components.T)
+
+
+	'''
+	Parameters:
+	* filename: the .npz file the transform is written to.
+	'''
+	def save(self, filename=TRANSFORM_FILE):
+		np.savez(filename, features=np.array(FEATURES), mean=self.mean, scale=self.scale, pca_mean=self.pca_mean,
+				components=self.components, explained_variance_ratio=self.explained_variance_ratio)
+
 
 '''
 Parameters:
-* filename: csv file to be loaded.
+* scaler: a fitted StandardScaler.
+* pca: a fitted PCA or IncrementalPCA.
 
-Function: read in data to be transformed.
+Function: Helper function to keep the fitted values of the scaler and PCA as a Transform.
+'''
+def make_transform(scaler, pca):
+	return Transform(scaler.mean_, scaler.scale_, pca.mean_, pca.components_, pca.explained_variance_ratio_)
+
+
+'''
+Parameters:
+* filename: the .npz file a transform was saved to.
+
+Function: Loads a saved transform.
 '''
-def load_dataset(filename):
-	
-	df = pd.read_csv(filepath_or_buffer=filename, sep=',')
+def load_transform(filename=TRANSFORM_FILE):
+	data = np.load(filename)
 
-	columns = ["name", "ncaa_fg3a", "ncaa_fg3_pct", "ncaa_ft_pct", "ncaa_sos","ncaa_team_fg3a_avg",
-			"nba_avg_team_ortg", "nba_relative_team_fg3a", "nba_fg3_pct"]
-	df.columns = columns
+	features = [str(feature) for feature in data['features']]
+	if features != FEATURES:
+		raise ValueError(filename + ' was fitted on the features ' + ', '.join(features))
 
-	df.dropna(how="all", inplace=True) # drops the empty line at file-end
-	df.tail()
+	return Transform(data['mean'], data['scale'], data['pca_mean'], data['components'], data['explained_variance_ratio'])
+
+
+'''
+Parameters:
+* X: features, in the order of FEATURES.
+* Y: labels (nba_fg3_pct), or None for players without one (e.g. prospects).
 
-	X = df.ix[:,1:7].values
+Function: Helper function to scale the shooting percentages from fractions to percents.
+          X and Y are copied, as datasets are read-only.
+'''
+def prepare(X, Y=None):
+	X = np.array(X, dtype=np.float64)
 	X[:,1:3] *= 100.
-	Y = df.ix[:,-1].values
-	Y *= 100.
+	if Y is not None:
+		Y = Y * 100.
 
 	return X, Y
 
 
+'''
+Parameters:
+* filename: the scraped data, or a dataset file (see dataset.py).
+* split: the split to read (e.g. train), or None for every row.
+* manifest: the split manifest written by select_test_train.py.
+
+Function: read in data to be transformed.
+'''
+def load_dataset(filename, split=None, manifest=dataset.DEFAULT_MANIFEST):
+	X, Y = dataset.load_xy(filename, FEATURES, "nba_fg3_pct", split, manifest)
+	return prepare(X, Y)
+
+
+'''
+Parameters:
+* filename: the scraped data, or a dataset file (see dataset.py).
+* chunk_rows: number of rows in each chunk.
+* rows: indices of the rows to read, in increasing order, or None for every row.
+
+Function: read in data to be transformed one chunk of rows at a time. Generates the
+          (X, Y, names) of each chunk; names is None if the dataset has no name column.
+'''
+def iter_chunks(filename, chunk_rows=CHUNK_ROWS, rows=None):
+	data = dataset.load(filename)
+	X, Y = data.select(FEATURES), data.column("nba_fg3_pct")
+
+	for start in range(0, len(data), chunk_rows):
+		end = min(start + chunk_rows, len(data))
+		if rows is None:
+			chunk = slice(start, end)
+		else:
+			chunk = rows[np.searchsorted(rows, start):np.searchsorted(rows, end)]
+			if len(chunk) == 0:
+				continue
+
+		X_chunk, Y_chunk = prepare(X[chunk], Y[chunk])
+		yield X_chunk, Y_chunk, data.labels[chunk] if data.labels is not None else None
+
+
+'''
+Parameters:
+* X: the training features, as returned by load_dataset().
+* n_components: number of principal components kept.
+
+Function: Fits the standard scaler and PCA in memory.
+'''
+def fit(X, n_components=len(COMPONENTS) - 1):
+	from sklearn.preprocessing import StandardScaler
+	from sklearn import decomposition
+
+	scaler = StandardScaler().fit(X)
+	pca = decomposition.PCA(n_components=n_components).fit(scaler.transform(X))
+
+	return make_transform(scaler, pca)
+
+
+'''
+Parameters:
+* filename: the scraped data, or a dataset file.
+* rows: indices of the training rows, in increasing order, or None for every row.
+* n_components: number of principal components kept.
+* chunk_rows: number of rows read at a time.
+
+Function: Fits the standard scaler and PCA one chunk at a time, so the training data
+          never has to fit in memory. The scaler is fit with running means and variances
+          in a first pass, then IncrementalPCA on the scaled chunks in a second pass.
+'''
+def fit_streaming(filename, rows=None, n_components=len(COMPONENTS) - 1, chunk_rows=CHUNK_ROWS):
+	from sklearn.preprocessing import StandardScaler
+	from sklearn import decomposition
+
+	scaler = StandardScaler()
+	for X, Y, names in iter_chunks(filename, chunk_rows, rows):
+		scaler.partial_fit(X)
+
+	# Each batch of IncrementalPCA needs at least as many rows as components, so a
+	# short chunk is joined to the one before it.
+	pca = decomposition.IncrementalPCA(n_components=n_components)
+	held = None
+	for X, Y, names in iter_chunks(filename, chunk_rows, rows):
+		X = scaler.transform(X)
+		if held is None:
+			held = X
+		elif len(held) < n_components or len(X) < n_components:
+			held = np.vstack((held, X))
+		else:
+			pca.partial_fit(held)
+			held = X
+	pca.partial_fit(held)
+
+	return make_transform(scaler, pca)
+
+
+'''
+Parameters:
+* transform: a fitted Transform.
+* source: the dataset to transform.
+* target: the dataset file the components and labels are written to.
+* chunk_rows: number of rows transformed at a time.
+* splits: (name, rows) of each split, with the rows in increasing order, or None.
+
+Function: Transforms every row of a dataset one chunk at a time, and keeps the player
+          names. With splits, the rows of each split are written in turn and marked
+          as a split of the target (see dataset.DatasetWriter.end_split()).
+'''
+def transform_file(transform, source, target, chunk_rows=CHUNK_ROWS, splits=None):
+	data = dataset.load(source)
+	writer = dataset.DatasetWriter(target, COMPONENTS, "name" if data.labels is not None else None)
+
+	for name, rows in splits or [(None, None)]:
+		for X, Y, names in iter_chunks(source, chunk_rows, rows):
+			writer.write(np.column_stack((transform.apply(X), Y)), names)
+		if name is not None:
+			writer.end_split(name)
+	writer.close()
+
+
+def parse_args():
+	parser = argparse.ArgumentParser(description='Fit the PCA transform on the training split and transform the whole dataset.')
+	parser.add_argument('--data', default='data.csv', help='the scraped data')
+	parser.add_argument('--manifest', default=dataset.DEFAULT_MANIFEST, help='split manifest written by select_test_train.py')
+	parser.add_argument('--output', default=TRANSFORMED_FILE, help='dataset file the transformed rows are written to')
+	parser.add_argument('--transform', default=TRANSFORM_FILE, help='file the fitted transform is saved to')
+	parser.add_argument('--streaming', action='store_true',
+						help='fit with incremental statistics over chunks instead of in memory')
+	parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='rows read at a time')
+	return parser.parse_args()
+
+
 def main():
-	X, Y = load_dataset("train.csv")
-	X_std = StandardScaler().fit_transform(X)
-	
-	pca = decomposition.PCA(n_components=4)
-	pca.fit(X_std)
-	print("Explained variance ratios:")
-	print(pca.explained_variance_ratio_)
+	args = parse_args()
 
-	transformed_X = pca.transform(X_std)
-	transformed_samples = np.hstack((transformed_X, np.matrix(Y).T))
-	np.savetxt("transformed_train.csv", transformed_samples, delimiter=',')
+	splits = dataset.read_manifest(args.manifest, dataset.load(args.data))
+	if args.streaming:
+		transform = fit_streaming(args.data, splits['train'], chunk_rows=args.chunk_rows)
+	else:
+		X, Y = load_dataset(args.data, 'train', args.manifest)
+		transform = fit(X)
+
+	print("Explained variance ratios:")
+	print(transform.explained_variance_ratio)
 
-	
-	X_test, Y_test = load_dataset("test.csv")
-	X_test_std = StandardScaler().fit_transform(X_test)
+	transform.save(args.transform)
 
-	transformed_X_test = pca.transform(X_test_std)
-	transformed_samples_test = np.hstack((transformed_X_test, np.matrix(Y_test).T))
-	np.savetxt("transformed_test.csv", transformed_samples_test, delimiter=',')
+	# The test rows are scaled with the training means and deviations, like any new data.
+	# The training rows are written first, then the other splits.
+	splits = sorted(splits.items(), key=lambda split: (split[0] != 'train', split[0]))
+	transform_file(transform, args.data, args.output, args.chunk_rows, splits)
 
 
 if __name__ == '__main__':
-	main()
\ No newline at end of file
+	main()
@@ -0,0 +1,189 @@
+"""
+bench_extract.py
+--------------------------------------
+This document benchmarks the HTML extraction code of the scraper over saved
+pages (e.g. the page cache folder). It reports pages per second for the old
+serialize-and-reparse extraction and for the single-pass extraction with
+each available parser backend.
+"""
+
+# LIBRARIES
+import argparse
+import os
+import time
+
+from bs4 import BeautifulSoup
+from bs4 import Comment
+from bs4 import FeatureNotFound
+
+import page_cache
+import scraper
+
+
+# Markers used to tell which kind of page a saved file is, in the order they are checked.
+PAGE_KINDS = [
+	('league', 'id="all_team-stats-per_game"'),
+	('team', 'id="all_team_misc"'),
+	('ncaa_player', 'id="all_players_totals"'),
+	('school', 'id="team_stats"'),
+	('nba_player', 'id="all_totals"'),
+]
+
+
+'''
+Parameters:
+* pages_dir: folder of the saved pages.
+
+Function: Loads every saved page and labels it with the kind of page it is.
+          Pages the scraper does not read are skipped.
+'''
+def load_pages(pages_dir):
+	pages = []
+	for root, dirs, files in os.walk(pages_dir):
+		for filename in sorted(files):
+			if not filename.endswith('.html'):
+				continue
+
+			with open(os.path.join(root, filename), 'rb') as f:
+				page = f.read()
+
+			for kind, marker in PAGE_KINDS:
+				if marker in page:
+					pages.append((kind, page))
+					break
+
+	return pages
+
+
+# The extraction code as it was before pages were parsed in a single pass. Every
+# table and row is serialized and parsed again.
+
+def legacy_get_table(soup, table_id):
+	table = soup.find(id=table_id)
+	wrapper = BeautifulSoup(str(table), 'html.parser')
+	table_content = wrapper.find_all(text=lambda text:isinstance(text, Comment))[0]
+	return BeautifulSoup(str(table_content), 'html.parser')
+
+
+def legacy_league(lg_soup):
+	lg_fg3a_soup = legacy_get_table(lg_soup, 'all_team-stats-per_game')
+	lg_avg_soup = BeautifulSoup(str(lg_fg3a_soup.select_one('tfoot')), 'html.parser')
+	return lg_avg_soup.select_one('td[data-stat="fg3a"]').get_text()
+
+
+def legacy_team(team_soup):
+	ortg_soup = legacy_get_table(team_soup, 'all_team_misc')
+	ortg = ortg_soup.select_one('tbody > tr').select_one('td[data-stat="off_rtg"]').get_text()
+
+	team_fg3_soup = legacy_get_table(team_soup, 'all_team_and_opponent')
+	row_soup = BeautifulSoup(str(team_fg3_soup.select('tbody > tr')[1]), 'html.parser')
+	return ortg, row_soup.select_one('td[data-stat="fg3a_per_g"]').get_text()
+
+
+def legacy_nba_player(player_soup):
+	tot_soup = legacy_get_table(player_soup, 'all_totals')
+	foot_soup = BeautifulSoup(str(tot_soup.select_one('tfoot > tr')), 'html.parser')
+	fg3 = int(foot_soup.select_one('td[data-stat="fg3"]').get_text())
+	fg3a = int(foot_soup.select_one('td[data-stat="fg3a"]').get_text())
+
+	seasons = []
+	for row in tot_soup.select('tbody > tr'):
+		row_soup = BeautifulSoup(str(row), 'html.parser')
+		if row_soup.select_one('td > a').get_text() == 'NBA':
+			continue
+		seasons.append((row_soup.select_one('th > a').get_text(), row_soup.select_one('td > a')['href']))
+
+	return fg3, fg3a, seasons
+
+
+def legacy_ncaa_player(player_soup):
+	tot_soup = legacy_get_table(player_soup, 'all_players_totals')
+	foot_soup = BeautifulSoup(str(tot_soup.select_one('tfoot > tr')), 'html.parser')
+	per_soup = BeautifulSoup(str(player_soup.find(id='players_per_game')), 'html.parser')
+	per_foot = BeautifulSoup(str(per_soup.select_one('tfoot > tr')), 'html.parser')
+
+	stats = [int(foot_soup.select_one('td[data-stat="' + stat + '"]').get_text()) for stat in ['fg3', 'fg3a', 'ft', 'fta']]
+	stats.append(float(per_foot.select_one('td[data-stat="sos"]').get_text()))
+
+	school_hrefs = []
+	for row in tot_soup.select('tbody > tr'):
+		row_soup = BeautifulSoup(str(row), 'html.parser')
+		school_hrefs.append(row_soup.select_one('td > a')['href'])
+
+	return tuple(stats) + (school_hrefs,)
+
+
+def legacy_school(school_soup):
+	school_stats = BeautifulSoup(str(school_soup.find(id='team_stats')), 'html.parser')
+	row_parser = BeautifulSoup(str(school_stats.select_one('tbody > tr')), 'html.parser')
+	return int(row_parser.select_one('td[data-stat="g"]').get_text()), int(row_parser.select_one('td[data-stat="fg3a"]').get_text())
+
+
+LEGACY_READERS = {
+	'league': legacy_league,
+	'team': legacy_team,
+	'nba_player': legacy_nba_player,
+	'ncaa_player': legacy_ncaa_player,
+	'school': legacy_school,
+}
+
+READERS = {
+	'league': scraper.read_league_page,
+	'team': scraper.read_team_page,
+	'nba_player': scraper.read_nba_player,
+	'ncaa_player': scraper.read_ncaa_player,
+	'school': scraper.read_school_page,
+}
+
+
+'''
+Parameters:
+* pages: list of (kind, page) pairs.
+* readers: the extraction function for each kind of page.
+* parser: the BeautifulSoup backend used to parse the pages.
+* repeat: number of passes over the pages.
+
+Function: Parses and extracts every page and returns the number of pages per second
+          along with the extracted values, so the engines can be checked against each other.
+'''
+def run(pages, readers, parser, repeat):
+	scraper.PARSER = parser
+	results = []
+
+	start = time.time()
+	for i in range(repeat):
+		results = [readers[kind](BeautifulSoup(page, parser)) for kind, page in pages]
+	elapsed = time.time() - start
+
+	return len(pages) * repeat / elapsed, results
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the scraper extraction code over saved pages.')
+	parser.add_argument('--pages', default=page_cache.DEFAULT_CACHE_DIR, help='folder of the saved pages')
+	parser.add_argument('--repeat', type=int, default=3, help='number of passes over the pages')
+	args = parser.parse_args()
+
+	pages = load_pages(args.pages)
+	if not pages:
+		print 'No scraper pages found in ' + args.pages + '.'
+		return
+
+	print 'Benchmarking extraction over ' + str(len(pages)) + ' pages...'
+
+	before, expected = run(pages, LEGACY_READERS, 'html.parser', args.repeat)
+	print 'before (reparse, html.parser): %.1f pages/s' % before
+
+	for backend in scraper.PARSERS:
+		try:
+			after, results = run(pages, READERS, backend, args.repeat)
+		except FeatureNotFound:
+			print 'after (single pass, ' + backend + '): not installed'
+			continue
+
+		match = 'matches' if results == expected else 'DIFFERS from'
+		print 'after (single pass, %s): %.1f pages/s (%.1fx), output %s before' % (backend, after, after / before, match)
+
+
+if __name__ == '__main__':
+	main()
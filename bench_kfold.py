@@ -0,0 +1,63 @@
+"""
+bench_kfold.py
+--------------------------------------
+This document benchmarks k-fold cross validation (see kfold.py) over a range
+of worker process counts. It reports the time and speedup over one worker for
+each count, and checks that every count gives the same scores.
+"""
+
+# LIBRARIES
+import argparse
+import time
+
+from multiprocessing import cpu_count
+
+import numpy as np
+
+# local files in directory
+import kfold
+
+
+'''
+Parameters:
+* cores: the largest number of workers.
+
+Function: Helper function to list the worker counts benchmarked: powers of two up to
+          the number of cores, and the number of cores itself.
+'''
+def worker_counts(cores):
+	counts = []
+	workers = 1
+	while workers < cores:
+		counts.append(workers)
+		workers *= 2
+	return counts + [cores]
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark k-fold cross validation across core counts.')
+	parser.add_argument('--data', default='transformed.dat', help='dataset transformed by PCA.py')
+	parser.add_argument('--folds', type=int, default=10, help='number of folds')
+	parser.add_argument('--workers', type=int, nargs='+', help='worker counts to run (default powers of two up to one per core)')
+	args = parser.parse_args()
+
+	train = kfold.load_dataset(args.data, 'train')
+	counts = args.workers or worker_counts(cpu_count())
+
+	print 'Cross-validating ' + str(len(train)) + ' rows with ' + str(args.folds) + ' folds on ' + \
+		str(cpu_count()) + ' cores...'
+
+	baseline, expected = None, None
+	for workers in counts:
+		start = time.time()
+		scores = kfold.kfold_cv(train, args.folds, workers)
+		elapsed = time.time() - start
+
+		if expected is None:
+			baseline, expected = elapsed, scores
+		match = 'same scores' if all(np.array_equal(a, b) for a, b in zip(scores, expected)) else 'scores DIFFER'
+		print '%3d workers: %.1fs (%.2fx), %s' % (workers, elapsed, baseline / elapsed, match)
+
+
+if __name__ == '__main__':
+	main()
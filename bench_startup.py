@@ -0,0 +1,90 @@
+"""
+bench_startup.py
+--------------------------------------
+This document benchmarks the startup time of every subcommand of cli.py. Each
+command is run with --help in a fresh interpreter, so the time is the time to
+import what the command needs. It also checks that no command imports the
+plotting or statistics libraries before they are used. Exits with an error if
+a command is over the time budget or imports one of them, so it can guard
+against regressions, e.g.
+
+	python bench_startup.py --budget 1.5
+"""
+
+# LIBRARIES
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# local files in directory
+import cli
+
+
+# Libraries that take seconds to import, and are only imported when they are used.
+LAZY_MODULES = ['matplotlib', 'statsmodels']
+
+# Libraries reported for every command.
+REPORTED_MODULES = ['matplotlib', 'statsmodels', 'scipy', 'sklearn', 'pandas', 'bs4']
+
+# Run in a fresh interpreter: runs a command with --help, then prints the top-level
+# packages it imported.
+PROBE = '''
+import sys
+sys.argv = ['cli.py', %r, '--help']
+import cli
+try:
+	cli.main()
+except SystemExit:
+	pass
+sys.stderr.write(' '.join(sorted(set(name.split('.')[0] for name in sys.modules if sys.modules[name] is not None))))
+'''
+
+
+'''
+Parameters:
+* command: a subcommand of cli.py.
+
+Function: Runs the command with --help in a new interpreter. Returns the seconds it
+          took and the top-level packages it imported.
+'''
+def probe(command):
+	directory = os.path.dirname(os.path.abspath(cli.__file__))
+	with open(os.devnull, 'wb') as devnull:
+		start = time.time()
+		process = subprocess.Popen([sys.executable, '-W', 'ignore', '-c', PROBE % command], cwd=directory,
+									stdout=devnull, stderr=subprocess.PIPE)
+		modules = process.communicate()[1]
+		elapsed = time.time() - start
+
+	return elapsed, set(modules.split())
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark the startup time of every subcommand of cli.py.')
+	parser.add_argument('--repeat', type=int, default=3, help='runs of each command; the fastest is reported')
+	parser.add_argument('--budget', type=float, default=2.0, help='seconds a command may take to start')
+	args = parser.parse_args()
+
+	failed = []
+	for command, module, prefix, description in cli.COMMANDS:
+		runs = [probe(command) for i in range(args.repeat)]
+		elapsed = min(run[0] for run in runs)
+		modules = runs[0][1]
+
+		imported = [name for name in REPORTED_MODULES if name in modules]
+		print '%-10s %.2fs  imports: %s' % (command, elapsed, ', '.join(imported) or '-')
+
+		eager = [name for name in LAZY_MODULES if name in modules]
+		if eager:
+			failed.append(command + ' imports ' + ', '.join(eager) + ' on startup')
+		if elapsed > args.budget:
+			failed.append(command + ' takes %.2fs to start (budget %.2fs)' % (elapsed, args.budget))
+
+	if failed:
+		sys.exit('\n'.join(failed))
+
+
+if __name__ == '__main__':
+	main()
@@ -6,35 +6,49 @@ on PCA-transformed data.
 """
 
 # LIBRARIES
+# matplotlib takes seconds to import, so it is only imported when plotting.
+import argparse
+
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
 
 from sklearn import ensemble
-from sklearn import datasets
-from sklearn.utils import shuffle
 from sklearn.metrics import mean_squared_error
-from sklearn.grid_search import GridSearchCV
+from sklearn.model_selection import KFold
+
+# local files in directory
+import dataset
+import registry
+
+
+# CONSTANTS
+# A fixed random_state makes fits repeatable, e.g. across the workers of kfold.py.
+PARAMS = {'n_estimators': 3000, 'learning_rate': .0001, 'max_depth': 5, 'random_state': 0}
 
 
 '''
 Parameters:
-* filename: csv file to be loaded.
+* filename: dataset file to be loaded (see dataset.py).
+* split: the split to read (train or test).
 
 Function: read in data to use in gradient boosting regression code.
 '''
-def load_dataset(filename, columns = None):
-    df = pd.read_csv(filepath_or_buffer=filename, sep=',')
+def load_dataset(filename, split):
+    return dataset.load_xy(filename, split=split)
 
-    if columns:
-        df.columns = columns
 
-    df.dropna(how="all", inplace=True) # drops the empty line at file-end
-    df.tail()
-    X = df.ix[:,0:4].values
-    Y = df.ix[:,4].values
+'''
+Parameters:
+* train_X: parameters of the training data (e.g. ncaa_fg3)
+* train_y: label for the training data (i.e. nba_fg3_pct)
+* params: parameters used for the gradient boosting regressor.
+
+Function: builds and returns a gradient boosting regressor fitted on the training data.
+'''
+def train_model(train_X, train_y, params=PARAMS):
+    clf = ensemble.GradientBoostingRegressor(**params)
+    clf.fit(train_X, train_y)
 
-    return X, Y    
+    return clf
 
 
 '''
@@ -51,9 +65,7 @@ Function: builds a gradient boosting regressor using the data and specified
 def fit_model(train_X, train_y, test_X, test_y, params):
     
     # Gives the possible parameters that we are tuning on
-    clf = ensemble.GradientBoostingRegressor(**params)
-
-    clf.fit(train_X, train_y)
+    clf = train_model(train_X, train_y, params)
     # mse = mean_squared_error(test_y, clf.predict(test_X))
     # print("MSE: %.4f" % mse)
 
@@ -63,35 +75,211 @@ def fit_model(train_X, train_y, test_X, test_y, params):
 
 '''
 Parameters:
+* clf: a fitted gradient boosting regressor.
+* train_X: parameters of the training data it was fitted on.
+* train_y: label for the training data.
+* n_estimators: the number of boosting iterations to grow it to.
+* monitor: called after every new iteration, as in GradientBoostingRegressor.fit().
+
+Function: adds boosting iterations to a fitted model with warm start, rather than
+          fitting a model with more iterations from scratch. A model loaded from the
+          registry gets writable copies of its arrays first. Returns the model.
+'''
+def extend_model(clf, train_X, train_y, n_estimators, monitor=None):
+    clf = registry.writable(clf)
+    clf.set_params(warm_start=True, n_estimators=n_estimators)
+    clf.fit(train_X, train_y, monitor=monitor)
+
+    return clf
+
+
+class HeldOutMonitor(object):
+
+    '''
+    Parameters:
+    * test_X: parameters of the held-out data
+    * test_y: label for the held-out data
+    * patience: stop the fit when the held-out error has not improved for this many
+                iterations, or None to never stop early.
+    * tol: improvements smaller than this do not count.
+
+    Function: monitor for GradientBoostingRegressor.fit() that keeps the mean squared
+              error on held-out data after every boosting iteration. The prediction is
+              updated with the new tree of each iteration, so the whole error curve
+              costs about one prediction of the full model.
+    '''
+    def __init__(self, test_X, test_y, patience=None, tol=0.):
+        self.test_X = test_X
+        self.test_y = test_y
+        self.patience = patience
+        self.tol = tol
+        self.pred_y = None
+        self.errors = []
+
+    def __call__(self, i, clf, fit_locals):
+        if self.pred_y is None:
+            self.pred_y = clf.init_.predict(self.test_X).ravel().astype(np.float64)
+        self.pred_y += clf.learning_rate * clf.estimators_[i, 0].predict(self.test_X)
+        self.errors.append(mean_squared_error(self.test_y, self.pred_y))
+
+        if self.patience is None or len(self.errors) <= self.patience:
+            return False
+        return min(self.errors[-self.patience:]) > min(self.errors[:-self.patience]) - self.tol
+
+
+class StagedCV(object):
+
+    '''
+    Parameters:
+    * X: parameters of the training data
+    * y: label for the training data
+    * k: the number of folds.
+    * params: parameters used for the gradient boosting regressor.
+
+    Function: k-fold cross validation of gradient boosting over every number of
+              boosting iterations at once. Each fold is fitted once, and the held-out
+              error after every iteration gives the learning curve. The fitted models
+              are kept, so the curve can be extended with more iterations later.
+    '''
+    def __init__(self, X, y, k=10, params=PARAMS):
+        self.X = X
+        self.y = y
+        self.params = dict(params)
+        self.folds = list(KFold(n_splits=k, random_state=0, shuffle=True).split(X))
+        self.models = []
+        self.monitors = []
+
+    '''
+    Parameters:
+    * patience, tol: early stopping of each fold, as in HeldOutMonitor.
+
+    Function: fits a model on each fold, with at most params['n_estimators'] iterations.
+    '''
+    def fit(self, patience=None, tol=0.):
+        self.models, self.monitors = [], []
+        for train_index, test_index in self.folds:
+            monitor = HeldOutMonitor(self.X[test_index], self.y[test_index], patience, tol)
+            clf = ensemble.GradientBoostingRegressor(**self.params)
+            clf.fit(self.X[train_index], self.y[train_index], monitor=monitor)
+
+            self.models.append(clf)
+            self.monitors.append(monitor)
+
+        return self
+
+    '''
+    Parameters:
+    * n_estimators: the number of boosting iterations to grow every fold to.
+    * patience, tol: early stopping of each fold, as in HeldOutMonitor.
+
+    Function: adds iterations to the models of every fold with warm start. The held-out
+              errors of the iterations already fitted are kept.
+    '''
+    def extend(self, n_estimators, patience=None, tol=0.):
+        self.params['n_estimators'] = n_estimators
+        for clf, monitor, (train_index, test_index) in zip(self.models, self.monitors, self.folds):
+            monitor.patience, monitor.tol = patience, tol
+            extend_model(clf, self.X[train_index], self.y[train_index], n_estimators, monitor)
+
+        return self
+
+    '''
+    Function: returns the held-out mean squared error after every number of iterations,
+              averaged over the folds. With early stopping, the curve ends where the
+              first fold stopped.
+    '''
+    def curve(self):
+        length = min(len(monitor.errors) for monitor in self.monitors)
+        return np.mean([monitor.errors[:length] for monitor in self.monitors], axis=0)
+
+    '''
+    Function: returns the number of iterations with the lowest cross-validated error,
+              and that error.
+    '''
+    def best(self):
+        curve = self.curve()
+        return int(np.argmin(curve)) + 1, curve.min()
+
+
+'''
+Parameters:
+* clf: the fitted gradient boosting model
+* X: the rows to predict, as a contiguous float32 array.
+
+Function: generates the prediction after every boosting iteration. Each tree is
+          applied to all rows at once and added to the running prediction in place,
+          with the routine staged_predict() uses, so the same array is yielded every
+          time and has to be used before the next one. That routine lives in a private
+          module of scikit-learn, so staged_predict() is used if it cannot be imported.
+'''
+def staged_predictions(clf, X):
+    try:
+        from sklearn.ensemble._gradient_boosting import predict_stage
+    except ImportError:
+        for pred_y in clf.staged_predict(X):
+            yield pred_y
+        return
+
+    score = clf.init_.predict(X).reshape(-1, 1).astype(np.float64)
+    pred_y = score[:, 0]
+    for i in range(clf.estimators_.shape[0]):
+        predict_stage(clf.estimators_, i, X, clf.learning_rate, score)
+        yield pred_y
+
+
+'''
+Parameters:
+* clf: the fitted gradient boosting model
 * test_X: parameters of the test data
 * test_y: label for the test data (i.e. nba_fg3_pct)
-* clf: the fitted gradient boosting model
-* params: parameters used for the gradient boosting regressor
-* columns: the header names of the data
 
-Function: generates two plots: one for the deviance of the training and test data
-          over the number of boosting iterations, and one that ranks the relative
-          importance of the variables used.
+Function: computes the deviance of the test data after every boosting iteration in
+          one pass over the trees (see staged_predictions()). The loss is a single
+          vectorized reduction over the rows, rather than a call of the loss object
+          on a copy of every staged prediction. Gives the same values as that loop,
+          up to rounding.
 '''
-def generate_plots(test_X, test_y, clf, params, columns):
-    
-    # Compute test set deviance.
-    test_score = np.zeros((params['n_estimators'],), dtype=np.float64)
+def staged_deviance(clf, test_X, test_y):
+    X = np.ascontiguousarray(test_X, dtype=np.float32)
+    y = np.asarray(test_y, dtype=np.float64)
+
+    residuals = np.empty(len(y))
+    deviance = np.empty(clf.estimators_.shape[0])
+
+    for i, pred_y in enumerate(staged_predictions(clf, X)):
+        if clf.loss == 'ls':
+            np.subtract(y, pred_y, out=residuals)
+            deviance[i] = residuals.dot(residuals) / len(y)
+        elif clf.loss == 'lad':
+            deviance[i] = np.abs(y - pred_y).mean()
+        else:
+            deviance[i] = clf.loss_(y, pred_y)
 
-    for i, pred_y in enumerate(clf.staged_predict(test_X)):
-        test_score[i] = clf.loss_(test_y, pred_y)
+    return deviance
 
-    plt.figure(figsize=(12,6))
-    plt.subplot(1,2,1)
-    plt.title('Deviance')
-    plt.plot(np.arange(params['n_estimators']) + 1, clf.train_score_, 'b-', label='Training Set Deviance')
-    plt.plot(np.arange(params['n_estimators']) + 1, test_score, 'r-', label='Test Set Deviance')
-    plt.legend(loc='upper right')
-    plt.xlabel('Boosting Iterations')
-    plt.ylabel('Deviance')
+
+'''
+Parameters:
+* figure: the matplotlib figure drawn on.
+* train_score: deviance of the training data after every boosting iteration.
+* test_score: deviance of the test data after every boosting iteration.
+* feature_importance: importance of every variable.
+* columns: the header names of the data
+
+Function: draws the deviance plot and the variable importance plot side by side.
+'''
+def draw_plots(figure, train_score, test_score, feature_importance, columns):
+    iterations = np.arange(len(test_score)) + 1
+
+    deviance = figure.add_subplot(1,2,1)
+    deviance.set_title('Deviance')
+    deviance.plot(iterations, train_score, 'b-', label='Training Set Deviance')
+    deviance.plot(iterations, test_score, 'r-', label='Test Set Deviance')
+    deviance.legend(loc='upper right')
+    deviance.set_xlabel('Boosting Iterations')
+    deviance.set_ylabel('Deviance')
 
     # Plot feature importance relative to the other variables.
-    feature_importance = clf.feature_importances_
     feature_importance = 100.0 * (feature_importance / feature_importance.max())
     sorted_idx = np.argsort(feature_importance)
 
@@ -100,34 +288,86 @@ def generate_plots(test_X, test_y, clf, params, columns):
         col.append(columns[i])
 
     pos = np.arange(sorted_idx.shape[0]) + .5
-    plt.subplot(1,2,2)
-    plt.barh(pos, feature_importance[sorted_idx], align='center')
-    plt.yticks(pos, col)
-    plt.tight_layout()
-    plt.xlabel('Relative Importance')
-    plt.title('Variable Importance')
+    importance = figure.add_subplot(1,2,2)
+    importance.barh(pos, feature_importance[sorted_idx], align='center')
+    importance.set_yticks(pos)
+    importance.set_yticklabels(col)
+    importance.set_xlabel('Relative Importance')
+    importance.set_title('Variable Importance')
+    figure.tight_layout()
+
+
+'''
+Parameters:
+* test_X: parameters of the test data
+* test_y: label for the test data (i.e. nba_fg3_pct)
+* clf: the fitted gradient boosting model
+* params: parameters used for the gradient boosting regressor
+* columns: the header names of the data
+
+Function: generates two plots: one for the deviance of the training and test data
+          over the number of boosting iterations, and one that ranks the relative
+          importance of the variables used.
+'''
+def generate_plots(test_X, test_y, clf, params, columns):
+    import matplotlib.pyplot as plt
+
+    figure = plt.figure(figsize=(12,6))
+    draw_plots(figure, clf.train_score_, staged_deviance(clf, test_X, test_y), clf.feature_importances_, columns)
     plt.show()
 
 
+'''
+Parameters:
+* test_X: parameters of the test data
+* test_y: label for the test data (i.e. nba_fg3_pct)
+* clf: the fitted gradient boosting model
+* columns: the header names of the data
+* filename: the image file the plots are written to (e.g. report.png).
+
+Function: writes the plots of generate_plots() to a file. The figure is drawn with
+          the non-interactive Agg backend and without pyplot, so it works on servers
+          without a display and from several threads or processes at once.
+'''
+def save_plots(test_X, test_y, clf, columns, filename):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=(12,6))
+    FigureCanvasAgg(figure)
+    draw_plots(figure, clf.train_score_, staged_deviance(clf, test_X, test_y), clf.feature_importances_, columns)
+    figure.savefig(filename)
+
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Fit gradient boosting and report its test error.')
+    parser.add_argument('--data', default='transformed.dat', help='dataset transformed by PCA.py')
+    registry.add_arguments(parser)
+    return parser.parse_args()
+
 
 def main():
+    args = parse_args()
     columns = ['X1', 'X2', 'X3', 'X4', 'Y']
-    train_X, train_y = load_dataset('transformed_train.csv')
-    test_X, test_y = load_dataset('transformed_test.csv')
+    train_X, train_y = load_dataset(args.data, 'train')
+    test_X, test_y = load_dataset(args.data, 'test')
     
     # columns = ["name", "ncaa_fg3a", "ncaa_fg3_pct", "ncaa_ft_pct", "ncaa_sos",
     #           "ncaa_team_fg3a_avg", "nba_avg_team_ortg", "nba_relative_team_fg3a", "nba_fg3_pct"]    
     # train_X, train_y = load_dataset('train.csv')
     # test_X, test_y = load_dataset('test.csv')
 
-    params = {}
-    params['n_estimators'] = 3000
-    params['learning_rate'] = .0001
-    params['max_depth'] = 5
+    params = dict(PARAMS)
 
-    clf = fit_model(train_X, train_y, test_X, test_y, params)
+    # A model fitted before on the same data with the same parameters is loaded instead.
+    store = registry.from_args(args)
+    clf = store.cached('boosting', params, train_X, train_y, train_model, columns[:-1])
+    print("Test MSE: %.4f" % mean_squared_error(test_y, clf.predict(test_X)))
+    if store.directory is not None:
+        print(registry.format_stats(store))
 
     # generate_plots(test_X, test_y, clf, params, columns[1:])
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
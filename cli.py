@@ -0,0 +1,70 @@
+"""
+cli.py
+--------------------------------------
+This document contains the command-line entry point of the project. Every
+step of the pipeline is a subcommand, e.g.
+
+	python cli.py scrape --discover 2009-2016
+	python cli.py split
+	python cli.py pca
+	python cli.py cv
+	python cli.py fit boosting
+	python cli.py predict prospects.csv
+	python cli.py report model.pkl
+	python cli.py registry --clear
+
+Each subcommand only imports the script that runs it, so a command does not
+pay for the libraries of the others (see bench_startup.py).
+"""
+
+# LIBRARIES
+import importlib
+import sys
+
+
+# The script that runs each subcommand, and arguments put before the ones given.
+COMMANDS = [
+	('scrape', 'scraper', [], 'scrape NCAA and NBA statistics into data.csv'),
+	('split', 'select_test_train', [], 'split the players into training and test sets'),
+	('pca', 'PCA', [], 'fit the PCA transform and transform the data'),
+	('fit', 'predict', ['--fit'], 'fit a model (boosting, forest, linear or weighted) and save it'),
+	('cv', 'kfold', [], 'cross-validate every model on the training split'),
+	('tune', 'tune_boosting', [], 'search the parameters of gradient boosting'),
+	('predict', 'predict', [], 'score prospects with a saved model'),
+	('report', 'report', [], 'write the plots of saved boosting models to image files'),
+	('registry', 'registry', [], 'list or clear the fitted models kept by the training scripts'),
+]
+
+
+def usage():
+	lines = ['usage: cli.py COMMAND [ARGS...]', '', 'commands:']
+	for command, module, prefix, description in COMMANDS:
+		lines.append('  %-10s %s' % (command, description))
+	lines += ['', 'Run cli.py COMMAND --help for the arguments of a command.']
+	return '\n'.join(lines)
+
+
+'''
+Parameters:
+* argv: the command line, as sys.argv.
+
+Function: Runs the subcommand named by the first argument with the rest of the arguments.
+'''
+def main(argv=None):
+	argv = sys.argv if argv is None else argv
+
+	if len(argv) < 2 or argv[1] in ('-h', '--help'):
+		print usage()
+		return
+
+	commands = dict((command, (module, prefix)) for command, module, prefix, description in COMMANDS)
+	if argv[1] not in commands:
+		sys.exit(usage() + '\n\ncli.py: unknown command ' + argv[1])
+
+	module, prefix = commands[argv[1]]
+	sys.argv = [argv[0] + ' ' + argv[1]] + prefix + argv[2:]
+	importlib.import_module(module).main()
+
+
+if __name__ == '__main__':
+	main()
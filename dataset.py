@@ -0,0 +1,453 @@
+"""
+dataset.py
+--------------------------------------
+This document contains the binary dataset format shared by the model scripts.
+A dataset file holds a matrix of float64 columns with their names, an optional
+column of player names, and a checksum of the data. Files are opened as
+memory maps, so loading takes no parsing and no copy of the data, whatever
+the number of rows. CSV files are only read once, to import them. Train and
+test splits are kept as row indices in a manifest, rather than as copies. A
+dataset written one split after the other (e.g. transformed.dat, by PCA.py)
+records the rows of each split in its header instead, so a split is read as a
+view of the file, like the whole dataset.
+
+Layout of a file:
+	MAGIC (8 bytes)
+	JSON header, padded with spaces to HEADER_BYTES
+	rows x columns float64 matrix, row by row
+	rows fixed-width UTF-8 names (if the dataset has a name column)
+"""
+
+# LIBRARIES
+import json
+import os
+import tempfile
+import zlib
+
+import numpy as np
+
+
+# CONSTANTS
+MAGIC = b'\x93NBADSET'
+VERSION = 1
+
+# Bytes reserved for the header, so that the row count and checksum can be filled
+# in once every row has been written without moving the data.
+HEADER_BYTES = 4096
+
+EXTENSION = '.dat'
+
+# Width of the name column, as in export.DTYPE.
+LABEL_DTYPE = 'S64'
+
+# Rows read from a CSV file at a time while importing it.
+IMPORT_CHUNK_ROWS = 65536
+
+# Row indices of the train and test splits, written by select_test_train.py.
+DEFAULT_MANIFEST = 'split_manifest.npz'
+
+
+class DatasetWriter(object):
+
+	'''
+	Parameters:
+	* filename: the dataset file to write.
+	* columns: names of the float columns.
+	* label_column: name of the column of player names, or None if there is none.
+
+	Function: Streams rows into a dataset file. The file is written under a temporary
+	          name and only takes the place of filename once it is closed, so readers
+	          never see a partly written dataset.
+	'''
+	def __init__(self, filename, columns, label_column=None):
+		self.filename = filename
+		self.columns = list(columns)
+		self.label_column = label_column
+		self.rows = 0
+		self.checksum = 0
+
+		# split -> [first row, end row] of the splits marked with end_split().
+		self.splits = {}
+		self.split_start = 0
+
+		self.tmp_path = filename + '.tmp'
+		self.handle = open(self.tmp_path, 'wb')
+		self.handle.write(b'\0' * (len(MAGIC) + HEADER_BYTES))
+
+		# Names go after the matrix, so they are kept aside until the matrix is done.
+		self.labels = tempfile.TemporaryFile() if label_column is not None else None
+
+
+	'''
+	Parameters:
+	* matrix: rows x len(columns) array of the float columns.
+	* labels: the player name of each row, if the dataset has a name column.
+	'''
+	def write(self, matrix, labels=None):
+		matrix = np.ascontiguousarray(matrix, dtype='<f8')
+		if matrix.ndim != 2 or matrix.shape[1] != len(self.columns):
+			raise ValueError('Expected rows of ' + str(len(self.columns)) + ' columns, got shape ' + str(matrix.shape))
+
+		data = matrix.tobytes()
+		self.handle.write(data)
+		self.checksum = zlib.crc32(data, self.checksum)
+
+		if self.labels is not None:
+			names = [label.encode('utf-8') if not isinstance(label, bytes) else label for label in labels]
+			self.labels.write(np.array(names, dtype=LABEL_DTYPE).tobytes())
+
+		self.rows += matrix.shape[0]
+
+
+	'''
+	Parameters:
+	* name: the name of the split (e.g. train).
+
+	Function: Marks the rows written since the end of the last split as the rows of the
+	          split, so they can be read back as a block of the file.
+	'''
+	def end_split(self, name):
+		self.splits[name] = [self.split_start, self.rows]
+		self.split_start = self.rows
+
+
+	def close(self):
+		if self.labels is not None:
+			self.labels.seek(0)
+			while True:
+				data = self.labels.read(1 << 20)
+				if not data:
+					break
+				self.handle.write(data)
+				self.checksum = zlib.crc32(data, self.checksum)
+			self.labels.close()
+
+		header = json.dumps({
+			'version': VERSION,
+			'rows': self.rows,
+			'columns': self.columns,
+			'dtype': '<f8',
+			'label_column': self.label_column,
+			'label_dtype': LABEL_DTYPE if self.label_column is not None else None,
+			'checksum': self.checksum & 0xffffffff,
+			'splits': self.splits,
+		}, sort_keys=True).encode('utf-8')
+		if len(header) > HEADER_BYTES:
+			raise ValueError('Too many columns for the dataset header')
+
+		self.handle.seek(0)
+		self.handle.write(MAGIC + header + b' ' * (HEADER_BYTES - len(header)))
+		self.handle.close()
+		os.rename(self.tmp_path, self.filename)
+
+
+	'''
+	Function: Stops writing and removes the partly written file.
+	'''
+	def abort(self):
+		self.handle.close()
+		if self.labels is not None:
+			self.labels.close()
+		os.remove(self.tmp_path)
+
+
+class Dataset(object):
+
+	'''
+	Parameters:
+	* filename: a dataset file written by DatasetWriter.
+	* verify: check the data against the checksum in the header. This reads the
+	          whole file, so it is off by default.
+
+	Function: Opens the dataset as read-only memory maps. matrix is the rows x columns
+	          float matrix and labels the names (None if the dataset has no name column).
+	          splits maps the name of each split written as a block to its first and
+	          end rows.
+	'''
+	def __init__(self, filename, verify=False):
+		self.filename = filename
+
+		with open(filename, 'rb') as f:
+			if f.read(len(MAGIC)) != MAGIC:
+				raise ValueError(filename + ' is not a dataset file')
+			header = json.loads(f.read(HEADER_BYTES).decode('utf-8'))
+
+		if header['version'] != VERSION:
+			raise ValueError(filename + ' has dataset version ' + str(header['version']))
+
+		self.rows = header['rows']
+		self.columns = header['columns']
+		self.label_column = header['label_column']
+		self.checksum = header['checksum']
+		self.splits = header.get('splits') or {}
+
+		offset = len(MAGIC) + HEADER_BYTES
+		if self.rows == 0:
+			# Empty files cannot be memory mapped.
+			self.matrix = np.empty((0, len(self.columns)), dtype=header['dtype'])
+			self.labels = np.empty(0, dtype=LABEL_DTYPE) if self.label_column is not None else None
+		else:
+			self.matrix = np.memmap(filename, dtype=header['dtype'], mode='r', offset=offset,
+									shape=(self.rows, len(self.columns)))
+			self.labels = None
+			if self.label_column is not None:
+				self.labels = np.memmap(filename, dtype=header['label_dtype'], mode='r',
+										offset=offset + self.matrix.nbytes, shape=(self.rows,))
+
+		if verify:
+			self.verify()
+
+
+	'''
+	Function: Raises ValueError if the data does not match the checksum in the header.
+	'''
+	def verify(self):
+		checksum = 0
+		with open(self.filename, 'rb') as f:
+			f.seek(len(MAGIC) + HEADER_BYTES)
+			while True:
+				data = f.read(1 << 20)
+				if not data:
+					break
+				checksum = zlib.crc32(data, checksum)
+
+		if checksum & 0xffffffff != self.checksum:
+			raise ValueError(self.filename + ' is corrupt: checksum does not match')
+
+
+	'''
+	Parameters:
+	* name: the name of a column.
+
+	Function: Returns the column as a view of the file. The name column is returned as
+	          UTF-8 bytes.
+	'''
+	def column(self, name):
+		if name == self.label_column:
+			return self.labels
+		return self.matrix[:, self.columns.index(name)]
+
+
+	'''
+	Parameters:
+	* names: names of float columns.
+
+	Function: Returns the rows x len(names) matrix of the columns. Columns that are next
+	          to each other in the file, in the same order, are returned as a view
+	          without copying; other selections are copied.
+	'''
+	def select(self, names):
+		indices = [self.columns.index(name) for name in names]
+		if indices == list(range(indices[0], indices[0] + len(indices))):
+			return self.matrix[:, indices[0]:indices[-1] + 1]
+		return self.matrix[:, indices]
+
+
+	'''
+	Parameters:
+	* split: the name of a split (e.g. train).
+	* manifest: the split manifest, for splits that are not a block of the file.
+
+	Function: Returns the rows of the split: a slice if the split is a block of the file,
+	          so indexing with it returns a view, or else its row indices in the manifest.
+	'''
+	def split_rows(self, split, manifest=DEFAULT_MANIFEST):
+		if split in self.splits:
+			start, end = self.splits[split]
+			return slice(start, end)
+		return read_manifest(manifest, self)[split]
+
+
+	def __len__(self):
+		return self.rows
+
+
+'''
+Parameters:
+* filename: the dataset file to write.
+* matrix: rows x columns array of floats.
+* columns: names of the columns of matrix.
+* labels: the player name of each row, or None.
+* label_column: name of the column of player names.
+
+Function: Writes a whole dataset at once.
+'''
+def write(filename, matrix, columns, labels=None, label_column='name'):
+	writer = DatasetWriter(filename, columns, label_column if labels is not None else None)
+	writer.write(matrix, labels)
+	writer.close()
+
+
+'''
+Parameters:
+* filename: the CSV file to import.
+* target: the dataset file to write.
+
+Function: Converts a CSV file into a dataset file, a chunk of rows at a time. Files
+          without a header get the columns X1, X2, ... and Y for the last one.
+'''
+def import_csv(filename, target):
+	import pandas as pd
+
+	first_row = pd.read_csv(filename, sep=',', header=None, nrows=1, dtype=str).values[0]
+
+	try:
+		[float(value) for value in first_row]
+		names = ['X' + str(i + 1) for i in range(len(first_row) - 1)] + ['Y']
+		header = None
+	except ValueError:
+		names = None
+		header = 0
+
+	# Parsed with round_trip so the imported floats are exactly the ones that were saved.
+	chunks = pd.read_csv(filename, sep=',', header=header, names=names, float_precision='round_trip',
+						chunksize=IMPORT_CHUNK_ROWS)
+	import_frames(chunks, filename, target)
+
+
+'''
+Parameters:
+* frames: pandas DataFrames of consecutive rows, all with the same columns.
+* filename: the file the rows come from, for error messages.
+* target: the dataset file to write.
+
+Function: Writes the rows of the DataFrames into a dataset file. A column that is not
+          numeric is kept as the name column.
+'''
+def import_frames(frames, filename, target):
+	writer = None
+	try:
+		for frame in frames:
+			frame = frame.dropna(how='all') # drops the empty line at file-end
+
+			if writer is None:
+				labels = [str(column) for column in frame.columns if frame[column].dtype.kind not in 'biuf']
+				if len(labels) > 1:
+					raise ValueError(filename + ' has more than one text column: ' + ', '.join(labels))
+				label_column = labels[0] if labels else None
+				columns = [str(column) for column in frame.columns if str(column) != label_column]
+				writer = DatasetWriter(target, columns, label_column)
+
+			labels = frame[label_column].values if label_column is not None else None
+			writer.write(frame[columns].values, labels)
+	except:
+		if writer is not None:
+			writer.abort()
+		raise
+
+	if writer is None:
+		raise ValueError(filename + ' is empty')
+	writer.close()
+
+
+'''
+Parameters:
+* filename: a dataset file, or a file written by the scraper (.csv, .parquet, .feather or .npy).
+* verify: check the data against its checksum.
+
+Function: Opens a dataset. Given a file written by the scraper, or a dataset file that
+          does not exist yet next to a CSV file of the same name, that file is imported
+          into a dataset file first. The import is done again only if the file changes.
+'''
+def load(filename, verify=False):
+	base, extension = os.path.splitext(filename)
+	if extension.lower() == EXTENSION:
+		source, path = base + '.csv', filename
+	else:
+		source, path = filename, base + EXTENSION
+
+	if os.path.exists(source) and (not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source)):
+		if source.lower().endswith('.csv'):
+			import_csv(source, path)
+		else:
+			import export
+			import_frames([export.read_stats(source)], source, path)
+
+	return Dataset(path, verify)
+
+
+'''
+Parameters:
+* data: an open Dataset.
+
+Function: Helper function to compute a checksum of the name column, so that a split
+          manifest can tell whether it was made for the rows of a dataset.
+'''
+def names_checksum(data):
+	if data.labels is None:
+		return 0
+	return zlib.crc32(np.ascontiguousarray(data.labels).tobytes()) & 0xffffffff
+
+
+'''
+Parameters:
+* filename: the .npz file the manifest is written to.
+* data: the Dataset the splits were made for.
+* splits: maps the name of each split (e.g. train) to the indices of its rows.
+
+Function: Writes a split manifest: the row indices of each split, instead of a copy of
+          its rows.
+'''
+def write_manifest(filename, data, splits):
+	arrays = dict((split, np.asarray(rows, dtype='<i4')) for split, rows in splits.items())
+	np.savez(filename, rows=len(data), names_checksum=names_checksum(data), **arrays)
+
+
+'''
+Parameters:
+* filename: a split manifest.
+* data: the Dataset the splits are applied to. It can be any dataset with the same
+        rows as the one the manifest was made for (e.g. its PCA transform).
+
+Function: Returns a dictionary of the row indices of each split.
+'''
+def read_manifest(filename, data):
+	manifest = np.load(filename)
+	if int(manifest['rows']) != len(data) or int(manifest['names_checksum']) != names_checksum(data):
+		raise ValueError(filename + ' was made for other rows than ' + data.filename + '; run select_test_train.py again')
+
+	return dict((split, manifest[split]) for split in manifest.files if split not in ('rows', 'names_checksum'))
+
+
+'''
+Parameters:
+* filename: a dataset file, or a file written by the scraper (see load()).
+* split: the name of a split in the manifest (e.g. train), or None for every row.
+* manifest: the split manifest, written by select_test_train.py.
+
+Function: Returns the float matrix of the rows of the split. This is a view of the
+          dataset file, unless the split is not a block of the file (see
+          Dataset.split_rows()) and its rows are gathered into memory.
+'''
+def load_matrix(filename, split=None, manifest=DEFAULT_MANIFEST):
+	data = load(filename)
+	if split is None:
+		return data.matrix
+
+	return data.matrix[data.split_rows(split, manifest)]
+
+
+'''
+Parameters:
+* filename: a dataset file, or a file written by the scraper (see load()).
+* features: names of the feature columns. Defaults to every float column but the target.
+* target: name of the label column. Defaults to the last float column.
+* split: the name of a split in the manifest (e.g. train), or None for every row.
+* manifest: the split manifest, written by select_test_train.py.
+
+Function: Returns the features and labels. They are views of the dataset file, unless
+          the split is not a block of the file (see Dataset.split_rows()) and its rows
+          are gathered into memory.
+'''
+def load_xy(filename, features=None, target=None, split=None, manifest=DEFAULT_MANIFEST):
+	data = load(filename)
+
+	target = target or data.columns[-1]
+	features = features or [column for column in data.columns if column != target]
+	X, y = data.select(features), data.column(target)
+
+	if split is not None:
+		rows = data.split_rows(split, manifest)
+		X, y = X[rows], y[rows]
+
+	return X, y
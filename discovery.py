@@ -0,0 +1,105 @@
+"""
+discovery.py
+--------------------------------------
+This document contains the roster discovery of the scraper. Instead of a
+hand-maintained list of players, the roster is read from the draft class
+pages of basketball-reference.com, plus the rookie pages of each season for
+players who went undrafted. Players are produced one page at a time, so the
+roster never has to be held in memory as a whole.
+"""
+
+# LIBRARIES
+import re
+
+from itertools import islice
+
+
+# CONSTANTS
+NBA_PLAYER_LINK = re.compile(r'^/players/[a-z]/[a-z0-9]+\.html$')
+
+
+'''
+Parameters:
+* soup: the HTML parser for a draft class page (e.g. /draft/NBA_2009.html)
+
+Function: Reads the name, webpage path and college of every drafted player on the page.
+          The college is None for players drafted from outside the NCAA.
+'''
+def read_draft_page(soup):
+	players = []
+	for row in soup.find(id='stats').select('tbody > tr'):
+		cell = row.find('td', attrs={'data-stat': 'player'})
+		link = cell.find('a', href=NBA_PLAYER_LINK) if cell is not None else None
+		if link is None:
+			# Header rows repeated through the table, and picks that never played in the NBA.
+			continue
+
+		college = row.find('td', attrs={'data-stat': 'college_name'})
+		college = college.get_text().strip() if college is not None else ''
+		players.append((link.get_text(), link['href'], college or None))
+
+	return players
+
+
+'''
+Parameters:
+* soup: the HTML parser for a season's rookie page (e.g. /leagues/NBA_2010_rookies.html)
+
+Function: Reads the name and webpage path of every rookie of the season.
+'''
+def read_rookie_page(soup):
+	players = []
+	for row in soup.find(id='rookies').select('tbody > tr'):
+		cell = row.find('td', attrs={'data-stat': 'player'})
+		link = cell.find('a', href=NBA_PLAYER_LINK) if cell is not None else None
+		if link is not None:
+			players.append((link.get_text(), link['href']))
+
+	return players
+
+
+'''
+Parameters:
+* fetch_soup: function that downloads and parses a basketball-reference.com webpage
+              given its path, as fetch_soup(path).
+* drafts: the draft years to read (e.g. range(2009, 2017)).
+* rookies: also read the rookie page of the season after each draft, to find players
+           who went undrafted.
+
+Function: Generates the (name, NBA webpage path) of every player of the draft classes,
+          skipping players drafted from outside the NCAA. Each player is generated
+          once, even if they appear on several pages. Pages are only downloaded as
+          players are consumed.
+'''
+def discover_players(fetch_soup, drafts, rookies=True):
+	seen = set()
+
+	for year in drafts:
+		drafted = read_draft_page(fetch_soup('/draft/NBA_' + str(year) + '.html'))
+		for name, path, college in drafted:
+			seen.add(path)
+			if college is not None:
+				yield name, path
+
+		if rookies:
+			for name, path in read_rookie_page(fetch_soup('/leagues/NBA_' + str(year + 1) + '_rookies.html')):
+				if path not in seen:
+					seen.add(path)
+					yield name, path
+
+
+'''
+Parameters:
+* players: any iterable, e.g. the generator returned by discover_players().
+* size: largest number of items in a batch.
+
+Function: Helper function to split an iterable into lists of at most size items,
+          without reading more of it than the current batch.
+'''
+def batches(players, size):
+	players = iter(players)
+	while True:
+		batch = list(islice(players, size))
+		if not batch:
+			return
+		yield batch
@@ -0,0 +1,240 @@
+"""
+export.py
+--------------------------------------
+This document contains the writers the scraper streams its rows to. Rows are
+written as soon as each player is done, as CSV, Parquet, Feather, or a typed
+binary NumPy file, depending on the extension of the output file.
+"""
+
+# LIBRARIES
+import csv
+import os
+
+import numpy as np
+
+
+# CONSTANTS
+COLUMNS = ['name', 'ncaa_fg3a', 'ncaa_fg3_pct', 'ncaa_ft_pct', 'ncaa_sos', 'ncaa_team_fg3a_avg',
+		'nba_avg_team_ortg', 'nba_relative_team_fg3a', 'nba_fg3_pct']
+
+# Type of each column in the typed formats. Names are stored as fixed-width UTF-8.
+DTYPE = np.dtype([('name', 'S64')] + [(column, '<f8') for column in COLUMNS[1:]])
+
+# Number of rows buffered before a Parquet row group or a Feather record batch is written.
+PARQUET_ROW_GROUP = 1024
+
+# Bytes reserved for the header of a streamed .npy file, so that the row count can be
+# filled in when the file is closed without moving the data.
+NPY_HEADER_BYTES = 512
+
+
+'''
+Parameters:
+* value: a cell of a row, or any text.
+
+Function: Helper function to encode unicode text, such as the names of discovered
+          players (e.g. Jakob P\xf6ltl), as UTF-8 bytes. The csv module and print only
+          take bytes beyond ASCII. Other values are returned as they are.
+'''
+def utf8(value):
+	if isinstance(value, unicode):
+		return value.encode('utf-8')
+	return value
+
+
+'''
+Parameters:
+* pa: the pyarrow module.
+
+Function: Returns the Arrow schema of the rows, for the Parquet and Feather sinks.
+'''
+def arrow_schema(pa):
+	return pa.schema([pa.field('name', pa.string())] + [pa.field(column, pa.float64()) for column in COLUMNS[1:]])
+
+
+class CsvSink(object):
+
+	'''
+	Parameters:
+	* filename: the CSV file to write.
+
+	Function: Writes the header, then each row as soon as it is received.
+	'''
+	def __init__(self, filename):
+		self.handle = open(filename, 'w')
+		self.writer = csv.writer(self.handle)
+		self.writer.writerow(COLUMNS)
+
+
+	def write(self, row):
+		self.writer.writerow([utf8(value) for value in row])
+		self.handle.flush()
+
+
+	def close(self):
+		self.handle.close()
+
+
+class NpySink(object):
+
+	'''
+	Parameters:
+	* filename: the .npy file to write.
+
+	Function: Streams rows into a .npy file of DTYPE records. The header is rewritten with
+	          the final row count when the file is closed, and the file can then be opened
+	          with np.load(filename, mmap_mode='r').
+	'''
+	def __init__(self, filename):
+		self.handle = open(filename, 'wb')
+		self.rows = 0
+		self.write_header()
+
+
+	def write_header(self):
+		header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (DTYPE.descr, self.rows)
+		prefix = b'\x93NUMPY\x01\x00'
+		padding = NPY_HEADER_BYTES - len(prefix) - 2 - len(header) - 1
+
+		self.handle.seek(0)
+		self.handle.write(prefix)
+		self.handle.write(np.array([NPY_HEADER_BYTES - len(prefix) - 2], dtype='<u2').tobytes())
+		self.handle.write(header.encode('latin1') + b' ' * padding + b'\n')
+
+
+	def write(self, row):
+		record = np.array([tuple([utf8(row[0])] + [float(value) for value in row[1:]])], dtype=DTYPE)
+		self.handle.write(record.tobytes())
+		self.handle.flush()
+		self.rows += 1
+
+
+	def close(self):
+		self.write_header()
+		self.handle.close()
+
+
+class ParquetSink(object):
+
+	'''
+	Parameters:
+	* filename: the .parquet file to write.
+
+	Function: Streams rows into a Parquet file, one row group every PARQUET_ROW_GROUP rows.
+	          Needs the pyarrow package.
+	'''
+	def __init__(self, filename):
+		import pyarrow as pa
+		import pyarrow.parquet as pq
+
+		self.pa = pa
+		self.schema = arrow_schema(pa)
+		self.writer = pq.ParquetWriter(filename, self.schema)
+		self.buffer = []
+
+
+	def write(self, row):
+		self.buffer.append(row)
+		if len(self.buffer) >= PARQUET_ROW_GROUP:
+			self.flush()
+
+
+	def flush(self):
+		if not self.buffer:
+			return
+
+		arrays = [self.pa.array([row[i] for row in self.buffer], type=field.type) for i, field in enumerate(self.schema)]
+		self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+		self.buffer = []
+
+
+	def close(self):
+		self.flush()
+		self.writer.close()
+
+
+class FeatherSink(ParquetSink):
+
+	'''
+	Parameters:
+	* filename: the .feather file to write.
+
+	Function: Streams rows into a Feather (version 2) file, which is an Arrow IPC file,
+	          one record batch every PARQUET_ROW_GROUP rows. Needs the pyarrow package.
+	'''
+	def __init__(self, filename):
+		import pyarrow as pa
+
+		self.pa = pa
+		self.schema = arrow_schema(pa)
+		self.writer = pa.RecordBatchFileWriter(filename, self.schema)
+		self.buffer = []
+
+
+class TeeSink(object):
+
+	'''
+	Parameters:
+	* sinks: the sinks every row is written to.
+	'''
+	def __init__(self, sinks):
+		self.sinks = sinks
+
+
+	def write(self, row):
+		for sink in self.sinks:
+			sink.write(row)
+
+
+	def close(self):
+		for sink in self.sinks:
+			sink.close()
+
+
+SINKS = {
+	'.csv': CsvSink,
+	'.npy': NpySink,
+	'.parquet': ParquetSink,
+	'.feather': FeatherSink,
+}
+
+
+'''
+Parameters:
+* filenames: the output files. The format of each is picked by its extension.
+
+Function: Opens a sink that writes every row to all of the output files.
+'''
+def open_sink(filenames):
+	sinks = []
+	for filename in filenames:
+		extension = os.path.splitext(filename)[1].lower()
+		if extension not in SINKS:
+			raise ValueError('Unsupported output format: ' + filename)
+		sinks.append(SINKS[extension](filename))
+
+	return TeeSink(sinks)
+
+
+'''
+Parameters:
+* filename: a file written by one of the sinks.
+
+Function: Reads the rows back into a pandas DataFrame. Parquet, Feather and .npy files
+          are loaded with their types and without parsing text.
+'''
+def read_stats(filename):
+	import pandas as pd
+
+	extension = os.path.splitext(filename)[1].lower()
+	if extension == '.parquet':
+		return pd.read_parquet(filename)
+	if extension == '.feather':
+		return pd.read_feather(filename)
+	if extension == '.npy':
+		records = np.load(filename, mmap_mode='r')
+		df = pd.DataFrame.from_records(records)
+		df['name'] = df['name'].str.decode('utf-8')
+		return df
+
+	return pd.read_csv(filepath_or_buffer=filename, sep=',')
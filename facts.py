@@ -0,0 +1,301 @@
+"""
+facts.py
+--------------------------------------
+This document contains the fact tables of the scraper. Rather than only the
+features of each player, the scraper keeps the raw numbers they come from:
+a row per player with their career totals, a row per NBA team-season and a
+row per NCAA school-season. Each table is stored column by column in flat
+binary files, and every feature of data.csv is computed from them with
+vectorized group-by sums over all players at once, e.g.
+
+	python facts.py --output data.csv
+"""
+
+# LIBRARIES
+import argparse
+import os
+import threading
+
+import numpy as np
+
+# local files in directory
+import export
+
+
+# CONSTANTS
+DEFAULT_FACTS_DIR = 'facts'
+
+# Columns of each table, as (name, type).
+PLAYER_COLUMNS = [
+	('name', 'S64'), ('nba_fg3', '<i4'), ('nba_fg3a', '<i4'),
+	('ncaa_fg3', '<i4'), ('ncaa_fg3a', '<i4'), ('ncaa_ft', '<i4'), ('ncaa_fta', '<i4'), ('ncaa_sos', '<f8'),
+]
+NBA_SEASON_COLUMNS = [
+	('player', '<i4'), ('season', '<i2'), ('team', 'S3'),
+	('team_ortg', '<f8'), ('team_fg3a', '<f8'), ('league_fg3a', '<f8'),
+]
+NCAA_SEASON_COLUMNS = [
+	('player', '<i4'), ('season', '<i2'), ('school', 'S48'), ('school_g', '<i4'), ('school_fg3a', '<i4'),
+]
+
+
+class Table(object):
+
+	'''
+	Parameters:
+	* directory: folder of the table, with one file per column. Created if it does not exist.
+	* columns: the (name, type) of each column.
+
+	Function: Append-only table stored column by column. If a run was killed while
+	          appending, the columns are cut back to the last complete row.
+	'''
+	def __init__(self, directory, columns):
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+
+		self.columns = [(name, np.dtype(dtype)) for name, dtype in columns]
+		self.paths = dict((name, os.path.join(directory, name + '.bin')) for name, dtype in self.columns)
+
+		rows = []
+		for name, dtype in self.columns:
+			size = os.path.getsize(self.paths[name]) if os.path.exists(self.paths[name]) else 0
+			rows.append(size // dtype.itemsize)
+		self.truncate(min(rows))
+
+
+	'''
+	Parameters:
+	* rows: the number of rows to keep.
+	'''
+	def truncate(self, rows):
+		self.rows = rows
+		for name, dtype in self.columns:
+			with open(self.paths[name], 'ab') as f:
+				f.truncate(rows * dtype.itemsize)
+
+
+	'''
+	Parameters:
+	* values: maps every column to a sequence of values, one per new row.
+	'''
+	def append(self, values):
+		count = None
+		for name, dtype in self.columns:
+			column = np.asarray(values[name], dtype=dtype)
+			if count is not None and len(column) != count:
+				raise ValueError('Columns of different lengths appended')
+			count = len(column)
+
+			with open(self.paths[name], 'ab') as f:
+				f.write(column.tobytes())
+
+		self.rows += count
+
+
+	'''
+	Function: Returns a dictionary of the columns, as read-only memory maps of their files.
+	'''
+	def read(self):
+		data = {}
+		for name, dtype in self.columns:
+			if self.rows == 0:
+				# Empty files cannot be memory mapped.
+				data[name] = np.empty(0, dtype=dtype)
+			else:
+				data[name] = np.memmap(self.paths[name], dtype=dtype, mode='r', shape=(self.rows,))
+		return data
+
+
+	def __len__(self):
+		return self.rows
+
+
+'''
+Parameters:
+* record: a journal record of the scraper (see scraper.scrape_player()).
+* player: the id of the player's row.
+
+Function: Helper function to turn a journal record into the rows of the three tables.
+'''
+def record_rows(record, player=0):
+	fg3, fg3a = record['nba_totals']
+	ncaa_fg3, ncaa_fg3a, ncaa_ft, ncaa_fta, ncaa_sos = record['ncaa_totals']
+	players = {
+		'name': [export.utf8(record['player'])], 'nba_fg3': [fg3], 'nba_fg3a': [fg3a],
+		'ncaa_fg3': [ncaa_fg3], 'ncaa_fg3a': [ncaa_fg3a], 'ncaa_ft': [ncaa_ft], 'ncaa_fta': [ncaa_fta],
+		'ncaa_sos': [ncaa_sos],
+	}
+
+	# Seasons are named like 2009-10 on the NBA site, and kept as the year they end in.
+	nba = record['nba_seasons']
+	nba_seasons = {
+		'player': [player] * len(nba),
+		'season': [int(season[0][:4]) + 1 for season in nba],
+		'team': [season[1].split('/')[2] for season in nba],
+		'team_ortg': [float(season[2]) for season in nba],
+		'team_fg3a': [float(season[3]) for season in nba],
+		'league_fg3a': [float(season[4]) for season in nba],
+	}
+
+	# School-season links look like /cbb/schools/davidson/2009.html.
+	ncaa = record['ncaa_seasons']
+	ncaa_seasons = {
+		'player': [player] * len(ncaa),
+		'season': [int(season[0].split('/')[4][:4]) for season in ncaa],
+		'school': [season[0].split('/')[3] for season in ncaa],
+		'school_g': [season[1] for season in ncaa],
+		'school_fg3a': [season[2] for season in ncaa],
+	}
+
+	return players, nba_seasons, ncaa_seasons
+
+
+'''
+Parameters:
+* values: maps every column to a sequence of values.
+* columns: the (name, type) of each column.
+
+Function: Helper function to turn the columns into arrays of their types.
+'''
+def as_arrays(values, columns):
+	return dict((name, np.asarray(values[name], dtype=dtype)) for name, dtype in columns)
+
+
+'''
+Parameters:
+* players: the player table, as a dictionary of columns.
+* nba_seasons: the NBA team-season table. Rows of a player are next to each other, in season order.
+* ncaa_seasons: the NCAA school-season table.
+
+Function: Computes the features of every player, with group-by sums over the season
+          tables. Returns the rows x len(export.COLUMNS) - 1 feature matrix, in the
+          order of export.COLUMNS after the name. Features that divide by zero are NaN.
+'''
+def compute_features(players, nba_seasons, ncaa_seasons):
+	n = len(players['name'])
+	nba_player = nba_seasons['player']
+	ncaa_player = ncaa_seasons['player']
+
+	# A player traded during a season has a row for every team, but the league
+	# average of that season only counts once.
+	new_season = np.ones(len(nba_player), dtype=bool)
+	new_season[1:] = (nba_player[1:] != nba_player[:-1]) | (nba_seasons['season'][1:] != nba_seasons['season'][:-1])
+
+	with np.errstate(divide='ignore', invalid='ignore'):
+		nba_fg3_pct = 100. * players['nba_fg3'] / players['nba_fg3a']
+		nba_avg_team_ortg = np.bincount(nba_player, nba_seasons['team_ortg'], n) / np.bincount(nba_player, minlength=n)
+		nba_relative_team_fg3a = np.bincount(nba_player, nba_seasons['team_fg3a'], n) / \
+			np.bincount(nba_player[new_season], nba_seasons['league_fg3a'][new_season], n)
+
+		ncaa_fg3_pct = 100. * players['ncaa_fg3'] / players['ncaa_fg3a']
+		ncaa_ft_pct = 100. * players['ncaa_ft'] / players['ncaa_fta']
+		ncaa_team_fg3a_avg = np.bincount(ncaa_player, ncaa_seasons['school_fg3a'], n) / \
+			np.bincount(ncaa_player, ncaa_seasons['school_g'], n)
+
+	return np.column_stack((players['ncaa_fg3a'], ncaa_fg3_pct, ncaa_ft_pct, players['ncaa_sos'], ncaa_team_fg3a_avg,
+							nba_avg_team_ortg, nba_relative_team_fg3a, nba_fg3_pct))
+
+
+'''
+Parameters:
+* record: a journal record of the scraper.
+
+Function: Computes the row of data.csv of one player, the same way as for the whole
+          fact table. Raises ValueError if a feature cannot be computed (e.g. a player
+          who never attempted a 3-pointer).
+'''
+def player_row(record):
+	players, nba_seasons, ncaa_seasons = record_rows(record)
+	features = compute_features(as_arrays(players, PLAYER_COLUMNS), as_arrays(nba_seasons, NBA_SEASON_COLUMNS),
+								as_arrays(ncaa_seasons, NCAA_SEASON_COLUMNS))[0]
+	if not np.all(np.isfinite(features)):
+		raise ValueError('missing stats for ' + record['player'])
+
+	return make_row(record['player'], features)
+
+
+'''
+Parameters:
+* name: the player's name.
+* features: the player's row of the feature matrix.
+
+Function: Helper function to form a row of data.csv. The NCAA 3-point attempts are a count.
+'''
+def make_row(name, features):
+	row = [name] + features.tolist()
+	row[1] = int(row[1])
+	return row
+
+
+class FactStore(object):
+
+	'''
+	Parameters:
+	* directory: folder of the three tables.
+
+	Function: Stores the raw numbers of every scraped player. A player scraped again gets
+	          new rows; the latest rows of a name are the ones used.
+	'''
+	def __init__(self, directory=DEFAULT_FACTS_DIR):
+		self.lock = threading.Lock()
+		self.players = Table(os.path.join(directory, 'players'), PLAYER_COLUMNS)
+		self.nba_seasons = Table(os.path.join(directory, 'nba_seasons'), NBA_SEASON_COLUMNS)
+		self.ncaa_seasons = Table(os.path.join(directory, 'ncaa_seasons'), NCAA_SEASON_COLUMNS)
+
+		# Season rows are written before the row of their player, so a run killed in
+		# between leaves season rows of a player that does not exist.
+		for table in [self.nba_seasons, self.ncaa_seasons]:
+			table.truncate(int(np.searchsorted(table.read()['player'], len(self.players))))
+
+
+	'''
+	Parameters:
+	* record: a journal record of the scraper.
+	'''
+	def add(self, record):
+		with self.lock:
+			players, nba_seasons, ncaa_seasons = record_rows(record, len(self.players))
+			self.nba_seasons.append(nba_seasons)
+			self.ncaa_seasons.append(ncaa_seasons)
+			self.players.append(players)
+
+
+	'''
+	Function: Returns the names and feature matrix (see compute_features()) of every
+	          player, in the order they were last scraped.
+	'''
+	def features(self):
+		with self.lock:
+			players = self.players.read()
+			features = compute_features(players, self.nba_seasons.read(), self.ncaa_seasons.read())
+
+		# Keep the last row of every name.
+		names = players['name']
+		unique, last = np.unique(names[::-1], return_index=True)
+		latest = np.sort(len(names) - 1 - last)
+
+		return names[latest], features[latest]
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Compute the features of every scraped player from the fact tables.')
+	parser.add_argument('--facts', default=DEFAULT_FACTS_DIR, help='folder of the fact tables')
+	parser.add_argument('--output', action='append',
+						help='file the rows are written to, as .csv, .parquet, .feather or .npy (default data.csv); may be repeated')
+	args = parser.parse_args()
+
+	names, features = FactStore(args.facts).features()
+
+	outputs = args.output or ['data.csv']
+	sink = export.open_sink(outputs)
+	try:
+		for name, row in zip(names, features):
+			sink.write(make_row(name.decode('utf-8'), row))
+	finally:
+		sink.close()
+
+	print 'Wrote ' + str(len(names)) + ' players to ' + ', '.join(outputs) + '.'
+
+
+if __name__ == '__main__':
+	main()
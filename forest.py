@@ -2,39 +2,123 @@
 forest.py
 --------------------------------------
 This document runs a basic random forest decision tree model with some base parameters
-on PCA-transformed data.
+on PCA-transformed data. Trees are built on every core, the out-of-bag error is
+reported without a separate cross validation, and the forest can be grown until
+that error stops changing instead of always building every tree.
 """
 
 # LIBRARIES
+import argparse
+
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
 
 from sklearn import ensemble
-from sklearn import datasets
-from sklearn.utils import shuffle
 from sklearn.metrics import mean_squared_error
-from sklearn.grid_search import GridSearchCV
+
+# local files in directory
+import dataset
+import PCA
+import registry
+
+
+# CONSTANTS
+# A fixed random_state makes fits repeatable, e.g. across the workers of kfold.py.
+# The trees are the same for any n_jobs; -1 builds them on every core.
+PARAMS = {'n_estimators': 3000, 'max_depth': 4, 'random_state': 0, 'n_jobs': -1}
+
+# Trees added at a time when growing a forest until its out-of-bag error converges.
+CONVERGENCE_STEP = 100
+
+# The forest has converged when adding a step of trees changes the out-of-bag error
+# by less than this fraction.
+CONVERGENCE_TOL = .001
 
 
 '''
 Parameters:
-* filename: csv file to be loaded.
+* filename: dataset file to be loaded (see dataset.py).
+* split: the split to read (train or test).
 
 Function: read in data to use in gradient boosting regression code.
 '''
-def load_dataset(filename, columns = None):
-    df = pd.read_csv(filepath_or_buffer=filename, sep=',')
+def load_dataset(filename, split):
+    return dataset.load_xy(filename, split=split)
 
-    if columns:
-        df.columns = columns
 
-    df.dropna(how="all", inplace=True) # drops the empty line at file-end
-    df.tail()
-    X = df.ix[:,0:4].values
-    Y = df.ix[:,4].values
+'''
+Parameters:
+* train_X: parameters of the training data (e.g. ncaa_fg3)
+* train_y: label for the training data (i.e. nba_fg3_pct)
+* params: parameters used for the random forest regressor.
 
-    return X, Y    
+Function: builds and returns a random forest regressor fitted on the training data.
+'''
+def train_model(train_X, train_y, params=PARAMS):
+    clf = ensemble.RandomForestRegressor(**params)
+    clf.fit(train_X, train_y)
+
+    return clf
+
+
+'''
+Parameters:
+* clf: a random forest regressor fitted with oob_score=True.
+* train_y: label for the training data it was fitted on.
+
+Function: the mean squared error of the out-of-bag predictions: every training row is
+          predicted by the trees whose bootstrap sample left it out, so this estimates
+          the test error without a separate cross validation.
+'''
+def oob_error(clf, train_y):
+    return mean_squared_error(train_y, clf.oob_prediction_)
+
+
+'''
+Parameters:
+* train_X: parameters of the training data (e.g. ncaa_fg3)
+* train_y: label for the training data (i.e. nba_fg3_pct)
+* params: parameters used for the random forest regressor; n_estimators is the most
+          trees built.
+* step: number of trees added at a time.
+* tol: stop when a step changes the out-of-bag error by less than this fraction.
+
+Function: grows a random forest with warm start, step trees at a time, until its
+          out-of-bag error converges. The trees are drawn from the same random stream
+          as a forest built in one go, so the result is the forest of that many trees.
+          Returns the forest and the (trees, out-of-bag error) after every step.
+'''
+def train_converged(train_X, train_y, params=PARAMS, step=CONVERGENCE_STEP, tol=CONVERGENCE_TOL):
+    max_estimators = params['n_estimators']
+    clf = ensemble.RandomForestRegressor(**dict(params, n_estimators=min(step, max_estimators),
+                                                oob_score=True, warm_start=True))
+    clf.fit(train_X, train_y)
+    history = [(clf.n_estimators, oob_error(clf, train_y))]
+
+    while clf.n_estimators < max_estimators:
+        clf.set_params(n_estimators=min(clf.n_estimators + step, max_estimators))
+        clf.fit(train_X, train_y)
+        history.append((clf.n_estimators, oob_error(clf, train_y)))
+
+        if abs(history[-1][1] - history[-2][1]) < tol * history[-2][1]:
+            break
+
+    return clf, history
+
+
+'''
+Parameters:
+* train_X: parameters of the training data (e.g. ncaa_fg3)
+* train_y: label for the training data (i.e. nba_fg3_pct)
+* params: parameters used for the random forest regressor, along with the step and
+          tol of train_converged().
+
+Function: Helper function to call train_converged() with all of its parameters in one
+          dictionary, as registry.ModelRegistry.cached() passes them.
+'''
+def train_schedule(train_X, train_y, params):
+    params = dict(params)
+    step, tol = params.pop('step'), params.pop('tol')
+    return train_converged(train_X, train_y, params, step, tol)
 
 
 '''
@@ -48,9 +132,7 @@ Parameters:
 Function: builds a random forest regressor using the data and specified parameters.
 '''
 def fit_model(train_X, train_y, test_X, test_y, params):
-    clf = ensemble.RandomForestRegressor(**params)
-
-    clf.fit(train_X, train_y)
+    clf = train_model(train_X, train_y, params)
     # mse = mean_squared_error(test_y, clf.predict(test_X))
     # print("MSE: %.4f" % mse)
 
@@ -58,17 +140,41 @@ def fit_model(train_X, train_y, test_X, test_y, params):
 
 
 
-def main():
-    columns = ['X1', 'X2', 'X3', 'X4', 'Y']
-    train_X, train_y = load_dataset('transformed_train.csv')
-    test_X, test_y = load_dataset('transformed_test.csv')
+def parse_args():
+    parser = argparse.ArgumentParser(description='Fit a random forest and report its out-of-bag and test errors.')
+    parser.add_argument('--data', default='transformed.dat', help='dataset transformed by PCA.py')
+    parser.add_argument('--jobs', type=int, default=PARAMS['n_jobs'], help='cores the trees are built on (-1 for all)')
+    parser.add_argument('--converge', action='store_true',
+                        help='add trees until the out-of-bag error converges, up to ' + str(PARAMS['n_estimators']))
+    parser.add_argument('--step', type=int, default=CONVERGENCE_STEP, help='trees added at a time with --converge')
+    parser.add_argument('--tol', type=float, default=CONVERGENCE_TOL,
+                        help='relative change of the out-of-bag error that counts as converged')
+    registry.add_arguments(parser)
+    return parser.parse_args()
 
-    params = {}
-    params['n_estimators'] = 3000
-    params['max_depth'] = 4
-    
-    clf = fit_model(train_X, train_y, test_X, test_y, params)
 
+def main():
+    args = parse_args()
+    train_X, train_y = load_dataset(args.data, 'train')
+    test_X, test_y = load_dataset(args.data, 'test')
+
+    params = dict(PARAMS, n_jobs=args.jobs)
+
+    # A forest fitted before on the same data with the same parameters is loaded instead.
+    store = registry.from_args(args)
+    if args.converge:
+        # The growth schedule is part of the key; the forest is stored with its history.
+        clf, history = store.cached('forest-converged', dict(params, step=args.step, tol=args.tol),
+                                    train_X, train_y, train_schedule, PCA.COMPONENTS[:-1])
+        for n_estimators, error in history:
+            print('%5d trees: out-of-bag MSE %.4f' % (n_estimators, error))
+    else:
+        clf = store.cached('forest', dict(params, oob_score=True), train_X, train_y, train_model, PCA.COMPONENTS[:-1])
+
+    print('Out-of-bag MSE: %.4f' % oob_error(clf, train_y))
+    print('Test MSE: %.4f' % mean_squared_error(test_y, clf.predict(test_X)))
+    if store.directory is not None:
+        print(registry.format_stats(store))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,242 @@
+"""
+http_session.py
+--------------------------------------
+This document contains the HTTP client shared by all scraper fetches. It keeps
+connections to each host alive between requests, asks for compressed pages,
+and revalidates pages the scraper already has, so that unchanged pages come
+back as 304 Not Modified without a body.
+"""
+
+# LIBRARIES
+import httplib
+import socket
+import threading
+import urllib2
+import urlparse
+import zlib
+
+from Queue import Empty
+from Queue import Queue
+
+
+# CONSTANTS
+DEFAULT_TIMEOUT = 60
+
+# Number of idle connections kept open to each host.
+DEFAULT_POOL_SIZE = 8
+
+# Number of redirects followed before giving up.
+MAX_REDIRECTS = 5
+
+USER_AGENT = 'cs229_nba3pred scraper'
+
+
+'''
+Parameters:
+* body: the body of the response as sent by the server.
+* encoding: the Content-Encoding header of the response.
+
+Function: Helper function to decompress a gzip or deflate response body.
+'''
+def decode_body(body, encoding):
+	encoding = (encoding or '').lower()
+	if encoding == 'gzip':
+		return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+	if encoding == 'deflate':
+		# Some servers send raw deflate data without the zlib header.
+		try:
+			return zlib.decompress(body)
+		except zlib.error:
+			return zlib.decompress(body, -zlib.MAX_WBITS)
+	return body
+
+
+class HttpSession(object):
+
+	'''
+	Parameters:
+	* timeout: seconds to wait on a response before giving up.
+	* pool_size: number of idle connections kept open to each host.
+
+	Function: Sends GET requests over pooled keep-alive connections. Safe to use from
+	          several threads; each request holds its own connection while it runs.
+	'''
+	def __init__(self, timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE):
+		self.timeout = timeout
+		self.pool_size = pool_size
+
+		# (scheme, host) -> queue of idle connections.
+		self.pools = {}
+		self.lock = threading.Lock()
+
+		self.requests = 0
+		self.retries = 0
+		self.not_modified = 0
+		self.connections_opened = 0
+		self.connections_reused = 0
+		self.bytes_transferred = 0
+		self.bytes_decoded = 0
+
+
+	def pool_for(self, key):
+		with self.lock:
+			if key not in self.pools:
+				self.pools[key] = Queue(self.pool_size)
+			return self.pools[key]
+
+
+	'''
+	Parameters:
+	* scheme, host: where the connection goes.
+	* fresh: open a new connection even if an idle one is pooled.
+
+	Function: Returns an idle connection from the pool, or a new one, and whether it
+	          was reused.
+	'''
+	def acquire(self, scheme, host, fresh=False):
+		if not fresh:
+			try:
+				connection = self.pool_for((scheme, host)).get_nowait()
+				return connection, True
+			except Empty:
+				pass
+
+		if scheme == 'https':
+			connection = httplib.HTTPSConnection(host, timeout=self.timeout)
+		else:
+			connection = httplib.HTTPConnection(host, timeout=self.timeout)
+
+		with self.lock:
+			self.connections_opened += 1
+		return connection, False
+
+
+	def release(self, scheme, host, connection):
+		try:
+			self.pool_for((scheme, host)).put_nowait(connection)
+		except Exception:
+			connection.close()
+
+
+	'''
+	Parameters:
+	* url: the address of the webpage.
+	* validators: the etag and last_modified headers of a copy of the page the scraper
+	              already has, or None.
+
+	Function: Downloads the page. Returns the status (200, or 304 if the copy the scraper
+	          has is still current), the decompressed page (None for a 304), and the
+	          validators of the response. Raises urllib2.HTTPError for other statuses.
+	'''
+	def get(self, url, validators=None):
+		for i in range(MAX_REDIRECTS + 1):
+			status, body, headers = self.request(url, validators)
+			if status in (301, 302, 303, 307, 308) and headers.get('location'):
+				url = urlparse.urljoin(url, headers['location'])
+				continue
+			break
+
+		if status == 304:
+			with self.lock:
+				self.not_modified += 1
+			return 304, None, validators
+
+		if status != 200:
+			raise urllib2.HTTPError(url, status, httplib.responses.get(status, ''), headers, None)
+
+		new_validators = {}
+		if headers.get('etag'):
+			new_validators['etag'] = headers['etag']
+		if headers.get('last-modified'):
+			new_validators['last_modified'] = headers['last-modified']
+
+		page = decode_body(body, headers.get('content-encoding'))
+		with self.lock:
+			self.bytes_decoded += len(page)
+
+		return 200, page, new_validators
+
+
+	def request(self, url, validators):
+		parts = urlparse.urlsplit(url)
+		path = parts.path or '/'
+		if parts.query:
+			path += '?' + parts.query
+
+		headers = {
+			'Accept-Encoding': 'gzip, deflate',
+			'Connection': 'keep-alive',
+			'User-Agent': USER_AGENT,
+		}
+		if validators:
+			if validators.get('etag'):
+				headers['If-None-Match'] = validators['etag']
+			if validators.get('last_modified'):
+				headers['If-Modified-Since'] = validators['last_modified']
+
+		connection, reused = self.acquire(parts.scheme, parts.netloc)
+		try:
+			response, body = self.send(connection, path, headers)
+		except (httplib.HTTPException, socket.error):
+			connection.close()
+			if not reused:
+				raise
+
+			# The server may have closed the idle connection, so try once more on a new
+			# one rather than on the next idle connection, which may be just as stale.
+			with self.lock:
+				self.retries += 1
+			connection, reused = self.acquire(parts.scheme, parts.netloc, fresh=True)
+			try:
+				response, body = self.send(connection, path, headers)
+			except (httplib.HTTPException, socket.error):
+				connection.close()
+				raise
+
+		with self.lock:
+			self.requests += 1
+			self.bytes_transferred += len(body)
+			if reused:
+				self.connections_reused += 1
+
+		if response.will_close:
+			connection.close()
+		else:
+			self.release(parts.scheme, parts.netloc, connection)
+
+		return response.status, body, dict((key.lower(), value) for key, value in response.getheaders())
+
+
+	def send(self, connection, path, headers):
+		connection.request('GET', path, headers=headers)
+		response = connection.getresponse()
+		return response, response.read()
+
+
+	'''
+	Function: Returns the request, retry, connection and byte counts of the session.
+	'''
+	def stats(self):
+		with self.lock:
+			return {
+				'requests': self.requests,
+				'retries': self.retries,
+				'not_modified': self.not_modified,
+				'connections_opened': self.connections_opened,
+				'connections_reused': self.connections_reused,
+				'bytes_transferred': self.bytes_transferred,
+				'bytes_decoded': self.bytes_decoded,
+			}
+
+
+	def close(self):
+		with self.lock:
+			pools = self.pools.values()
+			self.pools = {}
+
+		for pool in pools:
+			while True:
+				try:
+					pool.get_nowait().close()
+				except Empty:
+					break
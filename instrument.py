@@ -0,0 +1,278 @@
+"""
+instrument.py
+--------------------------------------
+This document contains the timing and throughput instrumentation of the
+scraper. It records wall and CPU time per stage (fetch, parse, extract),
+per-host request latencies and bytes downloaded, and writes them out as a
+JSON report at the end of a run.
+"""
+
+# LIBRARIES
+import json
+import threading
+import time
+
+from functools import wraps
+
+try:
+	import resource
+except ImportError:
+	resource = None
+
+
+# CONSTANTS
+# Upper bounds, in seconds, of the buckets of the per-host latency histograms.
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1., 2., 5., 10.]
+
+# resource.RUSAGE_THREAD is only exposed by newer Pythons; its value on Linux is 1.
+RUSAGE_THREAD = getattr(resource, 'RUSAGE_THREAD', 1)
+
+
+'''
+Function: Helper function to get the CPU time used by the calling thread. Falls back
+          to the CPU time of the whole process where per-thread times are not available.
+'''
+def thread_cpu_time():
+	if resource is not None:
+		try:
+			usage = resource.getrusage(RUSAGE_THREAD)
+			return usage.ru_utime + usage.ru_stime
+		except (ValueError, resource.error):
+			pass
+
+	return time.clock()
+
+
+'''
+Function: Helper function to make the stats of a host no request has been sent to yet.
+'''
+def empty_host_stats():
+	return {'requests': 0, 'seconds': 0., 'bytes': 0, 'histogram': [0] * (len(LATENCY_BUCKETS) + 1)}
+
+
+class Metrics(object):
+
+	'''
+	Function: Collects stage timings, request latencies and counters from any number of
+	          threads. Stage times are exclusive: time spent in a stage nested inside
+	          another (e.g. parsing a table while extracting a page) is only counted once.
+	'''
+	def __init__(self):
+		self.reset()
+
+
+	'''
+	Function: Clears every measurement and starts the clock of the run again.
+	'''
+	def reset(self):
+		self.lock = threading.Lock()
+		self.local = threading.local()
+		self.start = time.time()
+
+		# stage -> [calls, wall seconds, cpu seconds]
+		self.stages = {}
+
+		# host -> {'requests', 'seconds', 'bytes', 'histogram'}
+		self.hosts = {}
+
+		self.counters = {}
+
+
+	'''
+	Parameters:
+	* name: the stage being timed (e.g. parse).
+
+	Function: Decorator that adds the run time of the function to the stage.
+	'''
+	def timed(self, name):
+		def decorator(function):
+			@wraps(function)
+			def wrapper(*args, **kwargs):
+				self.enter()
+				try:
+					return function(*args, **kwargs)
+				finally:
+					self.exit(name)
+			return wrapper
+		return decorator
+
+
+	def enter(self):
+		stack = getattr(self.local, 'stack', None)
+		if stack is None:
+			stack = self.local.stack = []
+
+		# [wall start, cpu start, wall of nested stages, cpu of nested stages]
+		stack.append([time.time(), thread_cpu_time(), 0., 0.])
+
+
+	def exit(self, name):
+		stack = self.local.stack
+		wall_start, cpu_start, child_wall, child_cpu = stack.pop()
+		wall = time.time() - wall_start
+		cpu = thread_cpu_time() - cpu_start
+
+		if stack:
+			stack[-1][2] += wall
+			stack[-1][3] += cpu
+
+		with self.lock:
+			stage = self.stages.setdefault(name, [0, 0., 0.])
+			stage[0] += 1
+			stage[1] += wall - child_wall
+			stage[2] += cpu - child_cpu
+
+
+	'''
+	Parameters:
+	* host: the host the request was sent to.
+	* seconds: time from sending the request to receiving the whole response.
+	* size: bytes received.
+	'''
+	def record_request(self, host, seconds, size):
+		with self.lock:
+			stats = self.hosts.get(host)
+			if stats is None:
+				stats = self.hosts[host] = empty_host_stats()
+
+			stats['requests'] += 1
+			stats['seconds'] += seconds
+			stats['bytes'] += size
+
+			bucket = 0
+			while bucket < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[bucket]:
+				bucket += 1
+			stats['histogram'][bucket] += 1
+
+
+	'''
+	Parameters:
+	* name: the counter to increase (e.g. players).
+	* amount: how much to increase it by.
+	'''
+	def count(self, name, amount=1):
+		with self.lock:
+			self.counters[name] = self.counters.get(name, 0) + amount
+
+
+	'''
+	Function: Returns the stage timings, requests and counters measured since the last
+	          snapshot, and clears them. Used in worker processes, whose measurements
+	          are sent back to the parent process and added to its own with merge().
+	'''
+	def snapshot(self):
+		with self.lock:
+			snapshot = {'stages': self.stages, 'hosts': self.hosts, 'counters': self.counters}
+			self.stages, self.hosts, self.counters = {}, {}, {}
+		return snapshot
+
+
+	'''
+	Parameters:
+	* snapshot: measurements returned by snapshot(), usually in another process.
+
+	Function: Adds the measurements to the ones of this run.
+	'''
+	def merge(self, snapshot):
+		with self.lock:
+			for name, (calls, wall, cpu) in snapshot['stages'].items():
+				stage = self.stages.setdefault(name, [0, 0., 0.])
+				stage[0] += calls
+				stage[1] += wall
+				stage[2] += cpu
+
+			for host, stats in snapshot['hosts'].items():
+				mine = self.hosts.get(host)
+				if mine is None:
+					mine = self.hosts[host] = empty_host_stats()
+				for key in ['requests', 'seconds', 'bytes']:
+					mine[key] += stats[key]
+				mine['histogram'] = [a + b for a, b in zip(mine['histogram'], stats['histogram'])]
+
+			for name, amount in snapshot['counters'].items():
+				self.counters[name] = self.counters.get(name, 0) + amount
+
+
+	'''
+	Function: Returns every measurement as a dictionary that can be written as JSON.
+	'''
+	def report(self):
+		with self.lock:
+			elapsed = time.time() - self.start
+			stages = dict((name, {'calls': calls, 'wall_seconds': wall, 'cpu_seconds': cpu})
+						for name, (calls, wall, cpu) in self.stages.items())
+
+			hosts = {}
+			for host, stats in self.hosts.items():
+				labels = ['<=' + str(bound) for bound in LATENCY_BUCKETS] + ['>' + str(LATENCY_BUCKETS[-1])]
+				hosts[host] = {
+					'requests': stats['requests'],
+					'bytes': stats['bytes'],
+					'mean_latency': stats['seconds'] / stats['requests'],
+					'latency_histogram': [list(bucket) for bucket in zip(labels, stats['histogram'])],
+				}
+
+			pages_fetched = sum(stats['requests'] for stats in self.hosts.values())
+			pages_parsed = self.stages.get('parse', [0])[0]
+
+			return {
+				'elapsed_seconds': elapsed,
+				'stages': stages,
+				'hosts': hosts,
+				'counters': dict(self.counters),
+				'bytes_downloaded': sum(stats['bytes'] for stats in self.hosts.values()),
+				'pages_fetched': pages_fetched,
+				'pages_fetched_per_second': pages_fetched / elapsed,
+				'pages_parsed_per_second': pages_parsed / elapsed,
+			}
+
+
+	'''
+	Parameters:
+	* filename: the JSON file the report is written to.
+	* extra: other sections to add to the report (e.g. the stats of the HTTP session).
+	'''
+	def write_report(self, filename, extra=None):
+		report = self.report()
+		report.update(extra or {})
+
+		with open(filename, 'w') as f:
+			json.dump(report, f, indent=2, sort_keys=True)
+
+
+	'''
+	Function: Returns a one-line summary of the run so far.
+	'''
+	def progress_line(self):
+		report = self.report()
+		line = '[%.0fs] %d players, %d pages fetched (%.2f/s), %d KB' % (
+			report['elapsed_seconds'], report['counters'].get('players', 0), report['pages_fetched'],
+			report['pages_fetched_per_second'], report['bytes_downloaded'] / 1024)
+
+		for name in sorted(report['stages']):
+			line += ', ' + name + ' %.1fs' % report['stages'][name]['wall_seconds']
+		return line
+
+
+	'''
+	Parameters:
+	* interval: seconds between two progress lines.
+
+	Function: Prints a progress line every interval seconds from a background thread
+	          until stop_progress() is called.
+	'''
+	def start_progress(self, interval):
+		self.stopped = threading.Event()
+
+		def run():
+			while not self.stopped.wait(interval):
+				print self.progress_line()
+
+		thread = threading.Thread(target=run)
+		thread.daemon = True
+		thread.start()
+
+
+	def stop_progress(self):
+		if hasattr(self, 'stopped'):
+			self.stopped.set()
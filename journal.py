@@ -0,0 +1,101 @@
+"""
+journal.py
+--------------------------------------
+This document contains the append-only checkpoint journal of the scraper.
+Every player is written to the journal as soon as their data is extracted,
+so an interrupted run can be resumed without scraping those players again.
+"""
+
+# LIBRARIES
+import json
+import os
+import threading
+
+
+# CONSTANTS
+DEFAULT_JOURNAL = 'scrape_journal.jsonl'
+
+
+class Journal(object):
+
+	'''
+	Parameters:
+	* filename: the journal file. One JSON record is written per line.
+
+	Function: Indexes the records already in the journal and opens it for appending.
+	          When a player appears more than once, the latest record wins. Only the
+	          position of each record is kept in memory; records are read on demand.
+	'''
+	def __init__(self, filename=DEFAULT_JOURNAL):
+		self.filename = filename
+		self.lock = threading.Lock()
+
+		# player -> offset of their latest record in the file.
+		self.offsets = {}
+
+		end = 0
+		if os.path.exists(filename):
+			with open(filename, 'rb') as f:
+				while True:
+					offset = f.tell()
+					line = f.readline()
+					if not line.endswith(b'\n'):
+						# The last line is cut short if a run was killed while writing it.
+						break
+					end = f.tell()
+
+					try:
+						record = json.loads(line)
+					except ValueError:
+						continue
+					self.offsets[record['player']] = offset
+
+			# Drop a cut short last line so that the next record starts on a line of its own.
+			with open(filename, 'ab') as f:
+				f.truncate(end)
+
+		self.handle = open(filename, 'ab')
+		self.reader = open(filename, 'rb')
+
+
+	'''
+	Parameters:
+	* player: the player's name (e.g. Stephen Curry)
+
+	Function: Returns the latest record of the player, or None if the player is not in the journal.
+	'''
+	def get(self, player):
+		with self.lock:
+			offset = self.offsets.get(player)
+			if offset is None:
+				return None
+
+			self.reader.seek(offset)
+			return json.loads(self.reader.readline())
+
+
+	'''
+	Parameters:
+	* record: a dictionary with at least a 'player' key.
+
+	Function: Appends the record to the journal and flushes it to disk.
+	'''
+	def append(self, record):
+		line = json.dumps(record, sort_keys=True) + '\n'
+
+		with self.lock:
+			self.handle.seek(0, os.SEEK_END)
+			offset = self.handle.tell()
+			self.handle.write(line)
+			self.handle.flush()
+			os.fsync(self.handle.fileno())
+			self.offsets[record['player']] = offset
+
+
+	def close(self):
+		self.handle.close()
+		self.reader.close()
+
+
+	def __len__(self):
+		return len(self.offsets)
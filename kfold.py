@@ -9,8 +9,13 @@ as the working model for the entire data set.
 """
 
 # LIBRARIES
+import argparse
+
+from multiprocessing import cpu_count
+from multiprocessing import Pool
+from multiprocessing.sharedctypes import RawArray
+
 import numpy as np
-import pandas as pd
 
 from sklearn.metrics import mean_squared_error
 from sklearn.model_selection import KFold
@@ -19,85 +24,243 @@ from sklearn.model_selection import KFold
 import linear_regression as lr
 import boosting as gb
 import forest as rf
+import registry as mr
+import dataset
+import PCA
+
+
+# CONSTANTS
+# Names of the models, in the order of the scores returned by kfold_cv().
+MODELS = ['linear', 'weighted', 'boosting', 'forest']
 
+# GLOBAL VARIABLES
+# The training data, in memory shared by the worker processes (see init_worker()).
+DATA = None
+
+# True in the worker processes of kfold_cv().
+IN_WORKER = False
 
 
 '''
 Parameters:
-* filename: csv file to be loaded.
+* filename: dataset file to be loaded (see dataset.py).
+* split: the split to read (e.g. train).
 
-Function: read in data to use in gradient boosting regression code.
+Function: read in the matrix of features and labels of the split.
 '''
-def load_dataset(filename):
-    df = pd.read_csv(filepath_or_buffer=filename, sep=',')
+def load_dataset(filename, split):
+    return dataset.load_matrix(filename, split)
+
+
+'''
+Parameters:
+* X_train, y_train: features and labels of the training folds.
+* params: parameters of the random forest regressor.
+
+Function: trains a random forest on the training folds and returns it. The workers
+          already use every core, so a forest in a worker builds its trees on one.
+'''
+def train_forest(X_train, y_train, params):
+	if IN_WORKER:
+		params = dict(params, n_jobs=1)
+	return rf.train_model(X_train, y_train, params)
+
+
+TRAIN_FUNCTIONS = {
+	'boosting': gb.train_model,
+	'forest': train_forest,
+}
 
-    # df.columns = ["name", "ncaa_fg3a", "ncaa_fg3_pct", "ncaa_ft_pct", "ncaa_sos", "ncaa_team_fg3a_avg",
-    # 			"nba_avg_team_ortg", "nba_relative_team_fg3a", "nba_fg3_pct"]
+MODEL_PARAMS = {
+	'boosting': gb.PARAMS,
+	'forest': rf.PARAMS,
+}
 
-    df.dropna(how="all", inplace=True) # drops the empty line at file-end
-    df.tail()
+# Models cross-validated from their sufficient statistics (see linear_regression.kfold_errors())
+# rather than refitted on every fold.
+LINEAR_MODELS = {'linear': False, 'weighted': True}
+
+
+'''
+Parameters:
+* raw: the training data, as a multiprocessing RawArray.
+* shape: the shape of the training data.
+
+Function: Runs in every worker process. The data is a view of the shared memory the
+          parent process copied it to, so it is never pickled to the workers.
+'''
+def init_worker(raw, shape):
+	global DATA, IN_WORKER
+	IN_WORKER = True
+	DATA = np.frombuffer(raw, dtype=np.float64).reshape(shape)
+
+
+'''
+Parameters:
+* job: a (fold, model, train_index, test_index, keep) tuple.
+
+Function: Trains one model on one fold of DATA. Returns the fold, the model, the fitted
+          model if keep is set and None otherwise, and the mean squared errors on the
+          training folds and the held-out fold.
+'''
+def run_job(job):
+	fold, model, train_index, test_index, keep = job
+	X_train, y_train = DATA[train_index][:,:4], DATA[train_index][:,-1]
 
-    return df.values
+	clf = TRAIN_FUNCTIONS[model](X_train, y_train, MODEL_PARAMS[model])
+	return (fold, model, clf if keep else None) + score(clf, train_index, test_index)
+
+
+'''
+Parameters:
+* clf: a model fitted on the training folds.
+* train_index, test_index: rows of DATA in the training folds and the held-out fold.
+
+Function: Returns the mean squared errors of the model on the training folds and the
+          held-out fold.
+'''
+def score(clf, train_index, test_index):
+	errors = ()
+	for index in [train_index, test_index]:
+		errors += (mean_squared_error(DATA[index][:,-1], clf.predict(DATA[index][:,:4])),)
+	return errors
 
 
 '''
 Parameters:
 * df: the processed training data.
+* k: the number of folds.
+* workers: number of processes the fold-by-model jobs are run on.
+* store: a registry.ModelRegistry the fitted models of every fold are kept in, or None.
 
-Function: Runs k-fold cross validation on the processed training data.
-		  In this program, k = 10.
+Function: Runs k-fold cross validation on the processed training data. The linear
+          models are cross-validated from their sufficient statistics in one pass.
+          Every other model of every fold is a separate job, and every model is
+          seeded, so the scores are the same for any number of workers. Models of a
+          fold that are in the registry are scored without a job, and the models the
+          jobs fit are sent back and stored by this process only if the registry has a
+          directory. Returns the mean squared errors of
+          MODELS on the training folds and the held-out folds, averaged over the folds.
 '''
-def kfold_cv(df, k):
+def kfold_cv(df, k, workers=1, store=None):
+	global DATA
+
 	kf = KFold(n_splits=k, random_state=0, shuffle=True)
 
-	# Contains the averaged mean squared error for each model over the k folds.
-	train_scores = np.repeat(0., 4)
-	test_scores = np.repeat(0., 4)
+	folds = list(kf.split(df))
+	DATA = np.asarray(df, dtype=np.float64)
+	store = store or mr.ModelRegistry(None)
+	keep = store.directory is not None
 
-	for train_index, test_index in kf.split(df):
-		X_train, y_train = df[train_index][:,:4], df[train_index][:,-1]
-		X_test, y_test = df[test_index][:,:4], df[test_index][:,-1]
+	# The slowest models are sent first, so no worker is left with one at the end.
+	jobs = []
+	keys = {}
+	results = []
+	for model in sorted(MODELS, key=lambda model: model not in ('boosting', 'forest')):
+		if model not in LINEAR_MODELS:
+			for fold, (train_index, test_index) in enumerate(folds):
+				keys[fold, model] = mr.fingerprint(model, MODEL_PARAMS[model], DATA[train_index][:,:4],
+												DATA[train_index][:,-1], PCA.COMPONENTS[:-1])
+				clf = store.get(keys[fold, model])
+				if clf is None:
+					jobs.append((fold, model, train_index, test_index, keep))
+				else:
+					results.append((fold, model, clf) + score(clf, train_index, test_index))
 
-		# Train using linear regression
-		lm, pred_train, pred_test = lr.run_linear_regression(X_train, y_train, X_test, y_test)
-		train_scores[0] += mean_squared_error(y_train, pred_train)
-		test_scores[0] += mean_squared_error(y_test, pred_test)
+	if workers > 1 and len(jobs) > 1:
+		raw = RawArray('d', df.size)
+		np.frombuffer(raw, dtype=np.float64)[:] = DATA.ravel()
 
-		# Train using weighted linear regression
-		lm, pred_train, pred_test = lr.run_weighted_regression(X_train, y_train, X_test, y_test)
-		train_scores[1] += mean_squared_error(y_train, pred_train)
-		test_scores[1] += mean_squared_error(y_test, pred_test)
+		pool = Pool(workers, init_worker, (raw, df.shape))
+		try:
+			fitted = list(pool.imap_unordered(run_job, jobs))
+		finally:
+			pool.close()
+			pool.join()
+	else:
+		fitted = map(run_job, jobs)
 
-		# Train using gradient boosting
-		params = {}
-		params['n_estimators'] = 3000
-		params['learning_rate'] = .0001
-		params['max_depth'] = 5
+	for fold, model, clf, train_error, test_error in fitted:
+		if keep:
+			store.put(keys[fold, model], clf, {'kind': model, 'params': MODEL_PARAMS[model], 'columns': PCA.COMPONENTS[:-1],
+											'rows': len(folds[fold][0])})
+	results += fitted
 
-		pred_train, pred_test = gb.fit_model(X_train, y_train, X_test, y_test, params)
-		train_scores[2] += mean_squared_error(y_train, pred_train)
-		test_scores[2] += mean_squared_error(y_test, pred_test)
+	train_errors = np.zeros((k, len(MODELS)))
+	test_errors = np.zeros((k, len(MODELS)))
+	for model, weighted in LINEAR_MODELS.items():
+		j = MODELS.index(model)
+		train_errors[:, j], test_errors[:, j] = lr.kfold_errors(df[:,:4], df[:,-1], folds, weighted)
 
-		# Train using random forest
-		params.pop('learning_rate', None)
-		params['max_depth'] = 4
-		
-		pred_train, pred_test = rf.fit_model(X_train, y_train, X_test, y_test, params)
-		train_scores[3] += mean_squared_error(y_train, pred_train)
-		test_scores[3] += mean_squared_error(y_test, pred_test)		
+	for fold, model, clf, train_error, test_error in results:
+		train_errors[fold, MODELS.index(model)] = train_error
+		test_errors[fold, MODELS.index(model)] = test_error
 
+	return train_errors.mean(axis=0), test_errors.mean(axis=0)
 
-	train_scores /= k
-	test_scores /= k
 
-	print train_scores
-	print test_scores
 
+def parse_args():
+	parser = argparse.ArgumentParser(description='Cross-validate every model on the training split.')
+	parser.add_argument('--data', default='transformed.dat', help='dataset transformed by PCA.py')
+	parser.add_argument('--folds', type=int, default=10, help='number of folds')
+	parser.add_argument('--workers', type=int, default=cpu_count(), help='number of processes (default one per core)')
+	parser.add_argument('--loocv', action='store_true',
+						help='only print the leave-one-out error of the linear models')
+	parser.add_argument('--curve', action='store_true',
+						help='only cross-validate gradient boosting, over every number of boosting iterations')
+	parser.add_argument('--patience', type=int,
+						help='with --curve, stop a fold when its error has not improved for this many iterations')
+	parser.add_argument('--extend', type=int, metavar='N',
+						help='with --curve, then grow the models of every fold to N iterations with warm start')
+	mr.add_arguments(parser)
+	return parser.parse_args()
+
+
+'''
+Parameters:
+* df: the processed training data.
+* k: the number of folds.
+* patience: early stopping of each fold, or None (see boosting.HeldOutMonitor).
+* extend: number of boosting iterations to extend the fitted folds to, or None.
+
+Function: Prints the cross-validated learning curve of gradient boosting and the
+          number of boosting iterations with the lowest error.
+'''
+def boosting_curve(df, k, patience=None, extend=None):
+	cv = gb.StagedCV(df[:,:4], df[:,-1], k).fit(patience)
+	if extend:
+		cv.extend(extend, patience)
+
+	curve = cv.curve()
+	for n_estimators in sorted(set([1, 10, 100, 1000, 10000, len(curve)])):
+		if n_estimators <= len(curve):
+			print '%6d iterations: %.4f' % (n_estimators, curve[n_estimators - 1])
+
+	n_estimators, error = cv.best()
+	print 'Best: %d iterations, mean squared error %.4f' % (n_estimators, error)
 
 
 def main():
-	train = load_dataset('transformed_train.csv')
-	kfold_cv(train, 10)
+	args = parse_args()
+	train = load_dataset(args.data, 'train')
+
+	if args.loocv:
+		for model, weighted in sorted(LINEAR_MODELS.items()):
+			print '%s: leave-one-out mean squared error %.4f' % (model, lr.loocv_error(train[:,:4], train[:,-1], weighted))
+		return
+
+	if args.curve:
+		boosting_curve(train, args.folds, args.patience, args.extend)
+		return
+
+	store = mr.from_args(args)
+	train_scores, test_scores = kfold_cv(train, args.folds, args.workers, store)
+
+	print train_scores
+	print test_scores
+	if store.directory is not None:
+		print mr.format_stats(store)
 
 
 if __name__ == '__main__':
@@ -2,45 +2,36 @@
 linear_regression.py
 --------------------------------------
 This document contains the code to run linear regression and
-weighted linear regression.
+weighted linear regression. Running the script fits the weighted regression on
+the training split and plots it; its parameters are kept in the model registry.
+The plain linear regression is not run by the script (kfold.py and predict.py
+fit it), so it is not looked up in the registry.
 """
 
 # LIBRARIES
+# statsmodels and matplotlib take seconds to import, so they are only imported when a
+# summary or plot is asked for.
+import argparse
+
 import numpy as np
-import pandas as pd
-import scipy.stats as stats
-import matplotlib.pyplot as plt
-import sklearn 
 
-from sklearn import linear_model
 from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import scale
-from collections import Counter
-from sklearn.metrics import mean_squared_error, r2_score
 
-import statsmodels.api as sm
-import matplotlib.pyplot as plt
-from statsmodels.sandbox.regression.predstd import wls_prediction_std
-from statsmodels.iolib.table import (SimpleTable, default_txt_fmt)
+# local files in directory
+import dataset
+import PCA
+import registry
 
 
 '''
 Parameters:
-* filename: csv file to be loaded.
+* filename: dataset file to be loaded (see dataset.py).
+* split: the split to read (train or test).
 
-Function: forms the train and test data from the given csv files.
+Function: forms the train and test data from the given dataset file.
 '''
-def read_file(filename):
-
-    data = pd.read_csv(filepath_or_buffer=filename, sep=',',header=None)
-    data.columns = ['feature1', 'feature2', 'feature3', 'feature4', 'y']
-    data.dropna(how="all", inplace=True) # drops the empty line at file-end
-    data.tail()
-
-    X_data = data.ix[:,:4].values
-    Y_data = data.ix[:,-1].values
-    
-    return X_data, Y_data
+def read_file(filename, split):
+    return dataset.load_xy(filename, split=split)
 
 
 '''
@@ -64,6 +55,216 @@ def run_linear_regression(X_train, y_train, X_test, y_test):
     return lm, pred_train, pred_test
 
 
+'''
+Parameters:
+* X: features.
+
+Function: adds the constant column in front of the features, as sm.add_constant().
+'''
+def add_constant(X):
+    return np.column_stack((np.ones(len(X)), X))
+
+
+'''
+Parameters:
+* X_train: features for the training set, with the constant column added.
+
+Function: weights of the training rows for weighted linear regression: the inverse
+          of the variance of each row. These are the diagonal of np.cov(X_train),
+          computed row by row instead of from the n x n covariance between rows.
+'''
+def wls_weights(X_train):
+    return 1/np.var(X_train, axis=1, ddof=1)
+
+
+'''
+Parameters:
+* X: features with the constant column, as n x p, or as b x n x p for b design matrices.
+* y: output, as n values or b x n.
+* weights: weights of the rows, as n values or b x n (e.g. 0 for the rows held out
+           of a fold, or the number of times a row is drawn in a bootstrap replicate).
+
+Function: solves the weighted normal equations (X'WX) params = X'Wy. Given b sets of
+          weights or design matrices, all b fits are solved in one batched call, and
+          the b x p parameters are returned; otherwise the p parameters.
+'''
+def solve_wls(X, y, weights):
+    X, y, weights = np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64), np.asarray(weights, dtype=np.float64)
+
+    if X.ndim == 2:
+        XtWX = np.einsum('...n,ni,nj->...ij', weights, X, X)
+        XtWy = np.einsum('...n,ni,...n->...i', weights, X, y)
+    else:
+        XtWX = np.einsum('...n,...ni,...nj->...ij', weights, X, X)
+        XtWy = np.einsum('...n,...ni,...n->...i', weights, X, y)
+
+    return np.linalg.solve(XtWX, XtWy[..., np.newaxis])[..., 0]
+
+
+class WLSResults(object):
+
+    '''
+    Parameters:
+    * params: the fitted parameters, the constant first.
+    * X: features of the training set, with the constant column.
+    * y: output of the training set.
+    * weights: weights of the training rows.
+
+    Function: a weighted linear regression fitted by solve_wls(). The statsmodels
+              summary is only computed when summary() is called.
+    '''
+    def __init__(self, params, X, y, weights):
+        self.params = params
+        self.X = X
+        self.y = y
+        self.weights = weights
+
+    def predict(self, X):
+        return np.dot(X, self.params)
+
+    def summary(self):
+        import statsmodels.api as sm
+        return sm.WLS(self.y, self.X, weights=self.weights).fit().summary()
+
+
+'''
+Parameters:
+* X_train: features for the training set.
+* y_train: output for the training set.
+* replicates: the number of bootstrap replicates.
+* random_state: seed of the resampling.
+
+Function: fits the weighted linear regression on bootstrap replicates of the training
+          set, all in one batched solve. A replicate is the training set with each row
+          weighted by the number of times it was drawn. Returns the replicates x p
+          parameters, e.g. for their standard deviations.
+'''
+def bootstrap_wls(X_train, y_train, replicates=1000, random_state=0):
+    X_train = add_constant(X_train)
+    n = len(X_train)
+
+    counts = np.random.RandomState(random_state).multinomial(n, np.ones(n) / n, size=replicates)
+    return solve_wls(X_train, y_train, counts * wls_weights(X_train))
+
+
+'''
+Parameters:
+* X: features with the constant column.
+* y: output.
+* weights: weights of the rows.
+
+Function: the sufficient statistics of a weighted linear regression: X'WX and X'Wy.
+'''
+def sufficient_statistics(X, y, weights):
+    XtW = (X * weights[:, np.newaxis]).T
+    return XtW.dot(X), XtW.dot(y)
+
+
+'''
+Parameters:
+* X: features.
+* y: output.
+* folds: the (train_index, test_index) of every fold.
+* weighted: cross-validate the weighted linear regression instead of the linear one.
+
+Function: k-fold cross validation of a linear model without refitting it on every
+          fold. The sufficient statistics are computed once for all rows; the
+          statistics of a fold's training rows are those minus the statistics of its
+          held-out rows, and all folds are solved in one batched call. The training
+          error comes from the unweighted statistics the same way. Returns the mean
+          squared errors on the training rows and the held-out rows of every fold,
+          which are the same as refitting on every fold.
+'''
+def kfold_errors(X, y, folds, weighted=False):
+    X = add_constant(X)
+    y = np.asarray(y, dtype=np.float64)
+    weights = wls_weights(X) if weighted else np.ones(len(X))
+
+    XtWX, XtWy = sufficient_statistics(X, y, weights)
+    XtX, Xty = sufficient_statistics(X, y, np.ones(len(X)))
+    yty = y.dot(y)
+
+    fold_XtWX, fold_XtWy, fold_XtX, fold_Xty, fold_yty = [], [], [], [], []
+    for train_index, test_index in folds:
+        X_fold, y_fold = X[test_index], y[test_index]
+        A, b = sufficient_statistics(X_fold, y_fold, weights[test_index])
+        fold_XtWX.append(XtWX - A)
+        fold_XtWy.append(XtWy - b)
+
+        A, b = sufficient_statistics(X_fold, y_fold, np.ones(len(test_index)))
+        fold_XtX.append(XtX - A)
+        fold_Xty.append(Xty - b)
+        fold_yty.append(yty - y_fold.dot(y_fold))
+
+    params = np.linalg.solve(np.array(fold_XtWX), np.array(fold_XtWy)[..., np.newaxis])[..., 0]
+
+    train_errors, test_errors = np.empty(len(folds)), np.empty(len(folds))
+    for i, (train_index, test_index) in enumerate(folds):
+        # Sum of squared training residuals: y'y - 2 params'X'y + params'X'X params.
+        sse = fold_yty[i] - 2 * params[i].dot(fold_Xty[i]) + params[i].dot(fold_XtX[i]).dot(params[i])
+        train_errors[i] = sse / len(train_index)
+
+        residuals = y[test_index] - X[test_index].dot(params[i])
+        test_errors[i] = residuals.dot(residuals) / len(test_index)
+
+    return train_errors, test_errors
+
+
+'''
+Parameters:
+* X: features.
+* y: output.
+* weighted: use the weighted linear regression instead of the linear one.
+
+Function: leave-one-out cross validation error of a linear model from a single fit.
+          The residual of a row left out of the fit is its residual in the full fit
+          divided by 1 - h, where h is the row's leverage, the diagonal of the hat
+          matrix W X (X'WX)^-1 X'. Returns the mean squared left-out residual.
+'''
+def loocv_error(X, y, weighted=False):
+    X = add_constant(X)
+    y = np.asarray(y, dtype=np.float64)
+    weights = wls_weights(X) if weighted else np.ones(len(X))
+
+    XtWX, XtWy = sufficient_statistics(X, y, weights)
+    residuals = y - X.dot(np.linalg.solve(XtWX, XtWy))
+    leverage = weights * np.einsum('ni,in->n', X, np.linalg.solve(XtWX, X.T))
+
+    return np.mean((residuals / (1 - leverage)) ** 2)
+
+
+'''
+Parameters:
+* X_train: features for the training set.
+* y_train: output for the training set.
+
+Function: fits a weighted linear regression model using the training data. Its
+          predict() takes features with the constant column (see add_constant()).
+'''
+def fit_weighted_regression(X_train, y_train):
+
+    # Constants needed to ensure that WLR works.
+    X_train = add_constant(X_train)
+
+    weights = wls_weights(X_train)
+    return WLSResults(solve_wls(X_train, y_train, weights), X_train, y_train, weights)
+
+
+'''
+Parameters:
+* X_train: features for the training set.
+* y_train: output for the training set.
+* hyperparams: the hyperparameters, as registry.ModelRegistry.cached() passes them.
+               The weighted regression has none.
+
+Function: Helper function to fit a weighted linear regression and return only its
+          parameters. These are what the registry stores, as WLSResults would be
+          pickled as __main__.WLSResults when this file is run as a script.
+'''
+def fit_weighted_params(X_train, y_train, hyperparams):
+    return fit_weighted_regression(X_train, y_train).params
+
+
 '''
 Parameters:
 * X_train: features for the training set.
@@ -75,16 +276,11 @@ Function: fits a weighted linear regression model using the training data and
           measures its performance on the training and test set, respectively.
 '''
 def run_weighted_regression(X_train, y_train, X_test, y_test):
-    
-    # Constants needed to ensure that WLR works.
-    X_train = sm.add_constant(X_train)
-    X_test = sm.add_constant(X_test)
-    
-    variance = np.diag(np.cov(X_train))
 
-    mod_wls = sm.WLS(y_train, X_train, weights=1/variance)
-    res_wls = mod_wls.fit()
-    
+    res_wls = fit_weighted_regression(X_train, y_train)
+    X_train = add_constant(X_train)
+    X_test = add_constant(X_test)
+
     weighted_pred_test = res_wls.predict(X_test)
     weighted_pred_train = res_wls.predict(X_train)
     
@@ -103,6 +299,7 @@ Function: This function plots the predicted actual Y values of the train and tes
           designated by different colors.
 '''
 def plot_results(Y_train, Y_test, pred_train, pred_test):
+    import matplotlib.pyplot as plt
 
     X = np.linspace(min(Y_test), max(Y_test))    
 
@@ -118,13 +315,29 @@ def plot_results(Y_train, Y_test, pred_train, pred_test):
     
 
     
+def parse_args():
+    parser = argparse.ArgumentParser(description='Fit weighted linear regression and plot its predictions.')
+    parser.add_argument('--data', default='transformed.dat', help='dataset transformed by PCA.py')
+    registry.add_arguments(parser)
+    return parser.parse_args()
+
+
 def main():
-    X_train, Y_train = read_file("transformed_train.csv")
-    X_test, Y_test = read_file("transformed_test.csv")
+    args = parse_args()
+    X_train, Y_train = read_file(args.data, "train")
+    X_test, Y_test = read_file(args.data, "test")
 
-    lm, pred_train, pred_test = run_weighted_regression(X_train, Y_train, X_test, Y_test)
+    # The parameters of a regression fitted before on the same data are loaded instead.
+    store = registry.from_args(args)
+    params = store.cached('weighted-params', {}, X_train, Y_train, fit_weighted_params, PCA.COMPONENTS[:-1])
+    X_const = add_constant(X_train)
+    lm = WLSResults(params, X_const, Y_train, wls_weights(X_const))
+    pred_train = lm.predict(add_constant(X_train))
+    pred_test = lm.predict(add_constant(X_test))
 
     print lm.summary()
+    if store.directory is not None:
+        print registry.format_stats(store)
     plot_results(Y_train, Y_test, pred_train, pred_test)
 
     
@@ -0,0 +1,146 @@
+"""
+page_archive.py
+--------------------------------------
+This document contains the raw-page archive of the scraper. Every fetched page
+is stored compressed in an append-only pack file, addressed by the SHA-1 of its
+contents, with an index from URL to page. The scraper can then be replayed from
+the archive without any network access.
+"""
+
+# LIBRARIES
+import hashlib
+import json
+import os
+import threading
+import zlib
+
+
+# CONSTANTS
+DEFAULT_ARCHIVE_DIR = 'page_archive'
+PACK_FILE = 'pages.pack'
+INDEX_FILE = 'pages.idx'
+
+
+class PageArchive(object):
+
+	'''
+	Parameters:
+	* directory: folder of the pack and index files. Created if it does not exist.
+
+	Function: Stores pages compressed and deduplicated by content. The index is a JSON
+	          line per stored URL; when a URL is stored again, the latest line wins.
+	'''
+	def __init__(self, directory=DEFAULT_ARCHIVE_DIR):
+		self.directory = directory
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+
+		self.pack_path = os.path.join(directory, PACK_FILE)
+		self.index_path = os.path.join(directory, INDEX_FILE)
+
+		# url -> sha1 of the page, and sha1 -> (offset, length) of the compressed page.
+		self.urls = {}
+		self.blobs = {}
+		self.lock = threading.Lock()
+
+		end = 0
+		if os.path.exists(self.index_path):
+			with open(self.index_path, 'rb') as f:
+				while True:
+					line = f.readline()
+					if not line.endswith(b'\n'):
+						# The last line is cut short if a run was killed while writing it.
+						break
+					end = f.tell()
+
+					try:
+						entry = json.loads(line)
+					except ValueError:
+						continue
+					self.urls[entry['url']] = entry['sha1']
+					self.blobs[entry['sha1']] = (entry['offset'], entry['length'])
+
+			# Drop a cut short last line so that the next entry starts on a line of its own.
+			with open(self.index_path, 'ab') as f:
+				f.truncate(end)
+
+		self.pack = None
+		self.index = None
+		self.reader = None
+		self.reader_pid = None
+
+
+	def open_writers(self):
+		if self.pack is None:
+			self.pack = open(self.pack_path, 'ab')
+			self.index = open(self.index_path, 'a')
+
+
+	'''
+	Parameters:
+	* url: the address of the webpage.
+	* page: the contents of the webpage.
+
+	Function: Stores the page. Contents already in the pack are not written again.
+	'''
+	def put(self, url, page):
+		sha1 = hashlib.sha1(page).hexdigest()
+
+		with self.lock:
+			if self.urls.get(url) == sha1:
+				return
+
+			self.open_writers()
+			if sha1 not in self.blobs:
+				blob = zlib.compress(page)
+				self.pack.seek(0, os.SEEK_END)
+				offset = self.pack.tell()
+				self.pack.write(blob)
+				self.pack.flush()
+				self.blobs[sha1] = (offset, len(blob))
+
+			offset, length = self.blobs[sha1]
+			self.index.write(json.dumps({'url': url, 'sha1': sha1, 'offset': offset, 'length': length}) + '\n')
+			self.index.flush()
+			self.urls[url] = sha1
+
+
+	'''
+	Parameters:
+	* url: the address of the webpage.
+
+	Function: Returns the stored contents of the page, or None if it is not in the archive.
+	'''
+	def get(self, url):
+		with self.lock:
+			sha1 = self.urls.get(url)
+			if sha1 is None:
+				return None
+
+			offset, length = self.blobs[sha1]
+
+			# Worker processes forked from the scraper must not share the file offset
+			# of the parent's handle, so every process opens its own.
+			if self.reader is None or self.reader_pid != os.getpid():
+				self.reader = open(self.pack_path, 'rb')
+				self.reader_pid = os.getpid()
+
+			self.reader.seek(offset)
+			blob = self.reader.read(length)
+
+		return zlib.decompress(blob)
+
+
+	def __contains__(self, url):
+		return url in self.urls
+
+
+	def __len__(self):
+		return len(self.urls)
+
+
+	def close(self):
+		for handle in [self.pack, self.index, self.reader]:
+			if handle is not None:
+				handle.close()
+		self.pack = self.index = self.reader = None
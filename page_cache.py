@@ -0,0 +1,258 @@
+"""
+page_cache.py
+--------------------------------------
+This document contains the URL-keyed page cache used by the scraper. Pages
+are kept in an in-process LRU map and mirrored to an on-disk store, so
+re-running the scraper skips every page that was already downloaded.
+"""
+
+# LIBRARIES
+import hashlib
+import json
+import os
+import threading
+import time
+
+from collections import OrderedDict
+
+
+# CONSTANTS
+DEFAULT_CACHE_DIR = '.page_cache'
+
+# Number of pages held in memory and number of bytes held on disk before the
+# least recently used entries are evicted.
+DEFAULT_MAX_PAGES = 256
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Seconds a cached page stays valid. None means pages never expire.
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+
+'''
+Parameters:
+* url: the address of the webpage.
+
+Function: Helper function to map a URL to the name of its file in the on-disk store.
+'''
+def cache_key(url):
+	return hashlib.sha1(url.encode('utf-8')).hexdigest() + '.html'
+
+
+class PageCache(object):
+
+	'''
+	Parameters:
+	* directory: folder of the on-disk store. None keeps the cache in memory only.
+	* max_pages: number of pages kept in the in-process map.
+	* max_bytes: size bound of the on-disk store.
+	* ttl: seconds a page stays valid. None means pages never expire.
+
+	Function: Memoizes page contents by URL. Lookups check the in-process map first,
+	          then the on-disk store. Both levels evict least recently used pages.
+	          Expired pages are kept so that they can be revalidated with the server.
+	'''
+	def __init__(self, directory=DEFAULT_CACHE_DIR, max_pages=DEFAULT_MAX_PAGES,
+				max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL):
+		self.directory = directory
+		self.max_pages = max_pages
+		self.max_bytes = max_bytes
+		self.ttl = ttl
+
+		self.hits = 0
+		self.misses = 0
+
+		# url -> (fetch time, page contents, validators), ordered from least to most recently used.
+		self.memory = OrderedDict()
+
+		# file name -> size in bytes, ordered from least to most recently used.
+		self.disk = OrderedDict()
+		self.disk_bytes = 0
+
+		# The scraper fetches pages from several threads at once.
+		self.lock = threading.RLock()
+
+		if self.directory is not None:
+			self.load_index()
+
+
+	'''
+	Function: Scans the on-disk store once so that its entries can be evicted in
+	          least recently used order.
+	'''
+	def load_index(self):
+		if not os.path.isdir(self.directory):
+			os.makedirs(self.directory)
+
+		entries = []
+		for filename in os.listdir(self.directory):
+			path = os.path.join(self.directory, filename)
+			if filename.endswith('.html') and os.path.isfile(path):
+				entries.append((os.path.getmtime(path), filename, os.path.getsize(path)))
+
+		for mtime, filename, size in sorted(entries):
+			self.disk[filename] = size
+			self.disk_bytes += size
+
+
+	def is_fresh(self, fetched):
+		return self.ttl is None or time.time() - fetched < self.ttl
+
+
+	'''
+	Parameters:
+	* url: the address of the webpage.
+
+	Function: Returns the cached contents of the page, or None if the page is not
+	          cached or has expired.
+	'''
+	def get(self, url):
+		with self.lock:
+			entry = self.lookup(url)
+			if entry is not None and self.is_fresh(entry[0]):
+				self.hits += 1
+				return entry[1]
+
+			self.misses += 1
+			return None
+
+
+	'''
+	Parameters:
+	* url: the address of the webpage.
+
+	Function: Returns the cached contents of the page along with its validators (a
+	          dictionary with the etag and last_modified headers the page was served
+	          with), even if the page has expired. Returns None, None if the page is not
+	          cached. Used to revalidate expired pages with the server.
+	'''
+	def get_stale(self, url):
+		with self.lock:
+			entry = self.lookup(url)
+			if entry is None:
+				return None, None
+
+			return entry[1], entry[2]
+
+
+	def lookup(self, url):
+		entry = self.memory.get(url)
+		if entry is not None:
+			del self.memory[url]
+			self.memory[url] = entry
+			return entry
+
+		return self.read_disk(url)
+
+
+	'''
+	Parameters:
+	* url: the address of the webpage.
+	* page: the contents of the webpage.
+	* validators: the etag and last_modified headers the page was served with, if any.
+
+	Function: Stores the page in memory and on disk.
+	'''
+	def put(self, url, page, validators=None):
+		with self.lock:
+			fetched = time.time()
+			self.remember(url, fetched, page, validators)
+			self.write_disk(url, fetched, page, validators)
+
+
+	def remember(self, url, fetched, page, validators):
+		self.memory.pop(url, None)
+		self.memory[url] = (fetched, page, validators)
+
+		while len(self.memory) > self.max_pages:
+			self.memory.popitem(last=False)
+
+
+	def read_disk(self, url):
+		if self.directory is None:
+			return None
+
+		filename = cache_key(url)
+		if filename not in self.disk:
+			return None
+
+		path = os.path.join(self.directory, filename)
+		with open(path, 'rb') as f:
+			page = f.read()
+
+		fetched, validators = self.read_metadata(path)
+
+		# Move the entry to the back of the eviction order, and touch the file so
+		# the next run evicts it in the same order. The fetch time is kept in the
+		# metadata file for that reason.
+		os.utime(path, None)
+		self.disk[filename] = self.disk.pop(filename)
+		self.remember(url, fetched, page, validators)
+		return fetched, page, validators
+
+
+	'''
+	Parameters:
+	* path: the file of a page in the on-disk store.
+
+	Function: Returns the fetch time and validators of a stored page. Pages stored
+	          before the fetch time was kept with them were fetched at their
+	          modification time, which is recorded before the file is touched.
+	'''
+	def read_metadata(self, path):
+		metadata = {}
+		if os.path.exists(path + '.json'):
+			with open(path + '.json', 'r') as f:
+				metadata = json.load(f)
+
+		if 'fetched' not in metadata:
+			metadata = {'fetched': os.path.getmtime(path), 'validators': metadata or None}
+			self.write_metadata(path, metadata['fetched'], metadata['validators'])
+
+		return metadata['fetched'], metadata['validators']
+
+
+	def write_metadata(self, path, fetched, validators):
+		with open(path + '.json', 'w') as f:
+			json.dump({'fetched': fetched, 'validators': validators}, f)
+
+
+	def write_disk(self, url, fetched, page, validators):
+		if self.directory is None:
+			return
+
+		filename = cache_key(url)
+		self.forget(filename)
+
+		path = os.path.join(self.directory, filename)
+		self.write_metadata(path, fetched, validators)
+
+		tmp_path = path + '.tmp'
+		with open(tmp_path, 'wb') as f:
+			f.write(page)
+		os.rename(tmp_path, path)
+
+		self.disk[filename] = len(page)
+		self.disk_bytes += len(page)
+
+		while self.disk_bytes > self.max_bytes and len(self.disk) > 1:
+			oldest = next(iter(self.disk))
+			self.forget(oldest)
+
+
+	def forget(self, filename):
+		size = self.disk.pop(filename, None)
+		if size is None:
+			return
+
+		self.disk_bytes -= size
+		path = os.path.join(self.directory, filename)
+		for stale_path in [path, path + '.json']:
+			if os.path.exists(stale_path):
+				os.remove(stale_path)
+
+
+	'''
+	Function: Returns the hit and miss counts of the cache.
+	'''
+	def stats(self):
+		return {'hits': self.hits, 'misses': self.misses}
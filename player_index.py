@@ -0,0 +1,183 @@
+"""
+player_index.py
+--------------------------------------
+This document contains the player-ID index of the scraper. The index is built
+once from the player index pages of basketball-reference.com and
+sports-reference.com/cbb and stored locally, so the scraper can look up the
+webpage of any player by name instead of guessing it.
+"""
+
+# LIBRARIES
+import json
+import re
+import string
+
+
+# CONSTANTS
+DEFAULT_INDEX = 'player_index.json'
+
+# Names a player goes by on the player index pages when it differs from the name
+# used in PLAYERS (e.g. the NCAA lists Patty Mills under his given name).
+ALIASES = {
+	'Patty Mills': ['Patrick Mills'],
+	'Wesley Johnson': ['Wes Johnson'],
+	'Yogi Ferrell': ['Kevin Ferrell'],
+}
+
+# Player webpages for names that the index cannot tell apart on its own, as
+# {name: {'nba': path, 'ncaa': path}}. Either entry may be left out.
+OVERRIDES = {}
+
+NBA_PLAYER_LINK = re.compile(r'^/players/[a-z]/[a-z0-9]+\.html$')
+NCAA_PLAYER_LINK = re.compile(r'^/cbb/players/[a-z0-9-]+\.html$')
+YEARS = re.compile(r'(\d{4})\D+(\d{4})')
+
+
+'''
+Parameters:
+* name: a player's name (e.g. P.J. Hairston)
+
+Function: Helper function to normalize a name so that spelling differences between
+          the sites (e.g. PJ and P.J.) map to the same key.
+'''
+def normalize(name):
+	name = name.lower().replace('.', '').replace("'", '')
+	return ' '.join(name.split())
+
+
+'''
+Parameters:
+* soup: the HTML parser for a basketball-reference.com player index page (e.g. /players/c/)
+
+Function: Reads the link and first and last season of every player on the page.
+'''
+def read_nba_index(soup):
+	players = []
+	for row in soup.find(id='players').select('tbody > tr'):
+		link = row.find('a', href=NBA_PLAYER_LINK)
+		if link is None:
+			continue
+
+		year_min = int(row.find('td', attrs={'data-stat': 'year_min'}).get_text())
+		year_max = int(row.find('td', attrs={'data-stat': 'year_max'}).get_text())
+		players.append((link.get_text(), link['href'], year_min, year_max))
+
+	return players
+
+
+'''
+Parameters:
+* soup: the HTML parser for a sports-reference.com/cbb player index page (e.g. /cbb/players/c-index.html)
+
+Function: Reads the link and first and last season of every player on the page. Each
+          player is listed as a link followed by the seasons they played, e.g. (2007-2009).
+'''
+def read_ncaa_index(soup):
+	players = []
+	for link in soup.find_all('a', href=NCAA_PLAYER_LINK):
+		seasons = YEARS.search(link.parent.get_text())
+		if seasons is None:
+			continue
+
+		players.append((link.get_text(), link['href'], int(seasons.group(1)), int(seasons.group(2))))
+
+	return players
+
+
+class PlayerIndex(object):
+
+	'''
+	Parameters:
+	* nba: maps a normalized name to a list of [path, first season, last season].
+	* ncaa: same as nba, for NCAA players.
+
+	Function: Looks up the webpages of players by name in constant time.
+	'''
+	def __init__(self, nba, ncaa):
+		self.nba = nba
+		self.ncaa = ncaa
+
+
+	def candidates(self, table, player):
+		names = [player] + ALIASES.get(player, [])
+		found = []
+		for name in names:
+			found.extend(table.get(normalize(name), []))
+		return found
+
+
+	'''
+	Parameters:
+	* player: the player's name (e.g. Stephen Curry)
+	* nba_path: the player's NBA webpage, when it is already known (e.g. from a draft
+	            page). Only the NCAA webpage is then looked up.
+
+	Function: Returns the paths of the player's NBA and NCAA webpages, either of which
+	          is None if the player is not in the index. When several players share a
+	          name, the NBA and NCAA careers that line up (the NBA career starting the
+	          season after the NCAA career ended) are picked.
+	'''
+	def lookup(self, player, nba_path=None):
+		nba = self.candidates(self.nba, player)
+		if nba_path is not None:
+			nba = [candidate for candidate in nba if candidate[0] == nba_path] or [(nba_path, None, None)]
+		ncaa = self.candidates(self.ncaa, player)
+
+		best = None
+		for nba_path, nba_min, nba_max in nba or [(None, None, None)]:
+			for ncaa_path, ncaa_min, ncaa_max in ncaa or [(None, None, None)]:
+				if nba_min is None or ncaa_max is None:
+					gap = 0
+				else:
+					gap = abs(nba_min - ncaa_max - 1)
+
+				# Ties go to the most recent careers.
+				key = (gap, -(nba_min or 0), -(ncaa_max or 0))
+				if best is None or key < best[0]:
+					best = (key, nba_path, ncaa_path)
+
+		override = OVERRIDES.get(player, {})
+		return override.get('nba', best[1]), override.get('ncaa', best[2])
+
+
+	'''
+	Parameters:
+	* filename: the JSON file the index is written to.
+	'''
+	def save(self, filename=DEFAULT_INDEX):
+		with open(filename, 'w') as f:
+			json.dump({'nba': self.nba, 'ncaa': self.ncaa}, f, sort_keys=True)
+
+
+'''
+Parameters:
+* filename: the JSON file the index was saved to.
+
+Function: Loads a saved index.
+'''
+def load(filename=DEFAULT_INDEX):
+	with open(filename, 'r') as f:
+		data = json.load(f)
+
+	return PlayerIndex(data['nba'], data['ncaa'])
+
+
+'''
+Parameters:
+* fetch_soup: function that downloads and parses a webpage given its path on either site,
+              as fetch_soup('nba', path) or fetch_soup('ncaa', path).
+
+Function: Builds the index from the player index pages of both sites, one page per letter.
+'''
+def build(fetch_soup):
+	nba = {}
+	ncaa = {}
+
+	for letter in string.ascii_lowercase:
+		for name, path, year_min, year_max in read_nba_index(fetch_soup('nba', '/players/' + letter + '/')):
+			nba.setdefault(normalize(name), []).append([path, year_min, year_max])
+
+		for name, path, year_min, year_max in read_ncaa_index(fetch_soup('ncaa', '/cbb/players/' + letter + '-index.html')):
+			ncaa.setdefault(normalize(name), []).append([path, year_min, year_max])
+
+	return PlayerIndex(nba, ncaa)
@@ -0,0 +1,280 @@
+"""
+predict.py
+--------------------------------------
+This document contains the code to score NCAA prospects with a saved model. A
+model is fitted once on the training split and saved together with the PCA
+transform it expects. The saved model is then loaded once and scores prospects
+in batches, from a CSV file or stdin, or as a long-running HTTP service, e.g.
+
+	python predict.py --fit boosting
+	python predict.py prospects.csv --output predictions.csv
+	python predict.py --serve 8001 &
+	curl --data-binary @prospects.csv http://localhost:8001/
+
+Prospects are given as CSV rows with a header naming the columns of PCA.FEATURES,
+as they appear in data.csv (percentages as fractions). A name column is optional.
+"""
+
+# LIBRARIES
+import argparse
+import BaseHTTPServer
+import cPickle as pickle
+import cStringIO
+import csv
+import SocketServer
+import sys
+
+from itertools import islice
+
+import numpy as np
+
+# local files in directory
+import dataset
+import PCA
+
+
+# CONSTANTS
+MODEL_FILE = 'model.pkl'
+
+# Rows scored at a time.
+CHUNK_ROWS = 10000
+
+# Format of the predicted 3-point percentages, as in data.csv.
+PREDICTION_FORMAT = '%.9f'
+
+
+'''
+Parameters:
+* X: features of the training split, as transformed by PCA.py.
+* Y: labels of the training split, in percents.
+
+Function: Each function fits one type of model and returns it. Every model is a
+          scikit-learn estimator, so loading one does not need the libraries of the
+          scripts that train it.
+'''
+def fit_boosting(X, Y):
+	import boosting
+	return boosting.train_model(X, Y, boosting.PARAMS)
+
+
+def fit_forest(X, Y):
+	import forest
+	return forest.train_model(X, Y, forest.PARAMS)
+
+
+def fit_linear(X, Y):
+	from sklearn.linear_model import LinearRegression
+	return LinearRegression().fit(X, Y)
+
+
+def fit_weighted(X, Y):
+	# Weighted least squares with the weights of linear_regression.run_weighted_regression().
+	import linear_regression
+	from sklearn.linear_model import LinearRegression
+	weights = linear_regression.wls_weights(linear_regression.add_constant(X))
+	return LinearRegression().fit(X, Y, sample_weight=weights)
+
+
+MODELS = {
+	'boosting': fit_boosting,
+	'forest': fit_forest,
+	'linear': fit_linear,
+	'weighted': fit_weighted,
+}
+
+
+class Predictor(object):
+
+	'''
+	Parameters:
+	* model: a fitted model, predicting nba_fg3_pct in percents from the PCA components.
+	* transform: the PCA.Transform the model was trained on.
+	* model_type: the key of MODELS the model was fitted with.
+
+	Function: Scores prospects from their raw features.
+	'''
+	def __init__(self, model, transform, model_type=None):
+		self.model = model
+		self.transform = transform
+		self.model_type = model_type
+
+
+	'''
+	Parameters:
+	* X: rows x len(PCA.FEATURES) features, as in data.csv.
+
+	Function: Returns the predicted nba_fg3_pct of every row, as fractions.
+	'''
+	def predict(self, X):
+		X, Y = PCA.prepare(X)
+		return self.model.predict(self.transform.apply(X)) / 100.
+
+
+	'''
+	Parameters:
+	* filename: the file the model and transform are written to.
+	'''
+	def save(self, filename=MODEL_FILE):
+		with open(filename, 'wb') as f:
+			pickle.dump({'model_type': self.model_type, 'features': PCA.FEATURES, 'model': self.model,
+						'transform': self.transform}, f, pickle.HIGHEST_PROTOCOL)
+
+
+'''
+Parameters:
+* filename: a file written by Predictor.save().
+
+Function: Loads a saved model and its transform.
+'''
+def load_predictor(filename=MODEL_FILE):
+	with open(filename, 'rb') as f:
+		saved = pickle.load(f)
+
+	if saved['features'] != PCA.FEATURES:
+		raise ValueError(filename + ' was fitted on the features ' + ', '.join(saved['features']))
+
+	return Predictor(saved['model'], saved['transform'], saved['model_type'])
+
+
+'''
+Parameters:
+* model_type: a key of MODELS.
+* data: the dataset transformed by PCA.py.
+* manifest: the split manifest written by select_test_train.py.
+* transform: the transform saved by PCA.py.
+
+Function: Fits a model on the training split and returns it with its transform.
+'''
+def fit_predictor(model_type, data=PCA.TRANSFORMED_FILE, manifest=dataset.DEFAULT_MANIFEST,
+				transform=PCA.TRANSFORM_FILE):
+	X, Y = dataset.load_xy(data, split='train', manifest=manifest)
+	return Predictor(MODELS[model_type](X, Y), PCA.load_transform(transform), model_type)
+
+
+'''
+Parameters:
+* predictor: a Predictor.
+* infile: file object of the prospects, as CSV with a header.
+* outfile: file object the name and prediction of every prospect are written to, as CSV.
+* chunk_rows: number of prospects scored at a time.
+
+Function: Scores every prospect of a CSV file, one chunk at a time. Returns the number
+          of prospects scored. Raises ValueError if a feature column is missing or a
+          value is not a number. Read with the csv module rather than pandas, which
+          imports matplotlib when it is installed.
+'''
+def score_csv(predictor, infile, outfile, chunk_rows=CHUNK_ROWS):
+	reader = csv.reader(infile)
+	writer = csv.writer(outfile, lineterminator='\n')
+	writer.writerow(['name', 'nba_fg3_pct'])
+
+	header = [column.strip() for column in next(reader, [])]
+	missing = [feature for feature in PCA.FEATURES if feature not in header]
+	if missing:
+		raise ValueError('missing columns: ' + ', '.join(missing))
+	features = [header.index(feature) for feature in PCA.FEATURES]
+	name = header.index('name') if 'name' in header else None
+
+	count = 0
+	while True:
+		rows = [row for row in islice(reader, chunk_rows) if row]
+		if not rows:
+			return count
+
+		X = np.array([[row[i] for i in features] for row in rows], dtype=np.float64)
+		if name is not None:
+			names = [row[name] for row in rows]
+		else:
+			names = [str(i) for i in range(count, count + len(rows))]
+
+		writer.writerows(zip(names, [PREDICTION_FORMAT % prediction for prediction in predictor.predict(X)]))
+		count += len(rows)
+
+
+class PredictHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+	# Keeps connections open between requests, so clients can send batch after batch.
+	protocol_version = 'HTTP/1.1'
+
+	def do_POST(self):
+		body = self.rfile.read(int(self.headers.getheader('Content-Length') or 0))
+		body = body.replace('\r\n', '\n').replace('\r', '\n')
+
+		output = cStringIO.StringIO()
+		try:
+			score_csv(self.server.predictor, cStringIO.StringIO(body), output, self.server.chunk_rows)
+		except (ValueError, IndexError, csv.Error) as e:
+			self.send_error(400, str(e))
+			return
+
+		page = output.getvalue()
+		self.send_response(200)
+		self.send_header('Content-Type', 'text/csv')
+		self.send_header('Content-Length', str(len(page)))
+		self.end_headers()
+		self.wfile.write(page)
+
+
+	def log_message(self, format, *args):
+		if self.server.verbose:
+			BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class PredictServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+	daemon_threads = True
+
+	def __init__(self, address, predictor, chunk_rows=CHUNK_ROWS, verbose=False):
+		BaseHTTPServer.HTTPServer.__init__(self, address, PredictHandler)
+		self.predictor = predictor
+		self.chunk_rows = chunk_rows
+		self.verbose = verbose
+
+
+def parse_args():
+	parser = argparse.ArgumentParser(description='Score NCAA prospects with a saved model.')
+	parser.add_argument('input', nargs='?', default='-', help='CSV file of the prospects (default stdin)')
+	parser.add_argument('--output', default='-', help='CSV file the predictions are written to (default stdout)')
+	parser.add_argument('--model', default=MODEL_FILE, help='saved model file')
+	parser.add_argument('--fit', choices=sorted(MODELS),
+						help='fit a model of this type on the training split and save it, instead of scoring')
+	parser.add_argument('--data', default=PCA.TRANSFORMED_FILE, help='dataset transformed by PCA.py, for --fit')
+	parser.add_argument('--manifest', default=dataset.DEFAULT_MANIFEST, help='split manifest, for --fit')
+	parser.add_argument('--transform', default=PCA.TRANSFORM_FILE, help='transform saved by PCA.py, for --fit')
+	parser.add_argument('--serve', type=int, metavar='PORT',
+						help='keep the model loaded and score the CSV body of every POST request')
+	parser.add_argument('--host', default='localhost')
+	parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='prospects scored at a time')
+	parser.add_argument('--verbose', action='store_true', help='log every request')
+	return parser.parse_args()
+
+
+def main():
+	args = parse_args()
+
+	if args.fit:
+		predictor = fit_predictor(args.fit, args.data, args.manifest, args.transform)
+		predictor.save(args.model)
+		print 'Saved a ' + args.fit + ' model to ' + args.model + '.'
+		return
+
+	predictor = load_predictor(args.model)
+
+	if args.serve:
+		server = PredictServer((args.host, args.serve), predictor, args.chunk_rows, args.verbose)
+		print 'Serving ' + args.model + ' on http://' + args.host + ':' + str(args.serve) + '...'
+		server.serve_forever()
+		return
+
+	infile = sys.stdin if args.input == '-' else open(args.input, 'rU')
+	outfile = sys.stdout if args.output == '-' else open(args.output, 'wb')
+	try:
+		score_csv(predictor, infile, outfile, args.chunk_rows)
+	finally:
+		if infile is not sys.stdin:
+			infile.close()
+		if outfile is not sys.stdout:
+			outfile.close()
+
+
+if __name__ == '__main__':
+	main()
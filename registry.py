@@ -0,0 +1,315 @@
+"""
+registry.py
+--------------------------------------
+This document contains the model registry: a size-bounded on-disk store of
+fitted models, keyed by a fingerprint of the training data, the feature columns
+and the hyperparameters. The scripts look a model up before training it, so a
+re-run with unchanged data and parameters loads the fitted model instead, e.g.
+
+	python registry.py
+	python registry.py --clear
+
+Models are written with joblib, and their NumPy arrays (e.g. the weighted
+regression parameters, or the oob_prediction_ and train_score_ of the ensembles)
+are memory-mapped read-only when they are loaded rather than read and copied.
+A model that is grown further with warm start is first given writable copies
+with writable().
+"""
+
+# LIBRARIES
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from collections import OrderedDict
+
+import numpy as np
+import sklearn
+
+from sklearn.externals import joblib
+
+
+# CONSTANTS
+DEFAULT_REGISTRY_DIR = '.model_registry'
+
+# Number of bytes held on disk before the least recently used models are evicted.
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Parameters that change how a model is trained but not the fitted model, so they
+# are left out of its fingerprint.
+IGNORED_PARAMS = ['n_jobs', 'verbose']
+
+MODEL_EXTENSION = '.joblib'
+
+
+'''
+Parameters:
+* kind: the type of model (e.g. boosting).
+* params: the hyperparameters it is trained with.
+* X: features of the training data.
+* y: labels of the training data.
+* columns: names of the feature columns, if known.
+
+Function: Returns the key of a fitted model: a hash of everything the fit depends on.
+          The scikit-learn version is part of it, as saved models are only loaded by
+          the version that wrote them.
+'''
+def fingerprint(kind, params, X, y, columns=None):
+	params = dict((name, value) for name, value in params.items() if name not in IGNORED_PARAMS)
+
+	digest = hashlib.sha1()
+	digest.update(json.dumps([kind, params, columns, sklearn.__version__], sort_keys=True, default=str))
+	for array in [X, y]:
+		array = np.ascontiguousarray(array, dtype=np.float64)
+		digest.update(str(array.shape))
+		digest.update(array.data)
+
+	return digest.hexdigest()
+
+
+'''
+Parameters:
+* model: a model returned by ModelRegistry.get().
+
+Function: Replaces the memory-mapped arrays of the model with writable copies in
+          memory, so it can be warm-started (warm start resizes e.g. train_score_ in
+          place). Returns the model.
+'''
+def writable(model):
+	if isinstance(model, np.memmap):
+		return np.array(model)
+
+	for name, value in vars(model).items():
+		if isinstance(value, np.memmap):
+			setattr(model, name, np.array(value))
+	return model
+
+
+class ModelRegistry(object):
+
+	'''
+	Parameters:
+	* directory: folder of the on-disk store. None disables the registry, so every
+	             model is trained.
+	* max_bytes: size bound of the on-disk store.
+
+	Function: Memoizes fitted models by fingerprint. The store evicts the least
+	          recently used models once it is over max_bytes.
+	'''
+	def __init__(self, directory=DEFAULT_REGISTRY_DIR, max_bytes=DEFAULT_MAX_BYTES):
+		self.directory = directory
+		self.max_bytes = max_bytes
+
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+		# file name -> size in bytes, ordered from least to most recently used.
+		self.disk = OrderedDict()
+		self.disk_bytes = 0
+
+		if self.directory is not None:
+			self.load_index()
+
+
+	'''
+	Function: Scans the on-disk store once so that its models can be evicted in least
+	          recently used order. A model's modification time is when it was last used.
+	'''
+	def load_index(self):
+		if not os.path.isdir(self.directory):
+			os.makedirs(self.directory)
+
+		entries = []
+		for filename in os.listdir(self.directory):
+			path = os.path.join(self.directory, filename)
+			if filename.endswith(MODEL_EXTENSION) and os.path.isfile(path):
+				entries.append((os.path.getmtime(path), filename, os.path.getsize(path)))
+
+		for mtime, filename, size in sorted(entries):
+			self.disk[filename] = size
+			self.disk_bytes += size
+
+
+	def path(self, key):
+		return os.path.join(self.directory, key + MODEL_EXTENSION)
+
+
+	'''
+	Parameters:
+	* key: a fingerprint of the model.
+
+	Function: Returns the model stored under the key, or None if there is none. Its
+	          arrays are memory-mapped read-only from the store (see writable()).
+	'''
+	def get(self, key):
+		filename = key + MODEL_EXTENSION
+		if filename not in self.disk:
+			self.misses += 1
+			return None
+
+		path = self.path(key)
+		try:
+			model = joblib.load(path, mmap_mode='r')
+			os.utime(path, None)
+		except (IOError, OSError, EOFError, ValueError):
+			# Removed by another process, or written by an interrupted one.
+			self.forget(filename)
+			self.misses += 1
+			return None
+
+		self.disk[filename] = self.disk.pop(filename)
+		self.hits += 1
+		return model
+
+
+	'''
+	Parameters:
+	* key: a fingerprint of the model.
+	* model: the fitted model.
+	* info: a dictionary describing the model (kind, parameters, ...), written next to it.
+
+	Function: Stores the model, then evicts the least recently used models until the
+	          store is within its size bound.
+	'''
+	def put(self, key, model, info=None):
+		if self.directory is None:
+			return
+
+		filename = key + MODEL_EXTENSION
+		self.forget(filename)
+
+		path = self.path(key)
+		with open(path + '.json', 'w') as f:
+			json.dump(dict(info or {}, created=time.time()), f, sort_keys=True, default=str)
+
+		tmp_path = path + '.tmp'
+		joblib.dump(model, tmp_path)
+		os.rename(tmp_path, path)
+
+		size = os.path.getsize(path)
+		self.disk[filename] = size
+		self.disk_bytes += size
+
+		while self.disk_bytes > self.max_bytes and len(self.disk) > 1:
+			oldest = next(iter(self.disk))
+			self.forget(oldest)
+			self.evictions += 1
+
+
+	'''
+	Parameters:
+	* kind: the type of model (e.g. boosting).
+	* params: the hyperparameters it is trained with.
+	* X: features of the training data.
+	* y: labels of the training data.
+	* train: function that trains the model, called as train(X, y, params).
+	* columns: names of the feature columns, if known.
+
+	Function: Returns the stored model trained on the same data with the same
+	          parameters, or trains the model and stores it.
+	'''
+	def cached(self, kind, params, X, y, train, columns=None):
+		key = fingerprint(kind, params, X, y, columns)
+		model = self.get(key)
+		if model is None:
+			model = train(X, y, params)
+			self.put(key, model, {'kind': kind, 'params': params, 'columns': columns, 'rows': len(X)})
+
+		return model
+
+
+	def forget(self, filename):
+		size = self.disk.pop(filename, None)
+		if size is None:
+			return
+
+		self.disk_bytes -= size
+		path = os.path.join(self.directory, filename)
+		for stale_path in [path, path + '.json']:
+			if os.path.exists(stale_path):
+				os.remove(stale_path)
+
+
+	'''
+	Function: Returns the description written with every stored model (see put()),
+	          from the least to the most recently used, with its key and size.
+	'''
+	def entries(self):
+		entries = []
+		for filename, size in self.disk.items():
+			info = {}
+			path = os.path.join(self.directory, filename)
+			if os.path.exists(path + '.json'):
+				with open(path + '.json', 'r') as f:
+					info = json.load(f)
+			entries.append(dict(info, key=filename[:-len(MODEL_EXTENSION)], bytes=size))
+
+		return entries
+
+
+	'''
+	Function: Returns the hit, miss and eviction counts of the registry, and the number
+	          and size of the stored models.
+	'''
+	def stats(self):
+		return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+				'models': len(self.disk), 'bytes': self.disk_bytes}
+
+
+'''
+Parameters:
+* parser: an argparse.ArgumentParser.
+
+Function: Helper function to add the registry arguments shared by the training scripts.
+'''
+def add_arguments(parser):
+	parser.add_argument('--registry-dir', default=DEFAULT_REGISTRY_DIR, help='folder of the model registry')
+	parser.add_argument('--no-registry', action='store_true', help='always train, and do not store the models')
+
+
+'''
+Parameters:
+* args: the arguments parsed by a parser given to add_arguments().
+
+Function: Helper function to open the registry the arguments ask for.
+'''
+def from_args(args):
+	return ModelRegistry(None if args.no_registry else args.registry_dir)
+
+
+'''
+Parameters:
+* store: a ModelRegistry.
+
+Function: Helper function to summarize the stats of the registry in one line.
+'''
+def format_stats(store):
+	stats = store.stats()
+	return ('Model registry: %(hits)d hits, %(misses)d misses, %(evictions)d evictions, '
+			'%(models)d models (%(bytes)d bytes)' % stats)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='List or clear the fitted models in the model registry.')
+	parser.add_argument('--registry-dir', default=DEFAULT_REGISTRY_DIR, help='folder of the model registry')
+	parser.add_argument('--clear', action='store_true', help='remove every stored model')
+	args = parser.parse_args()
+
+	store = ModelRegistry(args.registry_dir)
+	if args.clear:
+		for filename in list(store.disk):
+			store.forget(filename)
+		print 'Cleared ' + args.registry_dir + '.'
+		return
+
+	for entry in store.entries():
+		print '%s  %-16s %6d rows  %10d bytes  %s' % (entry['key'][:12], entry.get('kind', '?'), entry.get('rows', 0),
+													entry['bytes'], json.dumps(entry.get('params', {}), sort_keys=True))
+	print format_stats(store)
+
+
+if __name__ == '__main__':
+	main()
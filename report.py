@@ -0,0 +1,83 @@
+"""
+report.py
+--------------------------------------
+This document contains the code to write the deviance and variable importance
+plots of saved gradient boosting models to image files, e.g.
+
+	python report.py boosting_a.pkl boosting_b.pkl --output-dir reports
+
+Plots are drawn without a display (see boosting.save_plots()), and the models
+are reported on in parallel, one process each.
+"""
+
+# LIBRARIES
+import argparse
+import os
+
+from multiprocessing import cpu_count
+from multiprocessing import Pool
+
+# local files in directory
+import boosting
+import dataset
+import PCA
+import predict
+
+
+'''
+Parameters:
+* job: a (model file, dataset file, split, manifest, image file) tuple.
+
+Function: Writes the plots of one saved model (see predict.py) on a split of the
+          dataset it was trained on. Returns the image file, or the error message if
+          the model could not be reported on.
+'''
+def report_model(job):
+	model_file, data, split, manifest, filename = job
+	try:
+		predictor = predict.load_predictor(model_file)
+		if predictor.model_type != 'boosting':
+			raise ValueError('not a gradient boosting model')
+
+		test_X, test_y = dataset.load_xy(data, split=split, manifest=manifest)
+		boosting.save_plots(test_X, test_y, predictor.model, PCA.COMPONENTS[:-1], filename)
+	except (IOError, ValueError, KeyError) as e:
+		return model_file + ': ' + str(e)
+
+	return filename
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Write the plots of saved gradient boosting models to image files.')
+	parser.add_argument('models', nargs='+', help='model files saved by predict.py --fit boosting')
+	parser.add_argument('--data', default=PCA.TRANSFORMED_FILE, help='dataset transformed by PCA.py')
+	parser.add_argument('--split', default='test', help='split the test deviance is computed on')
+	parser.add_argument('--manifest', default=dataset.DEFAULT_MANIFEST, help='split manifest')
+	parser.add_argument('--output-dir', default='.', help='folder the images are written to')
+	parser.add_argument('--workers', type=int, default=cpu_count(), help='number of processes (default one per core)')
+	args = parser.parse_args()
+
+	if not os.path.isdir(args.output_dir):
+		os.makedirs(args.output_dir)
+
+	jobs = []
+	for model_file in args.models:
+		filename = os.path.join(args.output_dir, os.path.splitext(os.path.basename(model_file))[0] + '.png')
+		jobs.append((model_file, args.data, args.split, args.manifest, filename))
+
+	if args.workers > 1 and len(jobs) > 1:
+		pool = Pool(min(args.workers, len(jobs)))
+		try:
+			results = pool.map(report_model, jobs)
+		finally:
+			pool.close()
+			pool.join()
+	else:
+		results = map(report_model, jobs)
+
+	for result in results:
+		print 'Wrote ' + result if result.endswith('.png') else 'Skipped ' + result
+
+
+if __name__ == '__main__':
+	main()
@@ -7,8 +7,27 @@ and sports-reference.com/cbb.
 """
 
 # LIBRARIES
-import csv
-import urllib2
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+
+from multiprocessing import cpu_count
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+import discovery
+import export
+import facts
+import http_session
+import instrument
+import journal
+import page_archive
+import page_cache
+import player_index
+import throttle
 
 from bs4 import BeautifulSoup
 from bs4 import Comment
@@ -17,7 +36,59 @@ from bs4 import Comment
 NBA_BASE_URL = 'https://www.basketball-reference.com'
 NCAA_BASE_URL = 'https://www.sports-reference.com/'
 
-# Contains all the players whose data will be extracted.
+# Requests per second allowed by each site. basketball-reference.com and
+# sports-reference.com block clients that send more than about 20 requests a minute.
+NBA_RATE_LIMIT = 1. / 3
+NCAA_RATE_LIMIT = 1. / 3
+
+# Number of players scraped at the same time.
+DEFAULT_WORKERS = 4
+
+# Seconds to wait on a page before giving up.
+FETCH_TIMEOUT = http_session.DEFAULT_TIMEOUT
+
+# Used only when a player is missing from the player-ID index. Some players have
+# different endings to their player webpage (e.g. '02' instead of '01').
+NBA_ENDINGS = {
+	'02': [
+		'Danny Green', 'Patty Mills', 'Wesley Matthews', 'Jordan Crawford', 'Derrick Williams',
+		'Kemba Walker', 'Markieff Morris', 'Jordan Hamilton', 'Tobias Harris', 'Harrison Barnes',
+		'Tim Hardaway Jr.', 'Jerian Grant', 'Jaylen Brown', 'Taurean Prince', 'Gerald Henderson',
+		'PJ Hairston'
+	],
+	'03': ['Brandon Knight', 'Marcus Morris', 'Jeffery Taylor', 'Andre Roberson'],
+	'04': ['Chris Johnson', 'Stanley Johnson'],
+}
+NCAA_ENDINGS = {
+	'2': [
+		'Gerald Henderson', 'James Johnson', 'Derrick Williams', 'Jordan Hamilton', 'Josh Richardson',
+		'Reggie Bullock'
+	],
+	'3': ['James Anderson', 'Ryan Kelly'],
+	'4': ['Mike Scott'],
+}
+
+# Seasons the league averages are read for, named by the year they end in.
+FIRST_SEASON = 2010
+LAST_SEASON = 2018
+
+# NCAA seasons are read from this many seasons before the first NBA season, to
+# cover the college careers of the first draft class.
+NCAA_SEASONS_BEFORE = 5
+
+# Number of players handed to the workers at a time. Only one batch of jobs and
+# rows is held in memory, however long the roster is.
+DEFAULT_BATCH_SIZE = 256
+
+# BeautifulSoup backends that can be used to parse pages. lxml is several times
+# faster than the built-in parser but needs the lxml package.
+PARSERS = ['html.parser', 'lxml']
+
+TEAM_SEASON_LINK = re.compile(r'^/teams/[A-Z]+/\d{4}\.html$')
+SCHOOL_SEASON_LINK = re.compile(r'^/cbb/schools/[a-z0-9-]+/\d{4}\.html$')
+
+# Contains all the players whose data will be extracted, unless the roster is
+# discovered from the draft class pages (see discovery.py).
 PLAYERS = [
 	'James Harden', 'Stephen Curry', 'DeMar DeRozan', 'Jonny Flynn', 'Earl Clark', 'James Johnson',
 	'Gerald Henderson', 'Jeff Teague', 'Tyreke Evans', 'Wayne Ellington', 'Eric Maynor', 'Chase Budinger',
@@ -48,13 +119,68 @@ PLAYERS = [
 ]
 
 # GLOBAL VARIABLES
-# Contains the average number of 3-point attempts for the league.
-# Ranges from the 2009-10 season to the 2017-18 season.
+# Contains the average number of 3-point attempts for the league, by season (e.g. 2009-10).
+# Read for the seasons of the run by get_lg_fg3a(), and for any other season a player
+# played in when it is first needed (see league_fg3a()).
 LEAGUE_FG3A = {}
+LEAGUE_LOCK = threading.Lock()
+
+# Maps a team-season link (e.g. /teams/GSW/2010.html) to the team's (ortg, fg3a per
+# game), as read from the league pages by get_lg_fg3a().
+TEAM_SEASONS = {}
+
+# Maps a school-season link (e.g. /cbb/schools/davidson/2009.html) to the school's
+# (games, fg3a), as read from the NCAA season pages by get_school_seasons().
+SCHOOL_SEASONS = {}
+
+# Memoizes every page fetched by the scraper. Replaced in main() once the
+# command line options are known.
+PAGE_CACHE = page_cache.PageCache(directory=None)
+
+# Every fetched page is stored in the archive, unless it is None. Set in main().
+ARCHIVE = None
+
+# The raw numbers of every finished player are added to the fact tables, unless
+# it is None. Set in main().
+FACTS = None
+
+# When True, pages are read from ARCHIVE only and the network is never used.
+REPLAY = False
+
+# Stage timings, request latencies and counters of the run.
+METRICS = instrument.Metrics()
+
+# True in the worker processes of a REPLAY run, whose METRICS are sent back with each player.
+IN_WORKER = False
+
+# Keep-alive HTTP client shared by all fetches. Replaced in main().
+SESSION = http_session.HttpSession()
+
+# Spaces out requests to each site. Configured in main().
+THROTTLE = throttle.HostThrottle()
+
+# url -> event set once the page has been downloaded. Keeps two workers from
+# downloading the same team page at the same time.
+IN_FLIGHT = {}
+IN_FLIGHT_LOCK = threading.Lock()
 
-# [name, year, team, fg3, fg3a, fg3_pct, team_ortg, team_fg3a, lg_fg3a]
-# Contains the rows that will eventually be written into the CSV file.
-PLAYER_STATS = []
+# Maps player names to the paths of their webpages. Loaded in main() when the
+# index has been built with --build-index.
+PLAYER_INDEX = None
+
+# BeautifulSoup backend used to parse pages. Set in main().
+PARSER = 'html.parser'
+
+
+'''
+Parameters:
+* page: the contents of the webpage.
+
+Function: Helper function to parse a webpage with the selected PARSER.
+'''
+@METRICS.timed('parse')
+def make_soup(page):
+	return BeautifulSoup(page, PARSER)
 
 
 '''
@@ -67,193 +193,435 @@ Function: Helper function to grab a specific table from a webpage.
 def get_table(soup, table_id):
 	table = soup.find(id=table_id)
 
-	# Actual data is embedded in HTML comment tags, so a wrapper is needed
-	# to remove the tags.
-	wrapper = BeautifulSoup(str(table), 'html.parser')
-	table_content = wrapper.find_all(text=lambda text:isinstance(text, Comment))[0]
-	
-	table_soup = BeautifulSoup(str(table_content), 'html.parser')
-	return table_soup
+	# Actual data is embedded in HTML comment tags. The comment is plain text
+	# to the parser, so its contents have to be parsed on their own.
+	table_content = table.find(text=lambda text:isinstance(text, Comment))
+	if table_content is None:
+		return table
+
+	return make_soup(table_content)
+
 
+'''
+Parameters:
+* row: a table row of the parsed webpage.
+* stat: the data-stat attribute of the cell (e.g. fg3a).
 
+Function: Helper function to read the text of a cell in a table row.
 '''
-Function: Update the global variable LEAGUE_FG3A.
+def read_stat(row, stat):
+	return row.find('td', attrs={'data-stat': stat}).get_text()
+
+
+'''
+Parameters:
+* url: the address of the webpage.
+* refresh: download the page even if it is in PAGE_CACHE.
+
+Function: Helper function to download a webpage. Pages are served from PAGE_CACHE
+          when possible, so each page is downloaded at most once. Expired pages are
+          revalidated with the server and only downloaded again if they changed.
+          Safe to call from several threads; requests are spaced out by THROTTLE.
+          Every page is also stored in ARCHIVE. In REPLAY mode, pages are read from
+          ARCHIVE instead.
+'''
+def fetch_page(url, refresh=False):
+	if REPLAY:
+		page = ARCHIVE.get(url)
+		if page is None:
+			raise IOError('Page not in archive: ' + url)
+		return page
+
+	page = fetch_cached(url, refresh)
+	if ARCHIVE is not None:
+		ARCHIVE.put(url, page)
+
+	return page
+
+
+def fetch_cached(url, refresh):
+	while True:
+		with IN_FLIGHT_LOCK:
+			pending = IN_FLIGHT.get(url)
+			if pending is None:
+				page = None if refresh else PAGE_CACHE.get(url)
+				if page is not None:
+					return page
+
+				pending = IN_FLIGHT[url] = threading.Event()
+				break
+
+		# Another worker is downloading the page, so look it up again once it is done.
+		pending.wait()
+		refresh = False
+
+	try:
+		stale_page, validators = PAGE_CACHE.get_stale(url)
+		wait_turn(url)
+		status, page, validators = download(url, validators if stale_page is not None else None)
+		if status == 304:
+			page = stale_page
+		PAGE_CACHE.put(url, page, validators)
+	finally:
+		with IN_FLIGHT_LOCK:
+			del IN_FLIGHT[url]
+		pending.set()
+
+	return page
+
+
+'''
+Parameters:
+* url: the address of the webpage about to be requested.
+
+Function: Helper function to wait until THROTTLE allows a request to the URL's host.
+'''
+@METRICS.timed('throttle')
+def wait_turn(url):
+	THROTTLE.wait(url)
+
+
 '''
-def get_lg_fg3a():
+Parameters:
+* url: the address of the webpage.
+* validators: the etag and last_modified headers of a cached copy of the page, or None.
+
+Function: Helper function to send a request through SESSION and record its latency.
+'''
+@METRICS.timed('fetch')
+def download(url, validators):
+	start = time.time()
+	status, page, validators = SESSION.get(url, validators)
+	METRICS.record_request(throttle.host_of(url), time.time() - start, len(page) if page is not None else 0)
+
+	return status, page, validators
+
+
+'''
+Parameters:
+* workers: number of league pages downloaded at the same time.
+* years: the seasons to read, by the year they end in. Defaults to FIRST_SEASON to LAST_SEASON.
+* refresh: download the page of the last season even if it is in the page cache, as
+           that season may still be in progress.
+
+Function: Update the global variables LEAGUE_FG3A and TEAM_SEASONS. The league page of a
+          season lists the stats of every team, so the team pages do not have to be
+          downloaded one by one.
+'''
+def get_lg_fg3a(workers=1, years=None, refresh=False):
 	
 	print 'Acquiring league average 3-point attempts...'
-	
-	for year in range(2010, 2019):
-		year_url = NBA_BASE_URL + '/leagues/NBA_' + str(year) + '.html'
-		response = urllib2.urlopen(year_url)
-		lg_soup = BeautifulSoup(response, 'html.parser')
-		lg_fg3a_soup = get_table(lg_soup, 'all_team-stats-per_game')
-		
-		lg_avg_row = lg_fg3a_soup.select_one('tfoot')
-		lg_avg_soup = BeautifulSoup(str(lg_avg_row), 'html.parser')
 
-		lg_fg3a = lg_avg_soup.select_one('td[data-stat="fg3a"]').get_text()
+	years = years or range(FIRST_SEASON, LAST_SEASON + 1)
 
+	pool = ThreadPool(workers)
+	try:
+		lg_stats = pool.map(lambda year: extract_league_season(year, refresh and year == years[-1]), years)
+	finally:
+		pool.close()
+
+	for year, (lg_fg3a, teams) in zip(years, lg_stats):
 		season = str(year-1) + '-' + str(year)[2:]
 		LEAGUE_FG3A[season] = lg_fg3a
+		TEAM_SEASONS.update(teams)
 
 	print 'Success.'
 
 
-def parse_players():
+'''
+Parameters:
+* year: the season, by the year it ends in.
+* refresh: download the page even if it is in the page cache.
 
-	print 'Parsing player array...'
+Function: Returns the league average 3-point attempts per game of the season, and the
+          stats of every team by the link to its season page.
+'''
+def extract_league_season(year, refresh=False):
+	year_url = NBA_BASE_URL + '/leagues/NBA_' + str(year) + '.html'
+	lg_soup = make_soup(fetch_page(year_url, refresh))
+	return read_league_page(lg_soup), read_league_teams(lg_soup)
 
-	# Some players have different endings to their player webpage (e.g. '02' instead of '01').
-	# This accounts for the variability in this ending.	
-	nba_2 = [
-		'Danny Green', 'Patty Mills', 'Wesley Matthews', 'Jordan Crawford', 'Derrick Williams',
-		'Kemba Walker', 'Markieff Morris', 'Jordan Hamilton', 'Tobias Harris', 'Harrison Barnes',
-		'Tim Hardaway Jr.', 'Jerian Grant', 'Jaylen Brown', 'Taurean Prince', 'Gerald Henderson',
-		'PJ Hairston'
-	]
-	nba_3 = ['Brandon Knight', 'Marcus Morris', 'Jeffery Taylor', 'Andre Roberson']
-	nba_4 = ['Chris Johnson', 'Stanley Johnson']	
 
-	ncaa_2 = [
-		'Gerald Henderson', 'James Johnson', 'Derrick Williams', 'Jordan Hamilton', 'Josh Richardson',
-		'Reggie Bullock'
-	]
-	ncaa_3 = ['James Anderson', 'Ryan Kelly']
-	ncaa_4 = ['Mike Scott']	
+'''
+Parameters:
+* season: the season, as on a player's webpage (e.g. 2009-10).
+* refresh: download the league page even if it is in the page cache, as a season
+           outside the ones read by get_lg_fg3a() may still be in progress.
+
+Function: Returns the league average 3-point attempts per game of the season. Seasons
+          that get_lg_fg3a() did not read, e.g. a new season picked up by --incremental,
+          are read from their league page the first time they are needed.
+'''
+def league_fg3a(season, refresh=False):
+	with LEAGUE_LOCK:
+		if season not in LEAGUE_FG3A:
+			lg_fg3a, teams = extract_league_season(int(season[:4]) + 1, refresh)
+			LEAGUE_FG3A[season] = lg_fg3a
+			TEAM_SEASONS.update(teams)
 
+		return LEAGUE_FG3A[season]
 
 
-	for player in PLAYERS:
+'''
+Parameters:
+* lg_soup: the HTML parser for a league season webpage
 
-		print 'Extracting data for ' + player + '...'
+Function: Reads the league average 3-point attempts per game.
+'''
+@METRICS.timed('extract')
+def read_league_page(lg_soup):
+	lg_fg3a_soup = get_table(lg_soup, 'all_team-stats-per_game')
+	return read_stat(lg_fg3a_soup.select_one('tfoot'), 'fg3a')
 
-		nba_fg3_pct, nba_avg_team_ortg, nba_relative_team_fg3a = parse_nba(player, nba_2, nba_3, nba_4)
-		ncaa_fg3a, ncaa_fg3_pct, ncaa_ft_pct, avg_sos, ncaa_avg_team_fg3a = parse_ncaa(player, ncaa_2, ncaa_3, ncaa_4)
-		
-		print 'Data for ' + player + ' successfully extracted.'
-		PLAYER_STATS.append([player, ncaa_fg3a, ncaa_fg3_pct, ncaa_ft_pct, avg_sos, ncaa_avg_team_fg3a, nba_avg_team_ortg, nba_relative_team_fg3a, nba_fg3_pct])
 
+'''
+Parameters:
+* lg_soup: the HTML parser for a league season webpage
 
+Function: Reads the Offensive Rating and 3-point attempts per game of every team,
+          by the link to the team's season webpage.
+'''
+@METRICS.timed('extract')
+def read_league_teams(lg_soup):
+	ortgs = {}
+	for row in get_table(lg_soup, 'all_misc_stats').select('tbody > tr'):
+		team_link = row.find('a', href=TEAM_SEASON_LINK)
+		if team_link is not None:
+			ortgs[team_link['href']] = read_stat(row, 'off_rtg')
 
-def parse_nba(player, players_2, players_3, players_4):
-	
-	# Some players have different endings to their player webpage (e.g. '02' instead of '01').
-	# This accounts for the variability in this ending.
+	teams = {}
+	for row in get_table(lg_soup, 'all_team-stats-per_game').select('tbody > tr'):
+		team_link = row.find('a', href=TEAM_SEASON_LINK)
+		if team_link is not None and team_link['href'] in ortgs:
+			teams[team_link['href']] = (ortgs[team_link['href']], read_stat(row, 'fg3a'))
 
-	end = '01'
-	if player in players_2:
-		end = '02'
-	elif player in players_3:
-		end = '03'
-	elif player in players_4:
-		end = '04'
+	return teams
 
-	player_name = player.lower().replace("'", '').split(' ')
-	player_url = player_name[1][0:5] + player_name[0][0:2] + end
-	url = NBA_BASE_URL + '/players/' + player_name[1][0] + '/' + player_url + '.html'
 
-	response = urllib2.urlopen(url)
-	player_soup = BeautifulSoup(response, 'html.parser')
+'''
+Parameters:
+* workers: number of season pages downloaded at the same time.
+* years: the NCAA seasons to read, by the year they end in.
 
-	return extract_nba(player_soup, player)	
+Function: Update the global variable SCHOOL_SEASONS. The school stats page of a season
+          lists every school, so the school pages do not have to be downloaded one by one.
+'''
+def get_school_seasons(workers, years):
+
+	print 'Acquiring NCAA school 3-point attempts...'
+
+	def extract_year(year):
+		year_url = NCAA_BASE_URL + '/cbb/seasons/' + str(year) + '-school-stats.html'
+		return read_school_season_page(make_soup(fetch_page(year_url)))
+
+	pool = ThreadPool(workers)
+	try:
+		for schools in pool.map(extract_year, years):
+			SCHOOL_SEASONS.update(schools)
+	finally:
+		pool.close()
+
+	print 'Success.'
 
 
 '''
 Parameters:
-* player_soup: the HTML parser for the player's webpage
-* name: the player's name (e.g. Stephen Curry)
+* season_soup: the HTML parser for an NCAA season's school stats webpage
 
-Function: Extract the data in the Totals table in player's webpage. Updates the global
-variable PLAYER_STATS.
+Function: Reads the games played and 3-point attempts of every school, by the link
+          to the school's season webpage.
 '''
-def extract_nba(player_soup, name):
-	tot_soup = get_table(player_soup, 'all_totals')
-
-	foot_soup = BeautifulSoup(str(tot_soup.select_one('tfoot > tr')), 'html.parser')
+@METRICS.timed('extract')
+def read_school_season_page(season_soup):
+	schools = {}
+	for row in get_table(season_soup, 'basic_school_stats').select('tbody > tr'):
+		school_link = row.find('a', href=SCHOOL_SEASON_LINK)
+		if school_link is not None:
+			schools[school_link['href']] = (int(read_stat(row, 'g')), int(read_stat(row, 'fg3a')))
 
-	#g = int(foot_soup.select_one('td[data-stat="g"]').get_text())
-	fg3 = int(foot_soup.select_one('td[data-stat="fg3"]').get_text())
-	fg3a = int(foot_soup.select_one('td[data-stat="fg3a"]').get_text())
-	fg3_pct = 100. * fg3 / fg3a
-	avg_team_ortg = 0.
-	avg_team_fg3a = 0.
-	avg_lg_fg3a = 0.
+	return schools
 
-	yrs = 0
-	prev_yr = ''
-	for row in tot_soup.select('tbody > tr'):
 
-		row_soup = BeautifulSoup(str(row), 'html.parser')
+'''
+Parameters:
+* sink: where the row of each player is written (see export.py).
+* workers: number of players scraped at the same time.
+* checkpoint: a Journal that every finished player is appended to, or None.
+* resume: skip players that are already in the checkpoint journal.
+* incremental: for players already in the checkpoint journal, only fetch the seasons
+               from their last recorded NBA season on.
+* players: the roster, as (name, NBA webpage path) pairs; the path may be None. Any
+           iterable works, including a generator such as discovery.discover_players().
+           Defaults to PLAYERS.
+* batch_size: number of players handed to the workers at a time.
+* skip_errors: leave out players whose pages are missing or lack the needed tables,
+               instead of stopping the run.
+
+Function: Scrapes every player of the roster and streams their rows to the sink. Players
+          are appended to the checkpoint journal as soon as they are done. Each row is
+          written to the sink once every player before it is done too, so rows stay in
+          the order of the roster regardless of the number of workers. The roster is
+          read one batch at a time, so memory use does not grow with its length. In
+          REPLAY mode the workers are processes, so extraction runs on all cores, and
+          the timings each worker measures are added to METRICS as its players finish.
+'''
+def parse_players(sink, workers=1, checkpoint=None, resume=False, incremental=False, players=None,
+				batch_size=DEFAULT_BATCH_SIZE, skip_errors=False):
 
-		team = row_soup.select_one('td > a').get_text()
-		if team == 'NBA':
-			continue
+	print 'Parsing player array...'
 
-		yrs += 1
-		team_ortg, team_fg3a = extract_team_stats(row_soup.select_one('td > a')['href'])
-		avg_team_ortg += float(team_ortg)
-		avg_team_fg3a += float(team_fg3a)
+	if players is None:
+		players = [(player, None) for player in PLAYERS]
+
+	pool = Pool(workers, init_worker_process) if REPLAY else ThreadPool(workers)
+	try:
+		position = 0
+		for batch in discovery.batches(players, batch_size):
+			jobs = []
+			for player, nba_path in batch:
+				record = checkpoint.get(player) if checkpoint is not None else None
+				jobs.append((position, player, nba_path, record, resume, incremental, skip_errors))
+				position += 1
+
+			# Rows that finished ahead of a player before them, by position in the roster.
+			finished = {}
+			next_position = jobs[0][0]
+
+			for done, row, record, metrics in pool.imap_unordered(run_job, jobs):
+				if metrics is not None:
+					METRICS.merge(metrics)
+				if record is not None:
+					METRICS.count('players')
+					if checkpoint is not None:
+						checkpoint.append(record)
+					if FACTS is not None:
+						FACTS.add(record)
+
+				finished[done] = row
+				while next_position in finished:
+					row = finished.pop(next_position)
+					if row is not None:
+						sink.write(row)
+					next_position += 1
+	finally:
+		pool.close()
 
-		year = row_soup.select_one('th > a').get_text()
-		if prev_yr != year:
-			avg_lg_fg3a += float(LEAGUE_FG3A[year])
 
-		prev_yr = year
+'''
+Function: Runs in every worker process. Locks copied from the parent process may have
+          been held by one of its threads at the time of the fork, so fresh ones are made.
+'''
+def init_worker_process():
+	global IN_WORKER
+	IN_WORKER = True
 
-	avg_team_ortg /= yrs
-	relative_team_fg3a = avg_team_fg3a / avg_lg_fg3a
-	#PLAYER_STATS.append([name, fg3, fg3a, fg3_pct, avg_team_ortg, avg_team_fg3a, avg_lg_fg3a])
-	return fg3_pct, avg_team_ortg, relative_team_fg3a
+	METRICS.reset()
+	ARCHIVE.lock = threading.Lock()
 
 
 '''
 Parameters:
-* extension: the referential link to a given player's team page for a specific season.
+* job: a job of parse_players(), as described in scrape_player().
 
-Function: Extracts a team's Offensive Rating and 3-point attempts per game.
+Function: Scrapes one player, and returns what scrape_player() does followed by the
+          METRICS measured while doing so in a worker process, or None in the parent.
 '''
-def extract_team_stats(extension):
-	team_url = NBA_BASE_URL + extension
-	response = urllib2.urlopen(team_url)
+def run_job(job):
+	return scrape_player(job) + (METRICS.snapshot() if IN_WORKER else None,)
 
-	team_soup = BeautifulSoup(response, 'html.parser')
 
-	# Get team offensive rating
-	ortg_soup = get_table(team_soup, 'all_team_misc')
-	ortg_row = ortg_soup.select_one('tbody > tr')
-	ortg = ortg_row.select_one('td[data-stat="off_rtg"]').get_text()
+'''
+Parameters:
+* job: a (position, player, NBA webpage path, journal record, resume, incremental,
+       skip_errors) tuple, as described in parse_players().
 
-	# Get team 3 point attempts per game
-	team_fg3_soup = get_table(team_soup, 'all_team_and_opponent')
-	team_fg3_row = team_fg3_soup.select('tbody > tr')[1]
-	row_soup = BeautifulSoup(str(team_fg3_row), 'html.parser')
-	fg3a_g = row_soup.select_one('td[data-stat="fg3a_per_g"]').get_text()
+Function: Scrapes one player. Returns their position, their row, and the record to add
+          to the journal (None if the row was taken from the journal as is). The row
+          is None if the player was skipped. The record holds the player's raw totals
+          and seasons, and the row is computed from them by facts.player_row().
+'''
+def scrape_player(job):
+	position, player, nba_path, record, resume, incremental, skip_errors = job
+
+	# Discovered names are unicode, and print only takes ASCII unicode when stdout is a pipe.
+	name = export.utf8(player)
+
+	if record is not None and resume and not incremental:
+		print 'Data for ' + name + ' found in journal.'
+		return position, record['row'], None
+
+	try:
+		print 'Extracting data for ' + name + '...'
+
+		if record is not None and incremental:
+			# The last recorded season may have been in progress, so it is fetched again
+			# along with every season after it.
+			last_season = max(season[0] for season in record['nba_seasons'])
+			known_seasons = dict(((season[0], season[1]), season[2:4]) for season in record['nba_seasons'] if season[0] < last_season)
+
+			nba_totals, nba_seasons = parse_nba(player, known_seasons, nba_path)
+			if 'ncaa_totals' in record:
+				ncaa_totals, ncaa_seasons = record['ncaa_totals'], record['ncaa_seasons']
+			else:
+				# Records written before the raw totals were kept in the journal.
+				ncaa_totals, ncaa_seasons = parse_ncaa(player, nba_path)
+		else:
+			nba_totals, nba_seasons = parse_nba(player, nba_path=nba_path)
+			ncaa_totals, ncaa_seasons = parse_ncaa(player, nba_path)
+
+		record = {'player': player, 'nba_totals': nba_totals, 'nba_seasons': nba_seasons,
+				'ncaa_totals': ncaa_totals, 'ncaa_seasons': ncaa_seasons}
+		record['row'] = facts.player_row(record)
+	except Exception as e:
+		if not skip_errors:
+			raise
+
+		# Discovered players include some who never attempted a 3-pointer or played
+		# outside the NCAA.
+		try:
+			message = str(e)
+		except UnicodeError:
+			message = export.utf8(unicode(e))
+		print 'Skipping ' + name + ': ' + type(e).__name__ + ' ' + message
+		METRICS.count('players_skipped')
+		return position, None, None
+
+	print 'Data for ' + name + ' successfully extracted.'
+	return position, record['row'], record
 
-	return ortg, fg3a_g		
 
+'''
+Parameters:
+* player: the player's name (e.g. Stephen Curry)
+* nba_path: the path of the player's NBA webpage, if it is already known.
+
+Function: Returns the paths of the player's NBA and NCAA webpages. The paths come from
+          PLAYER_INDEX, falling back to guessing them from the player's name.
+'''
+def player_paths(player, nba_path=None):
+	ncaa_path = None
+	if PLAYER_INDEX is not None:
+		nba_path, ncaa_path = PLAYER_INDEX.lookup(player, nba_path)
 
+	return nba_path or guess_nba_path(player), ncaa_path or guess_ncaa_path(player)
 
 
-def parse_ncaa(player, players_2, players_3, players_4):
+def guess_nba_path(player):
+	end = '01'
+	for ending, players in NBA_ENDINGS.items():
+		if player in players:
+			end = ending
 
-	# Some players have different endings to their player webpage (e.g. '02' instead of '01').
-	# This accounts for the variability in this ending.
-	players_2 = [
-		'Gerald Henderson', 'James Johnson', 'Derrick Williams', 'Jordan Hamilton', 'Josh Richardson',
-		'Reggie Bullock'
-	]
-	players_3 = ['James Anderson', 'Ryan Kelly']
-	players_4 = ['Mike Scott']
+	player_name = player.lower().replace("'", '').split(' ')
+	player_url = player_name[1][0:5] + player_name[0][0:2] + end
+	return '/players/' + player_name[1][0] + '/' + player_url + '.html'
 
 
+def guess_ncaa_path(player):
 	end = '1'
-	if player in players_2:
-		end = '2'
-	elif player in players_3:
-		end = '3'
-	elif player in players_4:
-		end = '4'
+	for ending, players in NCAA_ENDINGS.items():
+		if player in players:
+			end = ending
 
 	player_name = player.lower().replace("'", '').replace('.', '').split(' ')
 	player_url = ''
@@ -268,10 +636,121 @@ def parse_ncaa(player, players_2, players_3, players_4):
 			player_url = 'kevin-' + player_name[1] + '-' + end 
 		else:
 			player_url = player_name[0] + '-' + player_name[1] + '-' + end 
-	url = NCAA_BASE_URL + '/cbb/players/' + player_url + '.html'
+	return '/cbb/players/' + player_url + '.html'
+
+
+def parse_nba(player, known_seasons=None, nba_path=None):
+	url = NBA_BASE_URL + player_paths(player, nba_path)[0]
+
+	player_soup = make_soup(fetch_page(url, refresh=known_seasons is not None))
+
+	return extract_nba(player_soup, player, known_seasons)	
+
+
+'''
+Parameters:
+* player_soup: the HTML parser for the player's webpage
+* name: the player's name (e.g. Stephen Curry)
+* known_seasons: maps (season, team link) to the (team_ortg, team_fg3a) recorded in
+                 an earlier run. Other seasons are downloaded again rather than read
+                 from the page cache. None downloads every season as usual.
+
+Function: Extract the career 3-point makes and attempts in the Totals table in player's
+          webpage, and the [season, team link, team_ortg, team_fg3a, league_fg3a] row of
+          every team-season. The features are computed from them by facts.py.
+'''
+def extract_nba(player_soup, name, known_seasons=None):
+	fg3, fg3a, seasons = read_nba_player(player_soup)
+
+	season_stats = []
+	for year, team_href in seasons:
+		# Read first, as the league page of a new season also has the team's stats.
+		lg_fg3a = league_fg3a(year, refresh=known_seasons is not None)
+
+		if known_seasons is None:
+			team_ortg, team_fg3a = extract_team_stats(team_href)
+		elif (year, team_href) in known_seasons:
+			team_ortg, team_fg3a = known_seasons[(year, team_href)]
+		else:
+			team_ortg, team_fg3a = extract_team_stats(team_href, refresh=True)
+
+		season_stats.append([year, team_href, team_ortg, team_fg3a, lg_fg3a])
+
+	return [fg3, fg3a], season_stats
+
+
+'''
+Parameters:
+* player_soup: the HTML parser for the player's webpage
+
+Function: Reads the career 3-point makes and attempts in the Totals table, along with
+          the season and team page link of every team-season the player played for.
+'''
+@METRICS.timed('extract')
+def read_nba_player(player_soup):
+	tot_soup = get_table(player_soup, 'all_totals')
+	foot_row = tot_soup.select_one('tfoot > tr')
+
+	#g = int(read_stat(foot_row, 'g'))
+	fg3 = int(read_stat(foot_row, 'fg3'))
+	fg3a = int(read_stat(foot_row, 'fg3a'))
+
+	seasons = []
+	for row in tot_soup.select('tbody > tr'):
+
+		# Rows that sum up a season split between teams only link to the league.
+		team_link = row.select_one('td > a')
+		if team_link.get_text() == 'NBA':
+			continue
+
+		seasons.append((row.select_one('th > a').get_text(), team_link['href']))
+
+	return fg3, fg3a, seasons
+
+
+'''
+Parameters:
+* extension: the referential link to a given player's team page for a specific season.
+* refresh: download the page even if it is in the page cache.
+
+Function: Extracts a team's Offensive Rating and 3-point attempts per game. They are
+          looked up in TEAM_SEASONS, and only seasons missing from it are downloaded.
+'''
+def extract_team_stats(extension, refresh=False):
+	if extension in TEAM_SEASONS:
+		return TEAM_SEASONS[extension]
+
+	team_url = NBA_BASE_URL + extension
+	return read_team_page(make_soup(fetch_page(team_url, refresh)))
+
+
+'''
+Parameters:
+* team_soup: the HTML parser for a team's season webpage
+
+Function: Reads a team's Offensive Rating and 3-point attempts per game.
+'''
+@METRICS.timed('extract')
+def read_team_page(team_soup):
+
+	# Get team offensive rating
+	ortg_soup = get_table(team_soup, 'all_team_misc')
+	ortg = read_stat(ortg_soup.select_one('tbody > tr'), 'off_rtg')
+
+	# Get team 3 point attempts per game
+	team_fg3_soup = get_table(team_soup, 'all_team_and_opponent')
+	team_fg3_row = team_fg3_soup.select('tbody > tr')[1]
+	fg3a_g = read_stat(team_fg3_row, 'fg3a_per_g')
+
+	return ortg, fg3a_g
+
+
+
+
+def parse_ncaa(player, nba_path=None):
+	url = NCAA_BASE_URL + player_paths(player, nba_path)[1]
 
-	response = urllib2.urlopen(url)
-	player_soup = BeautifulSoup(response, 'html.parser')
+	player_soup = make_soup(fetch_page(url))
 
 	return extract_ncaa(player_soup, player)
 
@@ -281,41 +760,43 @@ Parameters:
 * player_soup: the HTML parser for the player's webpage
 * name: the player's name (e.g. Stephen Curry)
 
-Function: Extract the data in the Totals table in player's webpage. Updates the global
-variable PLAYER_STATS.
+Function: Extract the career [fg3, fg3a, ft, fta, sos] in the Totals table in player's
+          webpage, and the [school link, school_g, school_fg3a] row of every season.
 '''
 def extract_ncaa(player_soup, name):
-	tot_soup = get_table(player_soup, 'all_players_totals')
+	fg3, fg3a, ft, fta, avg_sos, school_hrefs = read_ncaa_player(player_soup)
 
-	foot_soup = BeautifulSoup(str(tot_soup.select_one('tfoot > tr')), 'html.parser')
-	per_soup = BeautifulSoup(str(player_soup.find(id='players_per_game')), 'html.parser')
-	per_foot = BeautifulSoup(str(per_soup.select_one('tfoot > tr')), 'html.parser')
-
-	#g = int(foot_soup.select_one('td[data-stat="g"]').get_text())
-	fg3 = int(foot_soup.select_one('td[data-stat="fg3"]').get_text())
-	fg3a = int(foot_soup.select_one('td[data-stat="fg3a"]').get_text())
-	ft = int(foot_soup.select_one('td[data-stat="ft"]').get_text())
-	fta = int(foot_soup.select_one('td[data-stat="fta"]').get_text())
-	avg_sos = float(per_foot.select_one('td[data-stat="sos"]').get_text())
-	fg3_pct = 100. * fg3 / fg3a
-	ft_pct = 100. * ft / fta
-	avg_team_fg3a = 0.
-
-	tot_g = 0
-	tot_fg3a = 0
-	for row in tot_soup.select('tbody > tr'):
-		row_soup = BeautifulSoup(str(row), 'html.parser')
+	season_stats = []
+	for school_href in school_hrefs:
+		school_g, school_fg3a = extract_school_stats(school_href)
+		season_stats.append([school_href, school_g, school_fg3a])
 
-		school_g, school_fg3a = extract_school_stats(row_soup.select_one('td > a')['href'])
+	return [fg3, fg3a, ft, fta, avg_sos], season_stats
 
-		tot_g += school_g
-		tot_fg3a += school_fg3a
 
-		#PLAYER_STATS.append([name, year, school, conf, fg3, fg3a, fg3_pct, sos, school_g, school_fg3, school_fg3a])
+'''
+Parameters:
+* player_soup: the HTML parser for the player's webpage
 
-	avg_team_fg3a = 1. * tot_fg3a / tot_g
+Function: Reads the career 3-point and free throw totals, the average strength of
+          schedule, and the school page link of every season the player played.
+'''
+@METRICS.timed('extract')
+def read_ncaa_player(player_soup):
+	tot_soup = get_table(player_soup, 'all_players_totals')
+	foot_row = tot_soup.select_one('tfoot > tr')
+	per_foot = player_soup.find(id='players_per_game').select_one('tfoot > tr')
+
+	#g = int(read_stat(foot_row, 'g'))
+	fg3 = int(read_stat(foot_row, 'fg3'))
+	fg3a = int(read_stat(foot_row, 'fg3a'))
+	ft = int(read_stat(foot_row, 'ft'))
+	fta = int(read_stat(foot_row, 'fta'))
+	avg_sos = float(read_stat(per_foot, 'sos'))
+
+	school_hrefs = [row.select_one('td > a')['href'] for row in tot_soup.select('tbody > tr')]
 
-	return fg3a, fg3_pct, ft_pct, avg_sos, avg_team_fg3a
+	return fg3, fg3a, ft, fta, avg_sos, school_hrefs
 
 
 '''
@@ -323,48 +804,176 @@ Parameters:
 * extension: the referential link to a given player's team page for a specific season.
 
 Function: Extracts a school's games played, and calculates its 3 point makes and attempts per game.
+          They are looked up in SCHOOL_SEASONS, and only seasons missing from it are downloaded.
 '''
 def extract_school_stats(extension):
+	if extension in SCHOOL_SEASONS:
+		return SCHOOL_SEASONS[extension]
+
 	team_url = NCAA_BASE_URL + extension
-	response = urllib2.urlopen(team_url)
+	return read_school_page(make_soup(fetch_page(team_url)))
+
 
-	school_soup = BeautifulSoup(response, 'html.parser')
+'''
+Parameters:
+* school_soup: the HTML parser for a school's season webpage
 
-	school_stats = BeautifulSoup(str(school_soup.find(id='team_stats')), 'html.parser')
-	school_row = school_stats.select_one('tbody > tr')
-	row_parser = BeautifulSoup(str(school_row), 'html.parser')
+Function: Reads a school's games played and 3-point attempts.
+'''
+@METRICS.timed('extract')
+def read_school_page(school_soup):
+	school_row = school_soup.find(id='team_stats').select_one('tbody > tr')
 
-	school_g = int(row_parser.select_one('td[data-stat="g"]').get_text())
-	#school_fg3 = float(row_parser.select_one('td[data-stat="fg3"]').get_text()) / school_g
-	school_fg3a = int(row_parser.select_one('td[data-stat="fg3a"]').get_text())
+	school_g = int(read_stat(school_row, 'g'))
+	#school_fg3 = float(read_stat(school_row, 'fg3')) / school_g
+	school_fg3a = int(read_stat(school_row, 'fg3a'))
 
 	return school_g, school_fg3a
 
 
 
 '''
-Function: Export the data in PLAYER_STATS into a CSV file.
+Function: Report how many page fetches were served by PAGE_CACHE, and the requests,
+          connection reuse and bytes transferred by SESSION.
 '''
-def export_stats():
-	filename = 'data.csv'
-	
-	print 'Exporting data to ' + filename + '...'
-
-	file_handle = open(filename, 'w')
-	writer = csv.writer(file_handle)
-	writer.writerow(['name', 'ncaa_fg3a', 'ncaa_fg3_pct', 'ncaa_ft_pct', 'ncaa_sos', 'ncaa_team_fg3a_avg',
-					'nba_avg_team_ortg', 'nba_relative_team_fg3a', 'nba_fg3_pct'])
-	writer.writerows(PLAYER_STATS)
-
-	print 'Success.'
+def report_fetches():
+	stats = PAGE_CACHE.stats()
+	print 'Page cache: ' + str(stats['hits']) + ' hits, ' + str(stats['misses']) + ' misses.'
+
+	stats = SESSION.stats()
+	print 'HTTP: ' + str(stats['requests']) + ' requests, ' + str(stats['not_modified']) + ' not modified, ' + \
+		str(stats['connections_opened']) + ' connections opened, ' + str(stats['connections_reused']) + ' reused, ' + \
+		str(stats['retries']) + ' retried.'
+	print 'HTTP: ' + str(stats['bytes_transferred']) + ' bytes transferred, ' + str(stats['bytes_decoded']) + ' bytes after decompression.'
+
+
+def parse_args():
+	parser = argparse.ArgumentParser(description='Scrape NCAA and NBA statistics into data.csv.')
+	parser.add_argument('--output', action='append',
+						help='file the rows are written to, as .csv, .parquet, .feather or .npy (default data.csv); may be repeated')
+	parser.add_argument('--cache-dir', default=page_cache.DEFAULT_CACHE_DIR,
+						help='folder of the on-disk page cache')
+	parser.add_argument('--cache-ttl', type=float, default=page_cache.DEFAULT_TTL,
+						help='seconds a cached page stays valid (0 means pages never expire)')
+	parser.add_argument('--cache-max-pages', type=int, default=page_cache.DEFAULT_MAX_PAGES,
+						help='number of pages kept in memory')
+	parser.add_argument('--cache-max-bytes', type=int, default=page_cache.DEFAULT_MAX_BYTES,
+						help='size bound of the on-disk page cache')
+	parser.add_argument('--no-cache', action='store_true', help='do not read or write the on-disk page cache')
+	parser.add_argument('--workers', type=int,
+						help='number of players scraped at the same time (default ' + str(DEFAULT_WORKERS) + ', or one per core with --replay)')
+	parser.add_argument('--nba-url', default=NBA_BASE_URL,
+						help='base URL of basketball-reference.com (e.g. a local stand-in from serve_pages.py)')
+	parser.add_argument('--ncaa-url', default=NCAA_BASE_URL, help='base URL of sports-reference.com')
+	parser.add_argument('--nba-rate', type=float, default=NBA_RATE_LIMIT,
+						help='requests per second sent to the NBA site (0 means no limit)')
+	parser.add_argument('--ncaa-rate', type=float, default=NCAA_RATE_LIMIT,
+						help='requests per second sent to the NCAA site (0 means no limit)')
+	parser.add_argument('--parser', default=PARSER, choices=PARSERS, help='BeautifulSoup backend used to parse pages')
+	parser.add_argument('--player-index', default=player_index.DEFAULT_INDEX, help='player-ID index file')
+	parser.add_argument('--build-index', action='store_true',
+						help='build the player-ID index from the player index pages before scraping')
+	parser.add_argument('--facts', default=facts.DEFAULT_FACTS_DIR,
+						help='folder of the fact tables of raw player and season numbers (see facts.py)')
+	parser.add_argument('--no-facts', action='store_true', help='do not add players to the fact tables')
+	parser.add_argument('--archive', default=page_archive.DEFAULT_ARCHIVE_DIR, help='folder of the raw-page archive')
+	parser.add_argument('--no-archive', action='store_true', help='do not store fetched pages in the archive')
+	parser.add_argument('--replay', action='store_true',
+						help='read every page from the archive instead of the network, with one process per core')
+	parser.add_argument('--report', default='scrape_report.json', help='JSON file the run report is written to')
+	parser.add_argument('--progress', type=float, default=0,
+						help='print a progress line every this many seconds (0 means never)')
+	parser.add_argument('--journal', default=journal.DEFAULT_JOURNAL, help='checkpoint journal of finished players')
+	parser.add_argument('--resume', action='store_true', help='skip players that are already in the journal')
+	parser.add_argument('--incremental', action='store_true',
+						help='for players in the journal, only fetch seasons from their last recorded season on')
+	parser.add_argument('--discover', metavar='FIRST-LAST',
+						help='scrape every NCAA player of the drafts from FIRST to LAST (e.g. 2009-2016), '
+						'and the undrafted rookies of the seasons after them, instead of PLAYERS')
+	parser.add_argument('--last-season', type=int, default=LAST_SEASON,
+						help='last season league averages are read for, by the year it ends in')
+	parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+						help='number of players handed to the workers at a time')
+	return parser.parse_args()
 
 
 def main():
-	get_lg_fg3a()
-	parse_players()
+	global PAGE_CACHE, SESSION, NBA_BASE_URL, NCAA_BASE_URL, PARSER, PLAYER_INDEX, ARCHIVE, REPLAY, FACTS
+
+	args = parse_args()
+	REPLAY = args.replay
+	if args.workers is None:
+		args.workers = cpu_count() if REPLAY else DEFAULT_WORKERS
+
+	if REPLAY or not args.no_archive:
+		ARCHIVE = page_archive.PageArchive(args.archive)
+		if REPLAY:
+			print 'Replaying ' + str(len(ARCHIVE)) + ' archived pages with ' + str(args.workers) + ' processes...'
+
+	PAGE_CACHE = page_cache.PageCache(directory=None if args.no_cache else args.cache_dir,
+									max_pages=args.cache_max_pages, max_bytes=args.cache_max_bytes,
+									ttl=args.cache_ttl or None)
+	SESSION = http_session.HttpSession(timeout=FETCH_TIMEOUT, pool_size=args.workers)
+
+	PARSER = args.parser
+	NBA_BASE_URL = args.nba_url
+	NCAA_BASE_URL = args.ncaa_url
+	THROTTLE.set_rate(throttle.host_of(NBA_BASE_URL), args.nba_rate or None)
+	THROTTLE.set_rate(throttle.host_of(NCAA_BASE_URL), args.ncaa_rate or None)
+
+	if args.build_index:
+		print 'Building player-ID index...'
+		base_urls = {'nba': NBA_BASE_URL, 'ncaa': NCAA_BASE_URL}
+		PLAYER_INDEX = player_index.build(lambda site, path: make_soup(fetch_page(base_urls[site] + path)))
+		PLAYER_INDEX.save(args.player_index)
+		print 'Success.'
+	elif os.path.exists(args.player_index):
+		PLAYER_INDEX = player_index.load(args.player_index)
+
+	if not args.no_facts:
+		FACTS = facts.FactStore(args.facts)
+
+	checkpoint = journal.Journal(args.journal)
+	if args.resume or args.incremental:
+		print 'Loaded ' + str(len(checkpoint)) + ' players from ' + args.journal + '.'
+
+	if args.progress:
+		METRICS.start_progress(args.progress)
+
+	outputs = args.output or ['data.csv']
+	print 'Exporting data to ' + ', '.join(outputs) + '...'
+	sink = export.open_sink(outputs)
+
+	players = None
+	first_season = FIRST_SEASON
+	if args.discover:
+		try:
+			first_draft, last_draft = [int(year) for year in args.discover.split('-')]
+		except ValueError:
+			sys.exit('--discover expects draft years as FIRST-LAST, e.g. 2009-2016')
+
+		print 'Discovering the ' + args.discover + ' draft classes...'
+		players = discovery.discover_players(lambda path: make_soup(fetch_page(NBA_BASE_URL + path)),
+											range(first_draft, last_draft + 1))
+		first_season = first_draft + 1
+
+	get_lg_fg3a(args.workers, range(first_season, args.last_season + 1), args.incremental)
+	get_school_seasons(args.workers, range(first_season - NCAA_SEASONS_BEFORE, args.last_season))
+	try:
+		parse_players(sink, args.workers, checkpoint, args.resume, args.incremental, players,
+					args.batch_size, skip_errors=players is not None)
+	finally:
+		checkpoint.close()
+		sink.close()
 	print 'Player parsing finished.'
 
-	export_stats()
+	METRICS.stop_progress()
+	SESSION.close()
+	if ARCHIVE is not None:
+		ARCHIVE.close()
+	report_fetches()
+	METRICS.write_report(args.report, {'http': SESSION.stats(), 'page_cache': PAGE_CACHE.stats()})
+	print 'Run report written to ' + args.report + '.'
 	print 'Exiting program.'
 
 
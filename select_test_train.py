@@ -5,28 +5,52 @@ November 20th, 2017
 Roland Centeno, Hilary Sun, Jerold Yu
 --------------------------------------
 This document contains the code to split the data in 80%-20% training and test datasets.
+Each player is assigned to a split by a hash of their name, so the split of a player
+never changes when players are added to the data. The splits are written as row
+indices of the data to a manifest (see dataset.py).
 """
 
-import pandas as pd
-from sklearn.preprocessing import StandardScaler
-import plotly.plotly as py
-from plotly.graph_objs import *
-import plotly.tools as tls
+import argparse
+import hashlib
+
 import numpy as np
-import random
-from sklearn.model_selection import train_test_split
+
+# local files in directory
+import dataset
+
+
+# Percent of the players that go to the test set.
+TEST_PERCENT = 20
+
+
+'''
+Parameters:
+* name: the player's name, as UTF-8 bytes.
+
+Function: Returns True if the player is in the test set.
+'''
+def is_test(name):
+	return int(hashlib.sha1(name).hexdigest()[:8], 16) % 100 < TEST_PERCENT
+
+
+def parse_args():
+	parser = argparse.ArgumentParser(description='Split the players into training and test sets.')
+	parser.add_argument('data', nargs='?', default='data.csv',
+						help='the scraped data, as written by scraper.py (.csv, .parquet, .feather or .npy)')
+	parser.add_argument('--manifest', default=dataset.DEFAULT_MANIFEST,
+						help='file the row indices of the splits are written to')
+	return parser.parse_args()
+
 
 def main():
-	df = pd.read_csv(filepath_or_buffer="data.csv", sep=',')
-	# features + class
-	df.columns = ["name", "ncaa_fg3a", "ncaa_fg3_pct", "ncaa_ft_pct", "ncaa_sos", "ncaa_team_fg3a_avg", "nba_avg_team_ortg", "nba_relative_team_fg3a", "nba_fg3_pct"]
-	df.dropna(how="all", inplace=True) # drops the empty line at file-end
-	df.tail()
+	args = parse_args()
+	data = dataset.load(args.data)
 
-	train, test = train_test_split(df, test_size = 0.2)
+	test = np.array([is_test(name) for name in data.labels], dtype=bool)
+	dataset.write_manifest(args.manifest, data, {'train': np.flatnonzero(~test), 'test': np.flatnonzero(test)})
 
-	train.to_csv("train.csv", sep = ',', columns = train, index=False)
-	test.to_csv("test.csv", sep = ',', columns = test, index=False)
+	print 'Split ' + str(len(data)) + ' players into ' + str(len(data) - test.sum()) + ' training and ' + \
+		str(test.sum()) + ' test players (' + args.manifest + ').'
 
 if __name__ == '__main__':
-	main()
\ No newline at end of file
+	main()
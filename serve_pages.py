@@ -0,0 +1,109 @@
+"""
+serve_pages.py
+--------------------------------------
+This document contains a local HTTP stand-in for basketball-reference.com and
+sports-reference.com/cbb. It serves saved pages so the scraper can be run
+offline, e.g.
+
+	python serve_pages.py --port 8000 &
+	python scraper.py --no-cache --nba-url http://localhost:8000 --ncaa-url http://localhost:8000/
+"""
+
+# LIBRARIES
+import argparse
+import BaseHTTPServer
+import email.utils
+import os
+import posixpath
+import SocketServer
+import urllib
+
+import page_cache
+import scraper
+
+
+'''
+Parameters:
+* pages_dir: folder of the saved pages.
+* path: the path of the request (e.g. /players/c/curryst01.html).
+
+Function: Finds a saved page for the request. Pages are looked up in a mirror of the
+          sites' folder structure first, then in a page cache folder written by the scraper.
+          Returns the file of the page, or None.
+'''
+def find_page(pages_dir, path):
+	relative = posixpath.normpath(urllib.unquote(path.split('?')[0])).lstrip('/')
+	if relative.startswith('..'):
+		return None
+
+	candidates = [os.path.join(pages_dir, *relative.split('/'))]
+	for url in [scraper.NBA_BASE_URL + '/' + relative, scraper.NCAA_BASE_URL + '/' + relative,
+				scraper.NCAA_BASE_URL + relative]:
+		candidates.append(os.path.join(pages_dir, page_cache.cache_key(url)))
+
+	for candidate in candidates:
+		if os.path.isfile(candidate):
+			return candidate
+
+	return None
+
+
+class PageHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+	# Keeps connections open between requests, as the real sites do.
+	protocol_version = 'HTTP/1.1'
+
+	def do_GET(self):
+		path = find_page(self.server.pages_dir, self.path)
+		if path is None:
+			self.send_error(404)
+			return
+
+		# Saved pages never change, so any revalidation request is answered with a 304.
+		last_modified = email.utils.formatdate(os.path.getmtime(path), usegmt=True)
+		if self.headers.getheader('If-Modified-Since'):
+			self.send_response(304)
+			self.send_header('Last-Modified', last_modified)
+			self.end_headers()
+			return
+
+		with open(path, 'rb') as f:
+			page = f.read()
+
+		self.send_response(200)
+		self.send_header('Last-Modified', last_modified)
+		self.send_header('Content-Type', 'text/html; charset=utf-8')
+		self.send_header('Content-Length', str(len(page)))
+		self.end_headers()
+		self.wfile.write(page)
+
+
+	def log_message(self, format, *args):
+		if self.server.verbose:
+			BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class PageServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+	daemon_threads = True
+
+	def __init__(self, address, pages_dir, verbose=False):
+		BaseHTTPServer.HTTPServer.__init__(self, address, PageHandler)
+		self.pages_dir = pages_dir
+		self.verbose = verbose
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Serve saved pages in place of the reference sites.')
+	parser.add_argument('--pages', default=page_cache.DEFAULT_CACHE_DIR, help='folder of the saved pages')
+	parser.add_argument('--host', default='localhost')
+	parser.add_argument('--port', type=int, default=8000)
+	parser.add_argument('--verbose', action='store_true', help='log every request')
+	args = parser.parse_args()
+
+	server = PageServer((args.host, args.port), args.pages, args.verbose)
+	print 'Serving ' + args.pages + ' on http://' + args.host + ':' + str(args.port) + '...'
+	server.serve_forever()
+
+
+if __name__ == '__main__':
+	main()
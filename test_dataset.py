@@ -0,0 +1,160 @@
+"""
+test_dataset.py
+--------------------------------------
+This document contains the tests of the binary dataset format: a dataset read
+back is the one that was written, a corrupt file fails its checksum, and the
+splits of a dataset written one split after the other are views of the file.
+"""
+
+# LIBRARIES
+import os
+
+import numpy as np
+import pytest
+
+# local files in directory
+import dataset
+import PCA
+
+
+COLUMNS = ['ncaa_fg3a', 'ncaa_fg3_pct', 'nba_fg3_pct']
+
+
+def make_matrix(rows=50):
+	return np.random.RandomState(0).randn(rows, len(COLUMNS))
+
+
+def make_labels(rows=50):
+	return np.array(['Player %d' % i for i in range(rows)])
+
+
+def test_round_trip(tmpdir):
+	filename = str(tmpdir.join('data.dat'))
+	matrix, labels = make_matrix(), make_labels()
+	dataset.write(filename, matrix, COLUMNS, labels)
+
+	data = dataset.load(filename, verify=True)
+	assert data.columns == COLUMNS
+	assert len(data) == len(matrix)
+	assert np.array_equal(data.matrix, matrix)
+	assert list(data.labels) == list(labels)
+	assert np.array_equal(data.select(COLUMNS[1:]), matrix[:, 1:])
+	assert np.array_equal(data.column('nba_fg3_pct'), matrix[:, -1])
+
+
+def test_round_trip_in_chunks(tmpdir):
+	filename = str(tmpdir.join('data.dat'))
+	matrix, labels = make_matrix(), make_labels()
+
+	writer = dataset.DatasetWriter(filename, COLUMNS, 'name')
+	for start in range(0, len(matrix), 7):
+		writer.write(matrix[start:start + 7], labels[start:start + 7])
+	assert not os.path.exists(filename)
+	writer.close()
+
+	data = dataset.load(filename, verify=True)
+	assert np.array_equal(data.matrix, matrix)
+	assert list(data.labels) == list(labels)
+
+
+def test_empty_dataset(tmpdir):
+	filename = str(tmpdir.join('empty.dat'))
+	dataset.write(filename, np.empty((0, len(COLUMNS))), COLUMNS)
+
+	data = dataset.load(filename, verify=True)
+	assert len(data) == 0
+	assert data.matrix.shape == (0, len(COLUMNS))
+	assert data.labels is None
+
+
+@pytest.mark.parametrize('offset', [0, -1])
+def test_checksum_detects_corruption(tmpdir, offset):
+	filename = str(tmpdir.join('data.dat'))
+	dataset.write(filename, make_matrix(), COLUMNS, make_labels())
+
+	# Flip a byte of the first float, or of the last name.
+	with open(filename, 'r+b') as f:
+		if offset == 0:
+			f.seek(len(dataset.MAGIC) + dataset.HEADER_BYTES)
+		else:
+			f.seek(offset, os.SEEK_END)
+		byte = f.read(1)
+		f.seek(-1, os.SEEK_CUR)
+		f.write(chr(ord(byte) ^ 0xff))
+
+	# Opening does not read the data, so only a verified open notices.
+	dataset.load(filename)
+	with pytest.raises(ValueError):
+		dataset.load(filename, verify=True)
+
+
+def test_import_csv_keeps_floats_exact(tmpdir):
+	source = str(tmpdir.join('data.csv'))
+	matrix, labels = make_matrix(), make_labels()
+	with open(source, 'w') as f:
+		f.write(','.join(['name'] + COLUMNS) + '\n')
+		for label, row in zip(labels, matrix):
+			f.write(','.join([label] + [repr(value) for value in row]) + '\n')
+
+	# A dataset file is made next to the CSV file on first load.
+	data = dataset.load(source, verify=True)
+	assert os.path.exists(str(tmpdir.join('data.dat')))
+	assert data.label_column == 'name'
+	assert np.array_equal(data.matrix, matrix)
+	assert list(data.labels) == list(labels)
+
+
+def test_rejects_other_files(tmpdir):
+	filename = str(tmpdir.join('other.dat'))
+	with open(filename, 'wb') as f:
+		f.write(b'not a dataset' * 100)
+
+	with pytest.raises(ValueError):
+		dataset.Dataset(filename)
+
+
+def test_split_blocks_are_views(tmpdir):
+	filename = str(tmpdir.join('data.dat'))
+	matrix, labels = make_matrix(), make_labels()
+	writer = dataset.DatasetWriter(filename, COLUMNS, 'name')
+	writer.write(matrix[:30], labels[:30])
+	writer.end_split('train')
+	writer.write(matrix[30:], labels[30:])
+	writer.end_split('test')
+	writer.close()
+
+	# No manifest is needed to read the splits of such a file.
+	manifest = str(tmpdir.join('missing.npz'))
+	data = dataset.load(filename, verify=True)
+	for split, rows in [('train', slice(0, 30)), ('test', slice(30, 50))]:
+		X, y = dataset.load_xy(filename, split=split, manifest=manifest)
+		assert isinstance(X, np.memmap) and isinstance(y, np.memmap)
+		assert np.array_equal(X, matrix[rows, :-1])
+		assert np.array_equal(y, matrix[rows, -1])
+		assert np.may_share_memory(data.matrix[data.split_rows(split)], data.matrix)
+		assert np.array_equal(dataset.load_matrix(filename, split, manifest), matrix[rows])
+
+
+def test_transform_writes_splits_in_turn(tmpdir):
+	source = str(tmpdir.join('data.dat'))
+	columns = PCA.FEATURES + ['nba_fg3_pct']
+	matrix = np.random.RandomState(0).rand(50, len(columns))
+	dataset.write(source, matrix, columns, make_labels())
+
+	manifest = str(tmpdir.join('split.npz'))
+	test = np.arange(50) % 5 == 0
+	dataset.write_manifest(manifest, dataset.load(source), {'train': np.flatnonzero(~test), 'test': np.flatnonzero(test)})
+
+	k = len(PCA.COMPONENTS) - 1
+	transform = PCA.Transform(np.zeros(len(PCA.FEATURES)), np.ones(len(PCA.FEATURES)), np.zeros(len(PCA.FEATURES)),
+							np.eye(k, len(PCA.FEATURES)), np.ones(k) / k)
+	target = str(tmpdir.join('transformed.dat'))
+	splits = dataset.read_manifest(manifest, dataset.load(source))
+	PCA.transform_file(transform, source, target, chunk_rows=7, splits=[('train', splits['train']), ('test', splits['test'])])
+
+	assert dataset.load(target).splits == {'train': [0, 40], 'test': [40, 50]}
+	for split in ['train', 'test']:
+		X, Y = PCA.load_dataset(source, split, manifest)
+		transformed = dataset.load_matrix(target, split, manifest)
+		assert np.allclose(transformed[:, :-1], transform.apply(X))
+		assert np.allclose(transformed[:, -1], Y)
@@ -0,0 +1,82 @@
+"""
+test_export.py
+--------------------------------------
+This document contains the tests of the sinks the scraper streams its rows to,
+and of the scraper's handling of the unicode names of discovered players.
+"""
+
+# LIBRARIES
+import csv
+import sys
+
+import numpy as np
+import pytest
+
+# local files in directory
+import export
+import scraper
+
+
+NAME = u'Jakob P\xf6ltl'
+
+ROW = [NAME, 151, 33.3, 58.1, 7.6, 0.21, 108.3, 0.74, 0.0]
+
+
+def test_csv_sink_writes_unicode_names(tmpdir):
+	filename = str(tmpdir.join('data.csv'))
+	sink = export.open_sink([filename])
+	sink.write(ROW)
+	sink.close()
+
+	with open(filename, 'rb') as f:
+		rows = list(csv.reader(f))
+
+	assert rows[0] == export.COLUMNS
+	assert rows[1][0].decode('utf-8') == NAME
+	assert [float(value) for value in rows[1][1:]] == ROW[1:]
+
+
+def test_npy_sink_writes_unicode_names(tmpdir):
+	filename = str(tmpdir.join('data.npy'))
+	sink = export.open_sink([filename])
+	sink.write(ROW)
+	sink.close()
+
+	rows = np.load(filename, mmap_mode='r')
+	assert rows['name'][0].decode('utf-8') == NAME
+
+
+def test_feather_sink_streams_record_batches(tmpdir, monkeypatch):
+	pytest.importorskip('pyarrow')
+	monkeypatch.setattr(export, 'PARQUET_ROW_GROUP', 2)
+	filename = str(tmpdir.join('data.feather'))
+	sink = export.open_sink([filename])
+	for i in range(5):
+		sink.write(ROW)
+		# Only the rows of the batch being filled are kept in memory.
+		assert len(sink.sinks[0].buffer) == (i + 1) % 2
+	sink.close()
+
+	df = export.read_stats(filename)
+	assert list(df.columns) == export.COLUMNS
+	assert len(df) == 5
+	assert df['name'][0] == NAME
+
+
+def test_scrape_player_skips_unicode_name_on_a_pipe(tmpdir, monkeypatch):
+	# A file opened in binary mode takes bytes only, like stdout when it is piped.
+	stdout = open(str(tmpdir.join('stdout')), 'wb')
+	monkeypatch.setattr(sys, 'stdout', stdout)
+
+	def missing_page(player, known_seasons=None, nba_path=None):
+		raise ValueError(u'no page for ' + player)
+	monkeypatch.setattr(scraper, 'parse_nba', missing_page)
+
+	try:
+		result = scraper.scrape_player((0, NAME, None, None, False, False, True))
+	finally:
+		stdout.close()
+
+	assert result == (0, None, None)
+	with open(str(tmpdir.join('stdout')), 'rb') as f:
+		assert 'Skipping ' + NAME.encode('utf-8') + ': ValueError' in f.read()
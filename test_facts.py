@@ -0,0 +1,93 @@
+"""
+test_facts.py
+--------------------------------------
+This document contains the tests of the fact tables: features computed over the
+tables match the ones of each player, and a run killed while appending leaves
+tables that are cut back to their last complete player.
+"""
+
+# LIBRARIES
+import os
+
+import numpy as np
+
+# local files in directory
+import facts
+
+
+def make_record(player, seasons=2):
+	return {
+		'player': player,
+		'nba_totals': [120 + seasons, 340],
+		'nba_seasons': [['%d-%s' % (year, str(year + 1)[2:]), '/teams/GSW/%d.html' % (year + 1), 110. + year % 3,
+						25. + year % 5, 24.] for year in range(2010, 2010 + seasons)],
+		'ncaa_totals': [150, 400, 180, 220, 7.5],
+		'ncaa_seasons': [['/cbb/schools/davidson/%d.html' % year, 34, 800 + year % 7] for year in range(2007, 2010)],
+	}
+
+
+RECORDS = [make_record('Stephen Curry', 3), make_record('Klay Thompson', 2), make_record('Seth Curry', 1)]
+
+
+def add_records(directory, records):
+	store = facts.FactStore(directory)
+	for record in records:
+		store.add(record)
+	return store
+
+
+def test_features_match_player_rows(tmpdir):
+	store = add_records(str(tmpdir), RECORDS)
+	names, features = store.features()
+
+	assert list(names) == [record['player'] for record in RECORDS]
+	for name, row, record in zip(names, features, RECORDS):
+		assert facts.make_row(name, row)[1:] == facts.player_row(record)[1:]
+
+
+def test_latest_rows_of_a_player_win(tmpdir):
+	store = add_records(str(tmpdir), RECORDS + [make_record('Stephen Curry', 4)])
+	names, features = store.features()
+
+	assert list(names) == ['Klay Thompson', 'Seth Curry', 'Stephen Curry']
+	assert facts.make_row(names[-1], features[-1])[1:] == facts.player_row(make_record('Stephen Curry', 4))[1:]
+
+
+def test_table_is_cut_back_to_complete_rows(tmpdir):
+	directory = str(tmpdir.join('players'))
+	table = facts.Table(directory, facts.PLAYER_COLUMNS)
+	table.append(facts.record_rows(RECORDS[0])[0])
+	table.append(facts.record_rows(RECORDS[1])[0])
+
+	# Killed while appending a third row: one column is complete, one is half written.
+	with open(os.path.join(directory, 'name.bin'), 'ab') as f:
+		f.write(np.array(['Seth Curry'], dtype='S64').tobytes())
+	with open(os.path.join(directory, 'nba_fg3.bin'), 'ab') as f:
+		f.write(b'\x01\x02')
+
+	table = facts.Table(directory, facts.PLAYER_COLUMNS)
+	assert len(table) == 2
+	for name, dtype in facts.PLAYER_COLUMNS:
+		assert os.path.getsize(os.path.join(directory, name + '.bin')) == 2 * np.dtype(dtype).itemsize
+	assert list(table.read()['name']) == ['Stephen Curry', 'Klay Thompson']
+
+
+def test_store_drops_seasons_of_an_unwritten_player(tmpdir):
+	directory = str(tmpdir)
+	store = add_records(directory, RECORDS[:2])
+
+	# Killed after the season rows of a third player, before their player row.
+	players, nba_seasons, ncaa_seasons = facts.record_rows(RECORDS[2], len(store.players))
+	store.nba_seasons.append(nba_seasons)
+	store.ncaa_seasons.append(ncaa_seasons)
+
+	store = facts.FactStore(directory)
+	assert len(store.players) == 2
+	assert len(store.nba_seasons) == 5
+	assert len(store.ncaa_seasons) == 6
+
+	# The next player appended gets the id the killed one had, and only their own seasons.
+	store.add(RECORDS[2])
+	names, features = store.features()
+	assert list(names) == [record['player'] for record in RECORDS]
+	assert facts.make_row(names[-1], features[-1])[1:] == facts.player_row(RECORDS[2])[1:]
@@ -0,0 +1,124 @@
+"""
+test_linear_regression.py
+--------------------------------------
+This document contains the tests of the weighted linear regression: the batched
+solve of the weighted normal equations matches a direct least squares fit, and
+the cross validation errors computed from sufficient statistics and from the
+hat matrix match the errors of refitting without the held-out rows.
+"""
+
+# LIBRARIES
+import numpy as np
+import pytest
+
+from sklearn.model_selection import KFold
+
+# local files in directory
+import linear_regression as lr
+
+
+def make_data(n=60, p=4, seed=0):
+	random = np.random.RandomState(seed)
+	X = random.randn(n, p)
+	y = X.dot(random.randn(p)) + 3. + random.randn(n)
+	return X, y
+
+
+'''
+Function: Helper function to fit weighted least squares directly, by ordinary least
+          squares on the rows scaled by the square roots of their weights.
+'''
+def lstsq_wls(X, y, weights):
+	root = np.sqrt(weights)
+	return np.linalg.lstsq(X * root[:, np.newaxis], y * root, rcond=None)[0]
+
+
+def test_wls_weights_are_inverse_row_variances():
+	X = lr.add_constant(make_data()[0])
+	assert np.allclose(lr.wls_weights(X), 1 / np.diag(np.cov(X)))
+
+
+def test_solve_wls_matches_least_squares():
+	X, y = make_data()
+	X = lr.add_constant(X)
+	weights = lr.wls_weights(X)
+	assert np.allclose(lr.solve_wls(X, y, weights), lstsq_wls(X, y, weights), rtol=1e-10, atol=1e-12)
+
+
+def test_solve_wls_batches_weights_and_designs():
+	X, y = make_data()
+	X = lr.add_constant(X)
+	weights = np.random.RandomState(1).rand(5, len(X))
+
+	batched = lr.solve_wls(X, y, weights)
+	assert batched.shape == (5, X.shape[1])
+	for params, w in zip(batched, weights):
+		assert np.allclose(params, lstsq_wls(X, y, w), rtol=1e-10, atol=1e-12)
+
+	designs = np.array([X, X[::-1]])
+	targets = np.array([y, y[::-1]])
+	batched = lr.solve_wls(designs, targets, weights[:2])
+	for params, design, target, w in zip(batched, designs, targets, weights[:2]):
+		assert np.allclose(params, lstsq_wls(design, target, w), rtol=1e-10, atol=1e-12)
+
+
+def test_bootstrap_replicates_are_weighted_fits():
+	X, y = make_data()
+	replicates = lr.bootstrap_wls(X, y, replicates=20, random_state=3)
+
+	# Replicate 0 is the fit on the rows drawn, each as many times as it was drawn.
+	n = len(X)
+	counts = np.random.RandomState(3).multinomial(n, np.ones(n) / n, size=20)[0]
+	rows = np.repeat(np.arange(n), counts)
+	X_drawn = lr.add_constant(X[rows])
+	assert np.allclose(replicates[0], lstsq_wls(X_drawn, y[rows], lr.wls_weights(X_drawn)), rtol=1e-10, atol=1e-12)
+
+
+def test_weighted_regression_matches_statsmodels():
+	sm = pytest.importorskip('statsmodels.api')
+	X, y = make_data()
+	res, pred_train, pred_test = lr.run_weighted_regression(X[:40], y[:40], X[40:], y[40:])
+
+	X_train = lr.add_constant(X[:40])
+	expected = sm.WLS(y[:40], X_train, weights=lr.wls_weights(X_train)).fit()
+	assert np.allclose(res.params, expected.params, rtol=1e-10, atol=1e-12)
+	assert np.allclose(pred_test, expected.predict(lr.add_constant(X[40:])), rtol=1e-10, atol=1e-12)
+
+
+'''
+Function: Helper function to refit a linear model on the training rows, as
+          linear_regression.run_linear_regression() and run_weighted_regression() do.
+          Returns its predictions on the training rows and the test rows.
+'''
+def refit(X_train, y_train, X_test, y_test, weighted):
+	if weighted:
+		model, pred_train, pred_test = lr.run_weighted_regression(X_train, y_train, X_test, y_test)
+	else:
+		model, pred_train, pred_test = lr.run_linear_regression(X_train, y_train, X_test, y_test)
+	return pred_train, pred_test
+
+
+@pytest.mark.parametrize('weighted', [False, True])
+@pytest.mark.parametrize('k', [2, 5, 10])
+def test_kfold_errors_match_refits(weighted, k):
+	X, y = make_data()
+	folds = list(KFold(n_splits=k, random_state=0, shuffle=True).split(X))
+	train_errors, test_errors = lr.kfold_errors(X, y, folds, weighted)
+
+	for i, (train_index, test_index) in enumerate(folds):
+		pred_train, pred_test = refit(X[train_index], y[train_index], X[test_index], y[test_index], weighted)
+		assert abs(train_errors[i] - np.mean((y[train_index] - pred_train) ** 2)) < 1e-10
+		assert abs(test_errors[i] - np.mean((y[test_index] - pred_test) ** 2)) < 1e-10
+
+
+@pytest.mark.parametrize('weighted', [False, True])
+def test_loocv_error_matches_refits(weighted):
+	X, y = make_data()
+
+	errors = []
+	for i in range(len(X)):
+		rows = np.arange(len(X)) != i
+		pred_train, pred_test = refit(X[rows], y[rows], X[i:i + 1], y[i:i + 1], weighted)
+		errors.append((y[i] - pred_test[0]) ** 2)
+
+	assert abs(lr.loocv_error(X, y, weighted) - np.mean(errors)) < 1e-10
@@ -0,0 +1,53 @@
+"""
+test_page_archive.py
+--------------------------------------
+This document contains the tests of the raw-page archive: pages read back are the
+ones that were stored, and an index cut short by a killed run does not lose the
+pages stored after it.
+"""
+
+# local files in directory
+import page_archive
+
+
+PAGES = {
+	'https://www.basketball-reference.com/players/c/curryst01.html': b'<html>Stephen Curry</html>' * 50,
+	'https://www.basketball-reference.com/players/t/thompkl01.html': b'<html>Klay Thompson</html>' * 50,
+	'https://www.sports-reference.com/cbb/players/stephen-curry-1.html': b'<html>Stephen Curry</html>' * 50,
+}
+
+
+def test_round_trip(tmpdir):
+	archive = page_archive.PageArchive(str(tmpdir))
+	for url, page in PAGES.items():
+		archive.put(url, page)
+	archive.close()
+
+	archive = page_archive.PageArchive(str(tmpdir))
+	assert len(archive) == len(PAGES)
+	for url, page in PAGES.items():
+		assert archive.get(url) == page
+	assert archive.get('https://www.basketball-reference.com/') is None
+
+	# Pages with the same contents are stored once.
+	assert len(archive.blobs) == 2
+
+
+def test_index_cut_mid_line(tmpdir):
+	urls = sorted(PAGES)
+	archive = page_archive.PageArchive(str(tmpdir))
+	archive.put(urls[0], PAGES[urls[0]])
+	archive.close()
+
+	# Killed while writing the index entry of a second page.
+	with open(archive.index_path, 'ab') as f:
+		f.write(b'{"url": "' + urls[1].encode('utf-8'))
+
+	archive = page_archive.PageArchive(str(tmpdir))
+	assert len(archive) == 1
+	archive.put(urls[2], PAGES[urls[2]])
+	archive.close()
+
+	archive = page_archive.PageArchive(str(tmpdir))
+	assert sorted(archive.urls) == [urls[0], urls[2]]
+	assert archive.get(urls[2]) == PAGES[urls[2]]
@@ -0,0 +1,55 @@
+"""
+test_registry.py
+--------------------------------------
+This document contains the tests of the model registry: models are loaded with
+their arrays memory-mapped from the store, and a loaded model can still be grown
+with warm start.
+"""
+
+# LIBRARIES
+import numpy as np
+
+from sklearn import ensemble
+
+# local files in directory
+import boosting
+import registry
+
+
+def make_data(n=200, seed=0):
+	random = np.random.RandomState(seed)
+	X = random.randn(n, 4)
+	return X, X.sum(axis=1) + random.randn(n)
+
+
+def train_boosting(X, y, params):
+	return ensemble.GradientBoostingRegressor(**params).fit(X, y)
+
+
+def test_arrays_are_memory_mapped(tmpdir):
+	X, y = make_data()
+	store = registry.ModelRegistry(str(tmpdir))
+	params = np.arange(5.)
+	store.put('params', params)
+
+	loaded = store.get('params')
+	assert isinstance(loaded, np.memmap) and not loaded.flags.writeable
+	assert np.array_equal(loaded, params)
+
+	clf = store.cached('boosting', {'n_estimators': 20, 'random_state': 0}, X, y, train_boosting)
+	loaded = store.cached('boosting', {'n_estimators': 20, 'random_state': 0}, X, y, train_boosting)
+	assert store.hits == 2
+	assert isinstance(loaded.train_score_, np.memmap)
+	assert np.array_equal(loaded.predict(X), clf.predict(X))
+
+
+def test_loaded_model_can_be_warm_started(tmpdir):
+	X, y = make_data()
+	store = registry.ModelRegistry(str(tmpdir))
+	params = {'n_estimators': 20, 'random_state': 0}
+	store.cached('boosting', params, X, y, train_boosting)
+
+	loaded = boosting.extend_model(store.cached('boosting', params, X, y, train_boosting), X, y, 30)
+	assert len(loaded.estimators_) == len(loaded.train_score_) == 30
+	expected = train_boosting(X, y, dict(params, n_estimators=30))
+	assert np.allclose(loaded.predict(X), expected.predict(X))
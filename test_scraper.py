@@ -0,0 +1,67 @@
+"""
+test_scraper.py
+--------------------------------------
+This document contains the tests of the scraper's run report: in a replay run the
+players are extracted in worker processes, and the time they spend parsing and
+extracting pages is still part of the report.
+"""
+
+# LIBRARIES
+import json
+# local files in directory
+import scraper
+
+
+PLAYERS = [('Stephen Curry', None), ('Klay Thompson', None), ('Seth Curry', None)]
+
+PAGE = '<table id="totals">' + '<tr><td data-stat="fg3">1</td></tr>' * 2000 + '</table>'
+
+
+class ListSink(object):
+
+	def __init__(self):
+		self.rows = []
+
+
+	def write(self, row):
+		self.rows.append(row)
+
+
+class FakeArchive(object):
+	lock = None
+
+
+@scraper.METRICS.timed('extract')
+def parse_nba(player, known_seasons=None, nba_path=None):
+	scraper.get_table(scraper.make_soup(PAGE), 'totals').find_all('td')
+	return [120, 340], [['2010-11', '/teams/GSW/2011.html', 110., 25., 24.]]
+
+
+@scraper.METRICS.timed('extract')
+def parse_ncaa(player, nba_path=None):
+	scraper.get_table(scraper.make_soup(PAGE), 'totals').find_all('td')
+	return [150, 400, 180, 220, 7.5], [['/cbb/schools/davidson/2009.html', 34, 800]]
+
+
+def test_replay_report_has_worker_times(tmpdir, monkeypatch):
+	monkeypatch.setattr(scraper, 'REPLAY', True)
+	monkeypatch.setattr(scraper, 'ARCHIVE', FakeArchive())
+	monkeypatch.setattr(scraper, 'parse_nba', parse_nba)
+	monkeypatch.setattr(scraper, 'parse_ncaa', parse_ncaa)
+
+	# The stages are timed by the METRICS of the module, so it is cleared rather than replaced.
+	scraper.METRICS.reset()
+	sink = ListSink()
+	scraper.parse_players(sink, workers=2, players=PLAYERS)
+	assert [row[0] for row in sink.rows] == [player for player, nba_path in PLAYERS]
+
+	filename = str(tmpdir.join('report.json'))
+	scraper.METRICS.write_report(filename)
+	with open(filename) as f:
+		report = json.load(f)
+
+	assert report['counters']['players'] == len(PLAYERS)
+	for stage in ['parse', 'extract']:
+		assert report['stages'][stage]['calls'] == 2 * len(PLAYERS)
+		assert report['stages'][stage]['wall_seconds'] > 0
+		assert report['stages'][stage]['cpu_seconds'] > 0
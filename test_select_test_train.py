@@ -0,0 +1,81 @@
+"""
+test_select_test_train.py
+--------------------------------------
+This document contains the tests of the split manifests: the split of a player
+only depends on their name, so it does not change when players are added or
+the rows are reordered, and a manifest is only applied to the rows it was made for.
+"""
+
+# LIBRARIES
+import sys
+
+import numpy as np
+import pytest
+
+# local files in directory
+import dataset
+import select_test_train
+
+
+NAMES = ['Stephen Curry', 'James Harden', 'Jeff Teague', 'Klay Thompson', 'Toney Douglas', 'Danny Green',
+		'Kemba Walker', 'Wesley Matthews', 'AJ Price', 'Jimmy Butler', 'Patrick Patterson', 'Eric Bledsoe']
+
+# The test players of NAMES, as split when the hash split was introduced. A change to
+# this list means every existing split would move.
+TEST_NAMES = ['James Harden', 'Jeff Teague', 'Toney Douglas', 'Danny Green', 'Wesley Matthews', 'AJ Price',
+			'Patrick Patterson', 'Eric Bledsoe']
+
+
+def write_data(filename, names):
+	matrix = np.arange(len(names) * 2, dtype=np.float64).reshape(len(names), 2)
+	dataset.write(filename, matrix, ['ncaa_fg3a', 'nba_fg3_pct'], np.array(names))
+	return dataset.load(filename)
+
+
+def split(tmpdir, monkeypatch, names, tag):
+	data_file, manifest_file = str(tmpdir.join(tag + '.dat')), str(tmpdir.join(tag + '.npz'))
+	data = write_data(data_file, names)
+	monkeypatch.setattr(sys, 'argv', ['select_test_train.py', data_file, '--manifest', manifest_file])
+	select_test_train.main()
+
+	splits = dataset.read_manifest(manifest_file, data)
+	return dict((split, set(data.labels[rows])) for split, rows in splits.items())
+
+
+def test_split_is_pinned_to_the_name_hash():
+	assert [name for name in NAMES if select_test_train.is_test(name)] == TEST_NAMES
+
+
+def test_every_player_is_in_one_split(tmpdir, monkeypatch):
+	splits = split(tmpdir, monkeypatch, NAMES, 'all')
+	assert splits['test'] == set(TEST_NAMES)
+	assert splits['train'] == set(NAMES) - set(TEST_NAMES)
+
+
+def test_split_is_stable_when_players_are_added_or_reordered(tmpdir, monkeypatch):
+	before = split(tmpdir, monkeypatch, NAMES[:6], 'before')
+	after = split(tmpdir, monkeypatch, NAMES[::-1] + ['Seth Curry', 'Devin Booker'], 'after')
+
+	for name in NAMES[:6]:
+		assert (name in before['test']) == (name in after['test'])
+		assert (name in before['train']) == (name in after['train'])
+
+
+def test_test_share_is_near_test_percent():
+	names = ['Player %d' % i for i in range(10000)]
+	share = 100. * sum(select_test_train.is_test(name) for name in names) / len(names)
+	assert abs(share - select_test_train.TEST_PERCENT) < 1.5
+
+
+def test_manifest_only_applies_to_its_rows(tmpdir):
+	data = write_data(str(tmpdir.join('data.dat')), NAMES)
+	manifest_file = str(tmpdir.join('split.npz'))
+	dataset.write_manifest(manifest_file, data, {'train': [0, 1], 'test': [2]})
+
+	# Another dataset of the same rows (e.g. the scraped data imported again) shares the manifest.
+	same_rows = write_data(str(tmpdir.join('transformed.dat')), NAMES)
+	assert list(dataset.read_manifest(manifest_file, same_rows)['train']) == [0, 1]
+
+	for names in [NAMES[:-1], NAMES[1:] + NAMES[:1]]:
+		with pytest.raises(ValueError):
+			dataset.read_manifest(manifest_file, write_data(str(tmpdir.join('other.dat')), names))
@@ -0,0 +1,71 @@
+"""
+throttle.py
+--------------------------------------
+This document contains the per-host request rate limiter used by the scraper,
+so that concurrent workers stay within the request rates allowed by
+basketball-reference.com and sports-reference.com.
+"""
+
+# LIBRARIES
+import threading
+import time
+import urlparse
+
+
+'''
+Parameters:
+* url: the address of the webpage.
+
+Function: Helper function to get the host name of a URL.
+'''
+def host_of(url):
+	return urlparse.urlparse(url).netloc
+
+
+class HostThrottle(object):
+
+	'''
+	Parameters:
+	* default_rate: requests per second allowed for hosts without their own rate.
+	                None means such hosts are not limited.
+
+	Function: Spaces out requests to each host so that no host receives more than
+	          its configured number of requests per second, across all threads.
+	'''
+	def __init__(self, default_rate=None):
+		self.default_rate = default_rate
+		self.rates = {}
+
+		# host -> earliest time at which the next request may be sent.
+		self.next_slot = {}
+		self.lock = threading.Lock()
+
+
+	'''
+	Parameters:
+	* host: the host name (e.g. www.basketball-reference.com)
+	* rate: requests per second allowed for the host. None means no limit.
+	'''
+	def set_rate(self, host, rate):
+		self.rates[host] = rate
+
+
+	'''
+	Parameters:
+	* url: the address of the webpage about to be requested.
+
+	Function: Blocks the calling thread until a request to the URL's host is allowed.
+	'''
+	def wait(self, url):
+		host = host_of(url)
+		rate = self.rates.get(host, self.default_rate)
+		if not rate:
+			return
+
+		with self.lock:
+			now = time.time()
+			slot = max(now, self.next_slot.get(host, 0.))
+			self.next_slot[host] = slot + 1. / rate
+
+		if slot > now:
+			time.sleep(slot - now)
@@ -4,40 +4,59 @@ tuning_boosting.py
 December 9th, 2017
 Roland Centeno, Hilary Sun, Jerold Yu
 --------------------------------------
-This document contains code that uses grid search GridSearchCV
-to hypertune the parameters to look for the best gradient boosted model.
+This document contains code that uses successive halving to hypertune the
+parameters to look for the best gradient boosted model. Every candidate starts
+with a few boosting iterations; the best third of them are grown further with
+warm start, and so on, so hopeless candidates never get the full number of
+iterations. The models of every fold are kept for the whole search, and cached
+on disk, so running the search again, or with more candidates or a bigger
+budget, only fits what is new.
 """
 
 # LIBRARIES
+import argparse
+import cPickle as pickle
+import hashlib
+import json
+import math
+import os
+
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
 
 from sklearn import ensemble
-from sklearn import datasets
-from sklearn.utils import shuffle
 from sklearn.metrics import mean_squared_error
-from sklearn.grid_search import GridSearchCV
+from sklearn.model_selection import KFold
 
+# local files in directory
+import boosting
+import dataset
 
-'''
-Parameters:
-* filename: csv file to be loaded.
 
-Function: read in data to use in gradient boosting regression code.
-'''
-def load_dataset(filename, columns = None):
-    df = pd.read_csv(filepath_or_buffer=filename, sep=',')
+# CONSTANTS
+PARAM_GRID = {'learning_rate': [1, .1, .001, .0001, .00001, .000001],
+              'max_depth': [4, 5, 6]
+}
+
+DEFAULT_CACHE_DIR = '.tune_cache'
+
+# Boosting iterations per fold spent on the whole search. With the 18 candidates of
+# PARAM_GRID, the last two are grown to 3000 iterations.
+DEFAULT_BUDGET = 18000
 
-    if columns:
-        df.columns = columns
+# Each round keeps the best 1/ETA of the candidates.
+ETA = 3
 
-    df.dropna(how="all", inplace=True) # drops the empty line at file-end
-    df.tail()
-    X = df.ix[:,0:3].values
-    Y = df.ix[:,4].values
 
-    return X, Y    
+'''
+Parameters:
+* filename: dataset file to be loaded (see dataset.py).
+* split: the split to read (train or test).
+
+Function: read in data to use in gradient boosting regression code. Every component
+          of the transformed data is a feature, as for the models of kfold.py.
+'''
+def load_dataset(filename, split):
+    return dataset.load_xy(filename, split=split)
 
 
 '''
@@ -61,71 +80,196 @@ def fit_model(train_X, train_y, test_X, test_y, params):
     return clf
 
 
+class FoldCache(object):
+
+    '''
+    Parameters:
+    * directory: folder of the cached models. Created if it does not exist.
+    * X, y: the training data the folds are taken from.
+    * k: the number of folds.
+
+    Function: Keeps the fitted model and held-out errors of every fold of every
+              candidate in memory for the run, and on disk unless directory is None.
+              Entries are keyed by a hash of the training data, the fold and the
+              parameters other than n_estimators, so a cached model can be grown to
+              more iterations instead of fitted again. hits counts the entries read
+              from disk, i.e. fitted by an earlier run, and misses the ones fitted
+              from scratch.
+    '''
+    def __init__(self, directory, X, y, k):
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self.fingerprint = hashlib.sha1(np.ascontiguousarray(X).tobytes() + np.ascontiguousarray(y).tobytes() +
+                                        str(k)).hexdigest()
+        self.hits = 0
+        self.misses = 0
+
+        # key -> (model, monitor) of the entries fitted or read in this run.
+        self.memory = {}
+
+    def key(self, params, fold):
+        params = dict((name, value) for name, value in params.items() if name != 'n_estimators')
+        return hashlib.sha1(json.dumps([self.fingerprint, fold, sorted(params.items())])).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    '''
+    Function: returns the (model, boosting.HeldOutMonitor) of a fold, or None.
+    '''
+    def get(self, params, fold):
+        key = self.key(params, fold)
+        if key in self.memory:
+            return self.memory[key]
+
+        if self.directory is None or not os.path.exists(self.path(key)):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        with open(self.path(key), 'rb') as f:
+            self.memory[key] = pickle.load(f)
+        return self.memory[key]
+
+    def put(self, params, fold, clf, monitor):
+        key = self.key(params, fold)
+        self.memory[key] = (clf, monitor)
+        if self.directory is None:
+            return
+
+        path = self.path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((clf, monitor), f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_path, path)
+
+
 '''
 Parameters:
-* test_X: parameters of the test data
-* test_y: label for the test data (i.e. nba_fg3_pct)
-* clf: the fitted gradient boosting model
-* params: parameters used for the gradient boosting regressor
-* columns: the header names of the data
+* X, y: the training data.
+* folds: the (train_index, test_index) of every fold.
+* params: parameters of the candidate, without n_estimators.
+* n_estimators: the number of boosting iterations to evaluate the candidate at.
+* cache: a FoldCache.
+
+Function: cross-validates a candidate with n_estimators iterations. Folds found in the
+          cache are reused, and grown with warm start if they have fewer iterations.
+          Returns the mean held-out error after every iteration, and the number of
+          iterations fitted.
+'''
+def evaluate(X, y, folds, params, n_estimators, cache):
+    errors = []
+    fitted = 0
+    for fold, (train_index, test_index) in enumerate(folds):
+        cached = cache.get(params, fold)
+        if cached is None:
+            clf, monitor = None, boosting.HeldOutMonitor(X[test_index], y[test_index])
+        else:
+            clf, monitor = cached
+
+        if len(monitor.errors) < n_estimators:
+            fitted += n_estimators - len(monitor.errors)
+            if clf is None:
+                clf = ensemble.GradientBoostingRegressor(n_estimators=n_estimators, **params)
+                clf.fit(X[train_index], y[train_index], monitor=monitor)
+            else:
+                boosting.extend_model(clf, X[train_index], y[train_index], n_estimators, monitor)
+            cache.put(params, fold, clf, monitor)
+
+        errors.append(monitor.errors[:n_estimators])
+
+    return np.mean(errors, axis=0), fitted
+
+
+'''
+Parameters:
+* param_grid: the values of each parameter; every combination is a candidate.
+
+Function: Helper function to list the candidates of a grid, as dictionaries.
+'''
+def candidates(param_grid):
+    names = sorted(param_grid)
+    grid = [{}]
+    for name in names:
+        grid = [dict(candidate, **{name: value}) for candidate in grid for value in param_grid[name]]
+    return grid
 
-Function: generates two plots: one for the deviance of the training and test data
-          over the number of boosting iterations, and one that ranks the relative
-          importance of the variables used.
+
+'''
+Parameters:
+* X, y: the training data.
+* param_grid: the values of each parameter to search.
+* budget: boosting iterations per fold spent on the whole search.
+* k: the number of folds.
+* cache: a FoldCache.
+* eta: each round keeps the best 1/eta of the candidates.
+
+Function: successive halving over the candidates of the grid, in log_eta(candidates)
+          rounds. The budget is split evenly between the rounds, and within a round
+          between the candidates left, which are grown to that many iterations. A
+          candidate is scored by its lowest cross-validated error over its iterations.
+          Returns the best parameters, with the best n_estimators, and their error.
 '''
-def generate_plots(test_X, test_y, clf, params, columns):
-    
-    # Compute test set deviance.
-    test_score = np.zeros((params['n_estimators'],), dtype=np.float64)
-
-    for i, pred_y in enumerate(clf.staged_predict(test_X)):
-        test_score[i] = clf.loss_(test_y, pred_y)
-
-    plt.figure(figsize=(12,6))
-    plt.subplot(1,2,1)
-    plt.title('Deviance')
-    plt.plot(np.arange(params['n_estimators']) + 1, clf.train_score_, 'b-', label='Training Set Deviance')
-    plt.plot(np.arange(params['n_estimators']) + 1, test_score, 'r-', label='Test Set Deviance')
-    plt.legend(loc='upper right')
-    plt.xlabel('Boosting Iterations')
-    plt.ylabel('Deviance')
-
-    # Plot feature importance relative to the other variables.
-    feature_importance = clf.feature_importances_
-    feature_importance = 100.0 * (feature_importance / feature_importance.max())
-    sorted_idx = np.argsort(feature_importance)
-
-    col = []
-    for i in sorted_idx:
-        col.append(columns[i])
-
-    pos = np.arange(sorted_idx.shape[0]) + .5
-    plt.subplot(1,2,2)
-    plt.barh(pos, feature_importance[sorted_idx], align='center')
-    plt.yticks(pos, col)
-    plt.tight_layout()
-    plt.xlabel('Relative Importance')
-    plt.title('Variable Importance')
-    plt.show()
+def successive_halving(X, y, param_grid=PARAM_GRID, budget=DEFAULT_BUDGET, k=3, cache=None, eta=ETA):
+    folds = list(KFold(n_splits=k, random_state=0, shuffle=True).split(X))
+    cache = cache or FoldCache(None, X, y, k)
+    params = dict((name, value) for name, value in boosting.PARAMS.items() if name not in param_grid)
+    params.pop('n_estimators', None)
+
+    left = [dict(params, **candidate) for candidate in candidates(param_grid)]
+    rounds = max(1, int(math.ceil(math.log(len(left), eta))))
+    n_estimators = 0
+
+    for round in range(rounds):
+        if round > 0:
+            left = [candidate for error, best_n, candidate in scored[:max(1, len(left) // eta)]]
+        n_estimators = max(n_estimators + 1, budget // (rounds * len(left)))
 
+        scored = []
+        fitted = 0
+        for candidate in left:
+            curve, candidate_fitted = evaluate(X, y, folds, candidate, n_estimators, cache)
+            scored.append((curve.min(), int(np.argmin(curve)) + 1, candidate))
+            fitted += candidate_fitted
+        scored.sort(key=lambda score: score[0])
+
+        print '%d candidates at %d iterations (%d iterations fitted per fold), best %.4f' % \
+            (len(left), n_estimators, fitted / k, scored[0][0])
+
+    error, best_n, best = scored[0]
+    return dict(best, n_estimators=best_n), error
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Search the parameters of gradient boosting with successive halving.')
+    parser.add_argument('--data', default='transformed.dat', help='dataset transformed by PCA.py')
+    parser.add_argument('--budget', type=int, default=DEFAULT_BUDGET, help='boosting iterations per fold spent on the search')
+    parser.add_argument('--folds', type=int, default=3, help='number of folds')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='folder of the cached fold models')
+    parser.add_argument('--no-cache', action='store_true', help='do not read or write cached fold models')
+    parser.add_argument('--no-plot', action='store_true', help='do not plot the deviance and importances of the best model')
+    parser.add_argument('--report', help='write the plots to this image file instead of showing them')
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
     columns = ['X1', 'X2', 'X3', 'X4', 'Y']
-    train_X, train_y = load_dataset('transformed_train.csv')
-    test_X, test_y = load_dataset('transformed_test.csv')
-
-    param_grid = {'learning_rate': [1, .1, .001, .0001, .00001, .000001],
-                  'max_depth': [4, 5, 6]
-    }
+    train_X, train_y = load_dataset(args.data, 'train')
+    test_X, test_y = load_dataset(args.data, 'test')
 
-    est = ensemble.GradientBoostingRegressor(n_estimators = 3000)
-    gs_cv = GridSearchCV(est, param_grid, n_jobs=4).fit(train_X, train_y)
-    params = gs_cv.best_params_
+    cache = FoldCache(None if args.no_cache else args.cache_dir, train_X, train_y, args.folds)
+    params, error = successive_halving(train_X, train_y, PARAM_GRID, args.budget, args.folds, cache)
     print(params)
-    params['n_estimators'] = 3000
+    print('Cross-validated MSE: %.4f (%d cached folds reused, %d fitted)' % (error, cache.hits, cache.misses))
+
     clf = fit_model(train_X, train_y, test_X, test_y, params)
-    generate_plots(test_X, test_y, clf, params, columns)
+    if args.report:
+        boosting.save_plots(test_X, test_y, clf, columns, args.report)
+    elif not args.no_plot:
+        boosting.generate_plots(test_X, test_y, clf, params, columns)
 
 
 